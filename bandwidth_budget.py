@@ -0,0 +1,208 @@
+import threading
+from typing import Callable, Dict, List, Optional
+
+from common_utils import get_logger, parse_camera_weight
+
+logger = get_logger(__name__)
+
+BUDGET_CHECK_SECONDS = 1.0
+# Smaller changes are not pushed, so encoders are not retuned for noise
+BUDGET_MIN_CHANGE_FRACTION = 0.05
+# A static stream (motion gate skipping frames) keeps this share of its weight
+BUDGET_STATIC_WEIGHT = 0.25
+# The operator-focused stream weighs this much more and may reach this multiple of --bitrate
+FOCUS_WEIGHT = 4.0
+FOCUS_MAX_BITRATE_FACTOR = 4
+
+# Marks an update() argument that was not reloaded (None is meaningful: no budget, no priorities)
+_UNCHANGED = object()
+
+
+class StreamDemand:
+	def __init__(self, weight: float, subscribers: int, max_bitrate: int = None):
+		self.weight = weight
+		self.subscribers = subscribers
+		# None uses the ceiling shared by every stream
+		self.max_bitrate = max_bitrate
+
+
+def allocate_bitrates(
+	total_bitrate: int,
+	demands: Dict[int, StreamDemand],
+	min_bitrate: int,
+	max_bitrate: int,
+) -> Dict[int, int]:
+	"""Split `total_bitrate` across streams in proportion to their weights.
+
+	Every subscriber receives its own unicast copy, so a stream costs its bitrate times
+	its subscribers. Streams pinned at `min_bitrate` or `max_bitrate` drop out and the
+	remainder is split again among the rest. Unwatched streams cost nothing and sit at
+	`min_bitrate` until someone subscribes.
+	"""
+	bitrates = {port: min_bitrate for port, demand in demands.items() if demand.subscribers <= 0}
+	active = {port: demand for port, demand in demands.items() if demand.subscribers > 0}
+	remaining = total_bitrate
+	while active:
+		cost = sum(demand.weight * demand.subscribers for demand in active.values())
+		per_weight = remaining / cost if cost > 0 else 0.0
+		# Pinning at the floor only lowers everyone else's share, so those are settled first
+		pinned = {port: min_bitrate for port, demand in active.items() if per_weight * demand.weight < min_bitrate}
+		if not pinned:
+			pinned = {
+				port: demand.max_bitrate or max_bitrate
+				for port, demand in active.items()
+				if per_weight * demand.weight > (demand.max_bitrate or max_bitrate)
+			}
+		if not pinned:
+			bitrates.update({port: int(per_weight * demand.weight) for port, demand in active.items()})
+			break
+		for port, bitrate in pinned.items():
+			bitrates[port] = bitrate
+			remaining -= bitrate * active.pop(port).subscribers
+	return bitrates
+
+
+class BandwidthBudgetScheduler:
+	"""Keeps the streamer's total uplink within `--total-bitrate`.
+
+	Runs in the streamer's main process. Subscriptions come from the control server,
+	stream health and motion from the metrics the stream processes publish. Whenever
+	the split changes, each stream's new bitrate is pushed through `push_bitrate`, which
+	retunes the encoder live. With no budget set, every stream keeps `max_stream_bitrate`
+	unless the operator focuses one: the current total is then re-split in its favour.
+	"""
+
+	def __init__(
+		self,
+		streams: Dict[int, Optional[int]],
+		push_bitrate: Callable[[int, int], None],
+		total_bitrate: Optional[int],
+		min_stream_bitrate: int,
+		max_stream_bitrate: int,
+		priorities: List[str] = None,
+		stream_health: Dict[int, str] = None,
+		stream_metrics: Dict[int, dict] = None,
+	):
+		# port -> camera id (None for the mosaic, which carries every camera)
+		self.streams = dict(streams)
+		self.push_bitrate = push_bitrate
+		self.total_bitrate = total_bitrate
+		self.min_stream_bitrate = min_stream_bitrate
+		self.max_stream_bitrate = max_stream_bitrate
+		self.priorities = dict(parse_camera_weight(value) for value in priorities or [])
+		self.stream_health = stream_health if stream_health is not None else {}
+		self.stream_metrics = stream_metrics if stream_metrics is not None else {}
+		self._lock = threading.Lock()
+		self._subscribers: Dict[int, set] = {port: set() for port in self.streams}
+		self._bitrates: Dict[int, int] = {port: max_stream_bitrate for port in self.streams}
+		self._oversubscribed = False
+		self.focus_port: Optional[int] = None
+
+	def set_focus(self, port: Optional[int]) -> Dict[int, int]:
+		with self._lock:
+			self.focus_port = port if port in self.streams else None
+		return self.reschedule(force=True)
+
+	def note_subscriber(self, port: int, receiver_ip: str):
+		# multiudpsink never forgets a client, so neither does the budget
+		with self._lock:
+			if port in self._subscribers:
+				self._subscribers[port].add(receiver_ip)
+
+	def update(
+		self,
+		total_bitrate: Optional[int] = _UNCHANGED,
+		min_stream_bitrate: int = None,
+		max_stream_bitrate: int = None,
+		priorities: List[str] = _UNCHANGED,
+	):
+		with self._lock:
+			if total_bitrate is not _UNCHANGED:
+				self.total_bitrate = total_bitrate
+			if min_stream_bitrate is not None:
+				self.min_stream_bitrate = min_stream_bitrate
+			if max_stream_bitrate is not None:
+				self.max_stream_bitrate = max_stream_bitrate
+			if priorities is not _UNCHANGED:
+				self.priorities = dict(parse_camera_weight(value) for value in priorities or [])
+		self.reschedule()
+
+	def _weight(self, port: int) -> float:
+		camera_id = self.streams[port]
+		weight = self.priorities.get(camera_id, 1.0) if camera_id is not None else 1.0
+		recent_sent = self.stream_metrics.get(port, {}).get("motion_recent_sent_percent")
+		if recent_sent is not None:
+			weight *= max(BUDGET_STATIC_WEIGHT, recent_sent / 100.0)
+		if port == self.focus_port:
+			weight *= FOCUS_WEIGHT
+		return weight
+
+	def _demands(self) -> Dict[int, StreamDemand]:
+		# Failed streams send nothing; their share goes to the others until they recover
+		return {
+			port: StreamDemand(
+				self._weight(port),
+				len(self._subscribers[port]),
+				self.max_stream_bitrate * FOCUS_MAX_BITRATE_FACTOR if port == self.focus_port else None,
+			)
+			for port in self.streams
+			if self.stream_health.get(port) != "failed"
+		}
+
+	def reschedule(self, force: bool = False) -> Dict[int, int]:
+		"""Recompute the split and push the bitrates that moved. Returns the pushed ones."""
+		with self._lock:
+			total_bitrate = self.total_bitrate
+			if total_bitrate is None and self.focus_port is None:
+				targets = {port: self.max_stream_bitrate for port in self.streams}
+			else:
+				demands = self._demands()
+				if total_bitrate is None:
+					# Focus without a budget keeps what the streams send unfocused
+					total_bitrate = self.max_stream_bitrate * sum(demand.subscribers for demand in demands.values())
+				targets = allocate_bitrates(
+					total_bitrate,
+					demands,
+					self.min_stream_bitrate,
+					max(self.min_stream_bitrate, self.max_stream_bitrate),
+				)
+				if self.total_bitrate is not None:
+					self._warn_if_oversubscribed(demands)
+			changed = {
+				port: bitrate
+				for port, bitrate in targets.items()
+				if abs(bitrate - self._bitrates[port]) > self._bitrates[port] * BUDGET_MIN_CHANGE_FRACTION
+				# Limits and focus switches are always honoured exactly, however small the step
+				or (bitrate in (self.min_stream_bitrate, self.max_stream_bitrate) and bitrate != self._bitrates[port])
+				or (force and bitrate != self._bitrates[port])
+			}
+			if not changed:
+				return changed
+			self._bitrates.update(changed)
+			summary = ", ".join(
+				f"{port}={self._bitrates[port]} ({len(self._subscribers[port])} sub)" for port in sorted(self._bitrates)
+			)
+			budget = f"{total_bitrate} bps" if total_bitrate is not None else "unlimited"
+			if self.focus_port is not None:
+				budget += f", focus on {self.focus_port}"
+		for port, bitrate in changed.items():
+			self.push_bitrate(port, bitrate)
+		logger.info(f"[budget] {budget}: {summary}")
+		return changed
+
+	def _warn_if_oversubscribed(self, demands: Dict[int, StreamDemand]):
+		floor_cost = sum(self.min_stream_bitrate * demand.subscribers for demand in demands.values())
+		oversubscribed = floor_cost > self.total_bitrate
+		if oversubscribed and not self._oversubscribed:
+			logger.warning(
+				f"[budget] {floor_cost} bps needed at --min-stream-bitrate exceeds the {self.total_bitrate} bps "
+				"budget; the link is oversubscribed"
+			)
+		self._oversubscribed = oversubscribed
+
+	def run(self, stop_event: threading.Event):
+		while not stop_event.wait(BUDGET_CHECK_SECONDS):
+			try:
+				self.reschedule()
+			except Exception as exc:
+				logger.error(f"[budget] rescheduling failed: {exc}")
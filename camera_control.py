@@ -0,0 +1,273 @@
+import argparse
+import fcntl
+import json
+import math
+import os
+import socket
+import struct
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from common_utils import get_logger, VALID_PORT_MIN, VALID_PORT_MAX, int_in_range
+
+logger = get_logger(__name__)
+
+CAMERA_CONTROL_MESSAGE_TYPE = "CAMERA_CONTROL"
+CAMERA_CONTROL_RESULT_MESSAGE_TYPE = "CAMERA_CONTROL_RESULT"
+CAMERA_CONTROL_AUTO = "auto"
+LEGACY_EXPOSURE_PREFIX = "EXP:"
+CONTROL_REPLY_TIMEOUT_SECONDS = 2.0
+CONTROL_REPLY_MAX_BYTES = 65507
+
+# struct v4l2_control and the control IDs from linux/videodev2.h / v4l2-controls.h
+V4L2_CONTROL = struct.Struct("=Ii")
+# struct v4l2_control's value is a signed 32-bit int
+V4L2_CONTROL_VALUE_MIN = -(2 ** 31)
+V4L2_CONTROL_VALUE_MAX = 2 ** 31 - 1
+VIDIOC_G_CTRL = 0xC008561B
+VIDIOC_S_CTRL = 0xC008561C
+V4L2_CID_AUTO_WHITE_BALANCE = 0x0098090C
+V4L2_CID_GAIN = 0x00980913
+V4L2_CID_WHITE_BALANCE_TEMPERATURE = 0x0098091A
+V4L2_CID_EXPOSURE_AUTO = 0x009A0901
+V4L2_CID_EXPOSURE_ABSOLUTE = 0x009A0902
+V4L2_CID_FOCUS_ABSOLUTE = 0x009A090A
+V4L2_CID_FOCUS_AUTO = 0x009A090C
+V4L2_EXPOSURE_MANUAL = 1
+V4L2_EXPOSURE_APERTURE_PRIORITY = 3
+
+# name -> (auto control, its (manual, auto) values, value control); auto is written before the value
+CAMERA_CONTROLS = {
+	"exposure": (V4L2_CID_EXPOSURE_AUTO, (V4L2_EXPOSURE_MANUAL, V4L2_EXPOSURE_APERTURE_PRIORITY), V4L2_CID_EXPOSURE_ABSOLUTE),
+	"gain": (None, None, V4L2_CID_GAIN),
+	"white_balance": (V4L2_CID_AUTO_WHITE_BALANCE, (0, 1), V4L2_CID_WHITE_BALANCE_TEMPERATURE),
+	"focus": (V4L2_CID_FOCUS_AUTO, (0, 1), V4L2_CID_FOCUS_ABSOLUTE),
+}
+
+
+def _control_value(value: Any):
+	if isinstance(value, str) and value.lower() == CAMERA_CONTROL_AUTO:
+		return CAMERA_CONTROL_AUTO
+	if isinstance(value, bool) or not isinstance(value, (int, float)):
+		raise ValueError(f"expected a number or '{CAMERA_CONTROL_AUTO}', got {value!r}")
+	if not math.isfinite(value) or not V4L2_CONTROL_VALUE_MIN <= value <= V4L2_CONTROL_VALUE_MAX:
+		raise ValueError(f"{value!r} is outside the control range {V4L2_CONTROL_VALUE_MIN}..{V4L2_CONTROL_VALUE_MAX}")
+	return int(value)
+
+
+def parse_control_command(command: str) -> Optional[Dict[str, Any]]:
+	"""Turn a command string into a CAMERA_CONTROL request: JSON, or the legacy `EXP:<value|AUTO>`."""
+	command = command.strip()
+	if command.startswith(LEGACY_EXPOSURE_PREFIX):
+		value = command[len(LEGACY_EXPOSURE_PREFIX):]
+		try:
+			exposure = CAMERA_CONTROL_AUTO if value.upper() == "AUTO" else int(value)
+		except ValueError:
+			return None
+		return {"type": CAMERA_CONTROL_MESSAGE_TYPE, "controls": {"exposure": exposure}}
+	try:
+		payload = json.loads(command)
+	except json.JSONDecodeError:
+		return None
+	if not isinstance(payload, dict) or payload.get("type") != CAMERA_CONTROL_MESSAGE_TYPE:
+		return None
+	return payload
+
+
+def _control_sets(request: Dict[str, Any]) -> List[Dict[str, Any]]:
+	"""A request carries `sets: [{cameras, controls}, ...]`, or one set as top-level `cameras`/`controls`."""
+	sets = request.get("sets")
+	if sets is None:
+		sets = [{"cameras": request.get("cameras"), "controls": request.get("controls", {})}]
+	if not isinstance(sets, list) or not all(isinstance(entry, dict) for entry in sets):
+		raise ValueError("'sets' must be a list of objects")
+	return sets
+
+
+class CameraControlService:
+	"""Applies batched camera control sets (exposure, gain, white balance, focus) in-process.
+
+	Every camera gets its own task on a shared pool, so a batch for N cameras takes about as
+	long as the slowest camera instead of the sum. Controls for one camera are applied in
+	request order, each auto/manual switch before its value, and read back after writing.
+	Simulated cameras keep the values in memory so the service can be exercised without devices.
+	"""
+
+	def __init__(self, camera_ids: List[int], simulation: bool = False):
+		self.camera_ids = list(camera_ids)
+		self.simulation = simulation
+		self._simulated_values: Dict[int, Dict[int, int]] = {camera_id: {} for camera_id in self.camera_ids}
+		self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.camera_ids)), thread_name_prefix="camera-control")
+		# Requests are dispatched one at a time, so batches touching the same camera apply in arrival order
+		self._dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera-control-dispatch")
+		self._camera_locks = {camera_id: threading.Lock() for camera_id in self.camera_ids}
+
+	def submit(self, request: Dict[str, Any], on_result: Callable[[Dict[str, Any]], None] = None) -> Future:
+		"""Start applying `request` without blocking; `on_result` gets the CAMERA_CONTROL_RESULT message."""
+		future = self._dispatcher.submit(self.apply, request)
+		if on_result is not None:
+			future.add_done_callback(lambda done: on_result(self._result_of(done, request)))
+		return future
+
+	@staticmethod
+	def _result_of(future: Future, request: Dict[str, Any]) -> Dict[str, Any]:
+		# The requester always gets a CAMERA_CONTROL_RESULT, even if applying the batch failed outright
+		try:
+			return future.result()
+		except Exception as exc:
+			logger.error(f"camera control request failed: {exc}")
+			return {
+				"type": CAMERA_CONTROL_RESULT_MESSAGE_TYPE,
+				"request_id": request.get("request_id") if isinstance(request, dict) else None,
+				"results": [],
+				"error": str(exc),
+			}
+
+	def apply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+		started = time.monotonic()
+		result = {
+			"type": CAMERA_CONTROL_RESULT_MESSAGE_TYPE,
+			"request_id": request.get("request_id") or uuid.uuid4().hex,
+			"results": [],
+		}
+		try:
+			per_camera = self._group_by_camera(_control_sets(request))
+		except ValueError as exc:
+			result["error"] = str(exc)
+			result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 2)
+			return result
+
+		# Each camera runs on its own thread; this call waits for the slowest one
+		futures = [
+			self._executor.submit(self._apply_camera, camera_id, controls)
+			if camera_id in self._camera_locks
+			else None
+			for camera_id, controls in per_camera
+		]
+		for (camera_id, _controls), future in zip(per_camera, futures):
+			if future is None:
+				result["results"].append({"camera_id": camera_id, "ok": False, "error": "unknown camera"})
+			else:
+				result["results"].append(future.result())
+		result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 2)
+		return result
+
+	def _group_by_camera(self, sets: List[Dict[str, Any]]) -> List[tuple]:
+		grouped: Dict[int, List[tuple]] = {}
+		for entry in sets:
+			cameras = entry.get("cameras")
+			cameras = self.camera_ids if cameras is None else cameras
+			if not isinstance(cameras, list) or not all(isinstance(camera_id, int) for camera_id in cameras):
+				raise ValueError("'cameras' must be a list of camera IDs")
+			controls = entry.get("controls", {})
+			if not isinstance(controls, dict):
+				raise ValueError("'controls' must be an object")
+			for camera_id in cameras:
+				grouped.setdefault(camera_id, []).extend(controls.items())
+		return list(grouped.items())
+
+	def _apply_camera(self, camera_id: int, controls: List[tuple]) -> Dict[str, Any]:
+		started = time.monotonic()
+		applied = {}
+		errors = {}
+		with self._camera_locks[camera_id]:
+			fd = None
+			try:
+				if not self.simulation:
+					fd = os.open(f"/dev/video{camera_id}", os.O_RDWR | os.O_NONBLOCK)
+				for name, value in controls:
+					try:
+						applied[name] = self._apply_control(fd, camera_id, name, value)
+					except (ValueError, OSError, OverflowError, struct.error) as exc:
+						errors[name] = str(exc)
+			except OSError as exc:
+				errors["device"] = str(exc)
+			finally:
+				if fd is not None:
+					os.close(fd)
+		camera_result = {
+			"camera_id": camera_id,
+			"ok": not errors,
+			"applied": applied,
+			"elapsed_ms": round((time.monotonic() - started) * 1000, 2),
+		}
+		if errors:
+			camera_result["errors"] = errors
+		return camera_result
+
+	def _apply_control(self, fd: Optional[int], camera_id: int, name: str, value: Any):
+		if name not in CAMERA_CONTROLS:
+			raise ValueError(f"unknown control '{name}' (expected one of {', '.join(CAMERA_CONTROLS)})")
+		value = _control_value(value)
+		auto_control, auto_values, value_control = CAMERA_CONTROLS[name]
+		if value == CAMERA_CONTROL_AUTO:
+			if auto_control is None:
+				raise ValueError(f"'{name}' has no automatic mode")
+			self._set(fd, camera_id, auto_control, auto_values[1])
+			return CAMERA_CONTROL_AUTO if self._get(fd, camera_id, auto_control) == auto_values[1] else "manual"
+		if auto_control is not None:
+			self._set(fd, camera_id, auto_control, auto_values[0])
+		self._set(fd, camera_id, value_control, value)
+		return self._get(fd, camera_id, value_control)
+
+	def _set(self, fd: Optional[int], camera_id: int, control_id: int, value: int):
+		if fd is None:
+			self._simulated_values[camera_id][control_id] = value
+			return
+		fcntl.ioctl(fd, VIDIOC_S_CTRL, bytearray(V4L2_CONTROL.pack(control_id, value)), True)
+
+	def _get(self, fd: Optional[int], camera_id: int, control_id: int) -> int:
+		if fd is None:
+			return self._simulated_values[camera_id].get(control_id)
+		buffer = bytearray(V4L2_CONTROL.pack(control_id, 0))
+		fcntl.ioctl(fd, VIDIOC_G_CTRL, buffer, True)
+		return V4L2_CONTROL.unpack(buffer)[1]
+
+	def shutdown(self):
+		self._dispatcher.shutdown(wait=False, cancel_futures=True)
+		self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def handle_arguments():
+	parser = argparse.ArgumentParser(
+		prog="camera_control",
+		description="Sends one CAMERA_CONTROL request to a streamer's control port and prints the result",
+	)
+	parser.add_argument("--host", type=str, default="127.0.0.1", help="Streamer IP address")
+	parser.add_argument(
+		"--port",
+		type=int_in_range("port", VALID_PORT_MIN, VALID_PORT_MAX),
+		default=5551,
+		help="Streamer --control-port",
+	)
+	parser.add_argument("--cameras", type=int, nargs="+", default=None, help="Camera IDs (default: every camera)")
+	for name in CAMERA_CONTROLS:
+		parser.add_argument(f"--{name.replace('_', '-')}", type=str, default=None, help=f"Value or '{CAMERA_CONTROL_AUTO}'")
+	return parser.parse_args()
+
+
+if __name__ == "__main__":
+	args = handle_arguments()
+	controls = {}
+	for name in CAMERA_CONTROLS:
+		value = getattr(args, name)
+		if value is not None:
+			controls[name] = value if value.lower() == CAMERA_CONTROL_AUTO else int(value)
+	request = {"type": CAMERA_CONTROL_MESSAGE_TYPE, "request_id": uuid.uuid4().hex, "controls": controls}
+	if args.cameras is not None:
+		request["cameras"] = args.cameras
+
+	client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	client.settimeout(CONTROL_REPLY_TIMEOUT_SECONDS)
+	try:
+		client.sendto(json.dumps(request).encode("utf8"), (args.host, args.port))
+		reply, _addr = client.recvfrom(CONTROL_REPLY_MAX_BYTES)
+		print(json.dumps(json.loads(reply.decode("utf-8")), indent=2))
+	except socket.timeout:
+		logger.error(f"No CAMERA_CONTROL_RESULT from {args.host}:{args.port}")
+		exit(1)
+	finally:
+		client.close()
@@ -0,0 +1,281 @@
+import errno
+import fcntl
+import json
+import os
+import re
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+from common_utils import get_logger
+
+logger = get_logger(__name__)
+
+CAMERA_CACHE_FILE_NAME = ".camera_cache.json"
+CAMERA_CACHE_VERSION = 1
+VIDEO_DEVICE_DIR = "/dev"
+VIDEO_DEVICE_PATTERN = re.compile(r"^video(\d+)$")
+
+# struct v4l2_capability / v4l2_fmtdesc / v4l2_frmsizeenum / v4l2_frmivalenum from linux/videodev2.h
+V4L2_CAPABILITY = struct.Struct("=16s32s32sIII3I")
+V4L2_FMTDESC = struct.Struct("=III32sII3I")
+V4L2_FRMSIZEENUM = struct.Struct("=III6I2I")
+V4L2_FRMIVALENUM = struct.Struct("=IIIII6I2I")
+VIDIOC_QUERYCAP = 0x80685600
+VIDIOC_ENUM_FMT = 0xC0405602
+VIDIOC_ENUM_FRAMESIZES = 0xC02C564A
+VIDIOC_ENUM_FRAMEINTERVALS = 0xC034564B
+
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_VIDEO_CAPTURE_MPLANE = 0x00001000
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE = 9
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMIVAL_TYPE_DISCRETE = 1
+# Safety net against drivers that never return EINVAL
+MAX_ENUM_ENTRIES = 256
+
+
+class CameraInfo:
+	"""One V4L2 video capture node and the modes it advertises."""
+	def __init__(
+		self,
+		path: str,
+		driver: str,
+		card: str,
+		bus_info: str,
+		version: int,
+		formats: List[Dict[str, Any]],
+	):
+		self.path = path
+		self.driver = driver
+		self.card = card
+		self.bus_info = bus_info
+		self.version = version
+		self.formats = formats
+
+	@property
+	def index(self) -> Optional[int]:
+		"""The N of /dev/videoN, or None for nodes named otherwise."""
+		match = VIDEO_DEVICE_PATTERN.match(os.path.basename(self.path))
+		return int(match.group(1)) if match else None
+
+	@property
+	def cache_key(self) -> str:
+		return f"{self.path}|{self.bus_info}"
+
+	def describe(self) -> str:
+		modes = ", ".join(
+			f"{fmt['fourcc']} {size['width']}x{size['height']}"
+			+ (f"@{'/'.join(f'{rate:g}' for rate in size['fps'])}" if size["fps"] else "")
+			for fmt in self.formats
+			for size in fmt["sizes"]
+		)
+		return f"{self.path} ({self.card}, {self.bus_info}): {modes or 'no discrete modes'}"
+
+
+def _c_string(raw: bytes) -> str:
+	return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+
+def _fourcc(code: int) -> str:
+	return "".join(chr((code >> shift) & 0xFF) for shift in (0, 8, 16, 24)).strip()
+
+
+def _ioctl(fd: int, request: int, layout: struct.Struct, *fields) -> Optional[tuple]:
+	"""Run one V4L2 ioctl; returns the unpacked struct, or None at the end of an enumeration."""
+	buffer = bytearray(layout.pack(*fields))
+	try:
+		fcntl.ioctl(fd, request, buffer, True)
+	except OSError as exc:
+		if exc.errno in (errno.EINVAL, errno.ENOTTY):
+			return None
+		raise
+	return layout.unpack(buffer)
+
+
+def _query_capability(fd: int) -> Optional[tuple]:
+	result = _ioctl(fd, VIDIOC_QUERYCAP, V4L2_CAPABILITY, b"", b"", b"", 0, 0, 0, 0, 0, 0)
+	if result is None:
+		return None
+	driver, card, bus_info, version, capabilities, device_caps = result[:6]
+	# device_caps describes this node; capabilities covers every node of the physical device
+	caps = device_caps if capabilities & V4L2_CAP_DEVICE_CAPS else capabilities
+	return _c_string(driver), _c_string(card), _c_string(bus_info), version, caps
+
+
+def _frame_rates(fd: int, pixel_format: int, width: int, height: int) -> List[float]:
+	rates = []
+	for index in range(MAX_ENUM_ENTRIES):
+		result = _ioctl(
+			fd, VIDIOC_ENUM_FRAMEINTERVALS, V4L2_FRMIVALENUM,
+			index, pixel_format, width, height, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+		)
+		if result is None:
+			break
+		interval_type, numerator, denominator = result[4:7]
+		if interval_type != V4L2_FRMIVAL_TYPE_DISCRETE:
+			# Stepwise/continuous: report the fastest rate only
+			if numerator:
+				rates.append(round(denominator / numerator, 3))
+			break
+		if numerator:
+			rates.append(round(denominator / numerator, 3))
+	return sorted(set(rates), reverse=True)
+
+
+def _frame_sizes(fd: int, pixel_format: int) -> List[Dict[str, Any]]:
+	sizes = []
+	for index in range(MAX_ENUM_ENTRIES):
+		result = _ioctl(fd, VIDIOC_ENUM_FRAMESIZES, V4L2_FRMSIZEENUM, index, pixel_format, 0, 0, 0, 0, 0, 0, 0, 0, 0)
+		if result is None:
+			break
+		size_type = result[2]
+		if size_type == V4L2_FRMSIZE_TYPE_DISCRETE:
+			width, height = result[3], result[4]
+		else:
+			# Stepwise/continuous: min/max/step layout, report the largest size
+			width, height = result[4], result[7]
+		sizes.append({"width": width, "height": height, "fps": _frame_rates(fd, pixel_format, width, height)})
+		if size_type != V4L2_FRMSIZE_TYPE_DISCRETE:
+			break
+	return sizes
+
+
+def _formats(fd: int, buffer_type: int) -> List[Dict[str, Any]]:
+	formats = []
+	for index in range(MAX_ENUM_ENTRIES):
+		result = _ioctl(fd, VIDIOC_ENUM_FMT, V4L2_FMTDESC, index, buffer_type, 0, b"", 0, 0, 0, 0, 0)
+		if result is None:
+			break
+		description, pixel_format = result[3], result[4]
+		formats.append({
+			"fourcc": _fourcc(pixel_format),
+			"description": _c_string(description),
+			"sizes": _frame_sizes(fd, pixel_format),
+		})
+	return formats
+
+
+def _camera_cache_path() -> str:
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), CAMERA_CACHE_FILE_NAME)
+
+
+def _read_camera_cache(cache_path: str) -> Dict[str, Any]:
+	try:
+		with open(cache_path, "r", encoding="utf-8") as f:
+			payload = json.load(f)
+	except FileNotFoundError:
+		return {}
+	except (OSError, json.JSONDecodeError) as exc:
+		logger.warning(f"[camera-cache] ignoring unreadable cache {cache_path}: {exc}")
+		return {}
+
+	if not isinstance(payload, dict) or payload.get("version") != CAMERA_CACHE_VERSION:
+		return {}
+	entries = payload.get("entries", {})
+	return entries if isinstance(entries, dict) else {}
+
+
+def _write_camera_cache(cache_path: str, entries: Dict[str, Any]):
+	temp_path = f"{cache_path}.tmp"
+	try:
+		with open(temp_path, "w", encoding="utf-8") as f:
+			json.dump({"version": CAMERA_CACHE_VERSION, "entries": entries}, f, indent=2)
+		os.replace(temp_path, cache_path)
+	except OSError as exc:
+		logger.warning(f"[camera-cache] failed to write {cache_path}: {exc}")
+
+
+def _video_device_paths() -> List[str]:
+	try:
+		names = os.listdir(VIDEO_DEVICE_DIR)
+	except OSError:
+		return []
+	indexed = [
+		(int(match.group(1)), name)
+		for name in names
+		for match in [VIDEO_DEVICE_PATTERN.match(name)]
+		if match
+	]
+	return [os.path.join(VIDEO_DEVICE_DIR, name) for _, name in sorted(indexed)]
+
+
+def probe_camera(path: str, cached: Optional[Dict[str, Any]] = None) -> Optional[CameraInfo]:
+	"""QUERYCAP one node; enumerate its modes unless `cached` still matches it. None if not a capture node."""
+	try:
+		# Non-blocking and without streaming, so a node another process is capturing from stays untouched
+		fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+	except OSError as exc:
+		logger.debug(f"[cameras] cannot open {path}: {exc}")
+		return None
+	try:
+		capability = _query_capability(fd)
+		if capability is None:
+			return None
+		driver, card, bus_info, version, caps = capability
+		if caps & V4L2_CAP_VIDEO_CAPTURE:
+			buffer_type = V4L2_BUF_TYPE_VIDEO_CAPTURE
+		elif caps & V4L2_CAP_VIDEO_CAPTURE_MPLANE:
+			buffer_type = V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE
+		else:
+			# e.g. the UVC metadata node that sits next to every USB camera
+			return None
+
+		if (
+			isinstance(cached, dict)
+			and cached.get("bus_info") == bus_info
+			and cached.get("driver") == driver
+			and cached.get("card") == card
+			and cached.get("version") == version
+			and isinstance(cached.get("formats"), list)
+		):
+			formats = cached["formats"]
+		else:
+			formats = _formats(fd, buffer_type)
+		return CameraInfo(path, driver, card, bus_info, version, formats)
+	except OSError as exc:
+		logger.debug(f"[cameras] ioctl failed on {path}: {exc}")
+		return None
+	finally:
+		os.close(fd)
+
+
+def enumerate_cameras(use_cache: bool = True, cache_path: Optional[str] = None) -> List[CameraInfo]:
+	"""Return every V4L2 capture node under /dev, ordered by device number.
+
+	QUERYCAP always runs so unplugged or renumbered devices are noticed; the slower
+	format/size/interval enumeration is reused from the cache while the device path,
+	USB bus ID, driver, card and driver version are unchanged.
+	"""
+	started = time.monotonic()
+	cache_path = cache_path or _camera_cache_path()
+	entries = _read_camera_cache(cache_path) if use_cache else {}
+	cameras = []
+	for path in _video_device_paths():
+		# The bus ID is only known after QUERYCAP, so look the entry up by path first
+		cached = next((entry for key, entry in entries.items() if key.split("|", 1)[0] == path), None)
+		camera = probe_camera(path, cached)
+		if camera is not None:
+			cameras.append(camera)
+
+	fresh_entries = {
+		camera.cache_key: {
+			"driver": camera.driver,
+			"card": camera.card,
+			"bus_info": camera.bus_info,
+			"version": camera.version,
+			"formats": camera.formats,
+		}
+		for camera in cameras
+	}
+	if use_cache and fresh_entries != entries:
+		_write_camera_cache(cache_path, fresh_entries)
+	logger.debug(f"[cameras] found {len(cameras)} capture node(s) in {(time.monotonic() - started) * 1000:.1f}ms")
+	return cameras
+
+
+if __name__ == "__main__":
+	for camera in enumerate_cameras():
+		print(camera.describe())
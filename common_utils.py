@@ -1,13 +1,21 @@
 import argparse
+import atexit
+import ipaddress
 import json
+import multiprocessing.util
 import os
+import queue
 import signal
+import threading
+import time
 from typing import Any, Callable, Dict, Iterable, List, Optional
 import logging
+import logging.handlers
 
 
 DEFAULTS_FILE_NAME = "argument_defaults.json"
 DISCOVERY_MESSAGE_TYPE = "WRECORDER_DISCOVERY"
+DISCOVERY_PROBE_MESSAGE_TYPE = "DISCOVERY_PROBE"
 DISCOVERY_VERSION = 1
 DISCOVERY_TEXT_ENCODING = "utf8"
 VALID_PORT_MIN = 1
@@ -15,6 +23,19 @@ VALID_PORT_MAX = 65535
 MULTICAST_IP = "224.1.1.1"  # Hardcoded constant for all streamer/receiver pairs
 CAMERA_FRAME_WIDTH = 640
 CAMERA_FRAME_HEIGHT = 640
+RECORDING_MUXERS = {"mp4": "mp4mux", "mkv": "matroskamux"}
+NANOSECONDS_PER_SECOND = 1_000_000_000
+DEFAULTS_POLL_SECONDS = 1.0
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+LOG_BACKENDS = ["sync", "async"]
+LOG_LEVEL_ENV = "WRECORDER_LOG_LEVEL"
+LOG_BACKEND_ENV = "WRECORDER_LOG_BACKEND"
+LOG_RATE_LIMIT_ENV = "WRECORDER_LOG_RATE_LIMIT"
+LOG_RATE_LIMIT_BURST = 20
+LOG_RATE_LIMIT_WINDOW_SECONDS = 10.0
+LOG_RATE_LIMIT_MAX_SITES = 4096
+LOG_QUEUE_MAX_RECORDS = 10000
+LOG_SUMMARY_INTERVAL_SECONDS = 1.0
 
 
 class LoggingFormatter(logging.Formatter):
@@ -41,22 +62,290 @@ class LoggingFormatter(logging.Formatter):
 		return f"{log_color}{message}{self.ANSI_RESET}"
 
 
+class RecordingConfig:
+	def __init__(
+		self,
+		directory: str,
+		segment_seconds: float,
+		container: str = "mkv",
+		enabled: bool = False,
+	):
+		if container not in RECORDING_MUXERS:
+			raise ValueError(f"unsupported recording container: {container}")
+		self.directory = directory
+		self.segment_seconds = segment_seconds
+		self.container = container
+		self.enabled = enabled
+
+
+def recording_location_pattern(config: RecordingConfig, label: str) -> str:
+	"""splitmuxsink location for one recording session, e.g. `<dir>/cam-5555-20260101-120000-00000.mkv`."""
+	started = time.strftime("%Y%m%d-%H%M%S")
+	return os.path.join(config.directory, f"{label}-{started}-%05d.{config.container}")
+
+
+def build_splitmux_description(
+	config: RecordingConfig, location: str, name: str = "recsink", request_keyframes: bool = False
+) -> str:
+	"""gst-launch fragment for a time-segmented splitmuxsink fed with parsed H.264."""
+	max_size_time = int(config.segment_seconds * NANOSECONDS_PER_SECOND)
+	return (
+		f'splitmuxsink name={name} location="{location}" max-size-time={max_size_time} '
+		f"muxer-factory={RECORDING_MUXERS[config.container]}"
+		+ (" send-keyframe-requests=true" if request_keyframes else "")
+	)
+
+
+class LogRateLimiter(logging.Filter):
+	"""Per call site, lets `burst` records through per `window` seconds and counts the rest.
+
+	Below WARNING, a record repeating the last one let through from its call site is also
+	held back. The count of held-back records is appended to the next record let through
+	from that site, or written by a background writer once the window has passed
+	(`drain_summaries`), so nothing is held back without a summary.
+	"""
+
+	def __init__(self, burst: int = LOG_RATE_LIMIT_BURST, window: float = LOG_RATE_LIMIT_WINDOW_SECONDS):
+		super().__init__()
+		self.burst = burst
+		self.window = window
+		# (logger name, file, line) -> [window start, passed, suppressed, last passed message, last suppressed record]
+		self._sites: Dict[tuple, list] = {}
+		self._lock = threading.Lock()
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		if self.burst <= 0:
+			return True
+		key = (record.name, record.pathname, record.lineno)
+		message = record.getMessage()
+		with self._lock:
+			site = self._sites.get(key)
+			if site is None:
+				if len(self._sites) >= LOG_RATE_LIMIT_MAX_SITES:
+					self._sites.clear()
+				site = self._sites[key] = [record.created, 0, 0, None, None]
+			suppressed = 0
+			if record.created - site[0] >= self.window:
+				suppressed = site[2]
+				site[0], site[1], site[2], site[3] = record.created, 0, 0, None
+			repeat = message == site[3] and record.levelno < logging.WARNING
+			if site[1] >= self.burst or repeat:
+				site[2] += suppressed + 1
+				site[4] = record
+				return False
+			site[1] += 1
+			site[3] = message
+		if suppressed:
+			record.msg = f"{message} [{suppressed} similar message(s) suppressed]"
+			record.args = None
+		return True
+
+	def drain_summaries(self, now: float = None, force: bool = False) -> List[logging.LogRecord]:
+		"""Summaries for sites whose window has passed; `force` takes every pending one (at exit)."""
+		now = time.time() if now is None else now
+		summaries = []
+		with self._lock:
+			for key, site in list(self._sites.items()):
+				if site[2] and (force or now - site[0] >= self.window):
+					last = site[4]
+					summaries.append(logging.makeLogRecord(dict(
+						vars(last),
+						msg=f"{last.getMessage()} [last of {site[2]} similar message(s) suppressed]",
+						args=None,
+					)))
+					del self._sites[key]
+		return summaries
+
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+	"""Hands records to a background writer; the calling thread never formats or writes.
+
+	The queue is bounded, and a full queue drops the record instead of blocking, so a log
+	storm cannot stall a GStreamer streaming thread. Drops are reported by the writer.
+	"""
+
+	def __init__(self, target: logging.Handler, rate_limiter: LogRateLimiter):
+		super().__init__(queue.Queue(LOG_QUEUE_MAX_RECORDS))
+		self.target = target
+		self.rate_limiter = rate_limiter
+		self.dropped = 0
+		self._stopped = threading.Event()
+		self._writer = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+		self._writer.start()
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		# Same process, so the record itself can be queued; formatting happens on the writer
+		return record
+
+	def enqueue(self, record: logging.LogRecord):
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+	def _write_loop(self):
+		reported_drops = 0
+		while True:
+			try:
+				record = self.queue.get(timeout=LOG_SUMMARY_INTERVAL_SECONDS)
+			except queue.Empty:
+				record = None
+			if record is not None:
+				self.target.handle(record)
+			elif self._stopped.is_set():
+				for summary in self.rate_limiter.drain_summaries(force=True):
+					self.target.handle(summary)
+				break
+			for summary in self.rate_limiter.drain_summaries():
+				self.target.handle(summary)
+			if self.dropped != reported_drops:
+				self.target.handle(logging.makeLogRecord({
+					"name": __name__,
+					"levelno": logging.WARNING,
+					"levelname": logging.getLevelName(logging.WARNING),
+					"msg": f"[logging] log queue full, dropped {self.dropped - reported_drops} record(s)",
+				}))
+				reported_drops = self.dropped
+
+	def close(self):
+		# Drain what is queued, then stop the writer
+		self._stopped.set()
+		self._writer.join(timeout=LOG_SUMMARY_INTERVAL_SECONDS * 2)
+		super().close()
+
+
+class LogSummaryWriter:
+	"""Writes the rate limiter's summaries for the sync backend, where no writer thread exists."""
+
+	def __init__(self, target: logging.Handler, rate_limiter: LogRateLimiter):
+		self.target = target
+		self.rate_limiter = rate_limiter
+		self._stopped = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="log-summaries", daemon=True)
+		self._thread.start()
+
+	def _run(self):
+		while not self._stopped.wait(LOG_SUMMARY_INTERVAL_SECONDS):
+			self._write(force=False)
+
+	def _write(self, force: bool):
+		for summary in self.rate_limiter.drain_summaries(force=force):
+			self.target.handle(summary)
+
+	def close(self):
+		self._stopped.set()
+		self._thread.join(timeout=LOG_SUMMARY_INTERVAL_SECONDS * 2)
+		self._write(force=True)
+
+
+def _close_at_exit(closeable):
+	atexit.register(closeable.close)
+	# Spawned worker processes leave through multiprocessing, which skips atexit
+	multiprocessing.util.Finalize(None, closeable.close, exitpriority=0)
+
+
 loggers = {}
+_log_handler: Optional[logging.Handler] = None
+
+
+def _log_level_from_env() -> int:
+	return logging.getLevelName(os.environ.get(LOG_LEVEL_ENV, LOG_LEVELS[0]).upper())
+
+
+def _build_log_handler(backend: str, rate_limit: int) -> logging.Handler:
+	stream_handler = logging.StreamHandler()
+	stream_handler.setFormatter(LoggingFormatter())
+	rate_limiter = LogRateLimiter(burst=rate_limit)
+	if backend == "async":
+		handler = AsyncLogHandler(stream_handler, rate_limiter)
+		_close_at_exit(handler)
+	elif rate_limit > 0:
+		handler = stream_handler
+		_close_at_exit(LogSummaryWriter(stream_handler, rate_limiter))
+	else:
+		# Sync and unlimited (the default): every record is written as it is logged
+		return stream_handler
+	handler.addFilter(rate_limiter)
+	return handler
+
+
+def _shared_log_handler() -> logging.Handler:
+	global _log_handler
+	if _log_handler is None:
+		_log_handler = _build_log_handler(
+			os.environ.get(LOG_BACKEND_ENV, LOG_BACKENDS[0]),
+			int(os.environ.get(LOG_RATE_LIMIT_ENV, 0)),
+		)
+	return _log_handler
+
+
+def configure_logging(level: str, backend: str, rate_limit: int):
+	"""Apply logging settings from config to every logger, and export them for child processes.
+
+	Before this runs (module import time), loggers use WRECORDER_LOG_LEVEL,
+	WRECORDER_LOG_BACKEND and WRECORDER_LOG_RATE_LIMIT from the environment, which is also
+	how spawned stream and decode processes pick the settings up.
+	"""
+	global _log_handler
+	os.environ[LOG_LEVEL_ENV] = level.upper()
+	os.environ[LOG_BACKEND_ENV] = backend
+	os.environ[LOG_RATE_LIMIT_ENV] = str(rate_limit)
+	previous = _log_handler
+	_log_handler = _build_log_handler(backend, rate_limit)
+	for logger in loggers.values():
+		logger.setLevel(level.upper())
+		if previous is not None:
+			logger.removeHandler(previous)
+		logger.addHandler(_log_handler)
+	if previous is not None:
+		previous.close()
+
+
+def add_logging_arguments(parser: argparse.ArgumentParser):
+	parser.add_argument(
+		"--log-level",
+		type=str.upper,
+		choices=LOG_LEVELS,
+		help="Lowest level that is logged",
+	)
+	parser.add_argument(
+		"--log-backend",
+		type=str,
+		choices=LOG_BACKENDS,
+		help="Write log lines on the calling thread (sync) or on a background writer thread (async)",
+	)
+	parser.add_argument(
+		"--log-rate-limit",
+		type=int_in_range("log-rate-limit", 0),
+		help=f"Log records let through per call site every {LOG_RATE_LIMIT_WINDOW_SECONDS:g} seconds before the rest are counted and summarized (0 disables)",
+	)
 
 
 def get_logger(name: str) -> logging.Logger:
 	if name in loggers:
 		return loggers[name]
 	logger = logging.getLogger(name)
-	logger.setLevel(logging.DEBUG)
+	logger.setLevel(_log_level_from_env())
 	if not logger.hasHandlers():
-		handler = logging.StreamHandler()
-		handler.setFormatter(LoggingFormatter())
-		logger.addHandler(handler)
+		logger.addHandler(_shared_log_handler())
 	loggers[name] = logger
 	return logger
 
 
+def init_gstreamer():
+	"""Import and initialize GStreamer on first use and return the `Gst` module.
+
+	GStreamer is only needed by processes that build pipelines, so modules call this when
+	they create their first pipeline instead of at import time.
+	"""
+	import gi
+	gi.require_version('Gst', '1.0')
+	from gi.repository import Gst
+	if not Gst.is_initialized():
+		Gst.init(None)
+	return Gst
+
+
 def is_valid_port(port: Any) -> bool:
 	return isinstance(port, int) and VALID_PORT_MIN <= port <= VALID_PORT_MAX
 
@@ -99,6 +388,19 @@ def parse_discovery_payload(
 	except (UnicodeDecodeError, json.JSONDecodeError):
 		return None
 
+	return normalize_discovery_payload(payload, streamer_name_filter)
+
+
+def normalize_discovery_payload(
+	payload: Any,
+	streamer_name_filter: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+	"""Validate a decoded discovery payload (from the wire or a local cache).
+
+	Returns a normalized dict for valid payloads, otherwise None.
+	"""
+	if not isinstance(payload, dict):
+		return None
 	if payload.get("type") != DISCOVERY_MESSAGE_TYPE:
 		return None
 	if payload.get("version") != DISCOVERY_VERSION:
@@ -109,6 +411,8 @@ def parse_discovery_payload(
 	base_port = payload.get("base_port")
 	stream_count = payload.get("stream_count")
 	mosaic = payload.get("mosaic", False)
+	announced_at = payload.get("announced_at")
+	session_id = payload.get("session_id")
 
 	if streamer_name_filter and streamer_name != streamer_name_filter:
 		return None
@@ -123,6 +427,12 @@ def parse_discovery_payload(
 		return None
 	if not isinstance(mosaic, bool):
 		return None
+	if announced_at is not None and (
+		isinstance(announced_at, bool) or not isinstance(announced_at, (int, float))
+	):
+		return None
+	if session_id is not None and not isinstance(session_id, str):
+		return None
 
 	return {
 		"streamer_name": streamer_name,
@@ -130,7 +440,35 @@ def parse_discovery_payload(
 		"base_port": base_port,
 		"stream_count": stream_count,
 		"mosaic": mosaic,
+		"announced_at": announced_at,
+		"session_id": session_id,
+	}
+
+
+def build_discovery_probe(streamer_name_filter: Optional[str] = None) -> bytes:
+	"""Build the probe a receiver broadcasts to ask streamers to announce immediately."""
+	payload = {
+		"type": DISCOVERY_PROBE_MESSAGE_TYPE,
+		"version": DISCOVERY_VERSION,
+		"streamer_name_filter": streamer_name_filter,
 	}
+	return json.dumps(payload).encode(DISCOVERY_TEXT_ENCODING)
+
+
+def parse_discovery_probe(payload: Any) -> Optional[Dict[str, Any]]:
+	"""Validate a decoded probe payload. Returns a normalized dict, otherwise None."""
+	if not isinstance(payload, dict):
+		return None
+	if payload.get("type") != DISCOVERY_PROBE_MESSAGE_TYPE:
+		return None
+	if payload.get("version") != DISCOVERY_VERSION:
+		return None
+
+	streamer_name_filter = payload.get("streamer_name_filter")
+	if streamer_name_filter is not None and not isinstance(streamer_name_filter, str):
+		return None
+
+	return {"streamer_name_filter": streamer_name_filter or None}
 
 
 def install_stop_signal_handlers(stop_callback: Callable[[], None], logger: logging.Logger, message: str):
@@ -146,12 +484,16 @@ def install_stop_signal_handlers(stop_callback: Callable[[], None], logger: logg
 	signal.signal(signal.SIGTERM, _signal_handler)
 
 
-def apply_required_external_defaults(
+def defaults_file_path(defaults_file_name: str = DEFAULTS_FILE_NAME) -> str:
+	return os.path.join(os.path.dirname(__file__), defaults_file_name)
+
+
+def load_required_external_defaults(
 	parser: argparse.ArgumentParser,
 	section_name: str,
 	defaults_file_name: str = DEFAULTS_FILE_NAME,
-):
-	"""Load strict defaults from JSON and apply to parser.
+) -> Dict[str, Any]:
+	"""Load and validate strict defaults from JSON for this parser.
 
 	Required behavior:
 	- File must exist and be valid JSON
@@ -159,7 +501,7 @@ def apply_required_external_defaults(
 	- No unknown keys for the parser
 	- All optional parser args must have defaults provided
 	"""
-	defaults_path = os.path.join(os.path.dirname(__file__), defaults_file_name)
+	defaults_path = defaults_file_path(defaults_file_name)
 	try:
 		with open(defaults_path, "r", encoding="utf-8") as f:
 			payload = json.load(f)
@@ -195,13 +537,126 @@ def apply_required_external_defaults(
 	missing_keys = sorted(dest for dest in required_dests if dest not in merged)
 	if missing_keys:
 		raise RuntimeError(f"missing defaults keys for {section_name}: {missing_keys}")
+	return merged
 
+
+def apply_required_external_defaults(
+	parser: argparse.ArgumentParser,
+	section_name: str,
+	defaults_file_name: str = DEFAULTS_FILE_NAME,
+):
+	"""Load strict defaults from JSON (see `load_required_external_defaults`) and apply to parser."""
+	merged = load_required_external_defaults(parser, section_name, defaults_file_name)
 	parser.set_defaults(**merged)
 	get_logger(__name__).info(
 		f"loaded {len(merged)} defaults for section '{section_name}' from {defaults_file_name}"
 	)
 
 
+class DefaultsReloader:
+	"""Re-reads the defaults file when it changes (or on request) and reports changed arguments.
+
+	The file's mtime is polled, and `request_reload` (e.g. from SIGHUP) forces a reload.
+	The command line is parsed again on top of the new defaults, so CLI flags keep
+	priority exactly as at startup. `on_change` gets `{dest: (old, new)}` for every argument
+	that changed. A file that fails validation is logged and the running config is kept.
+	"""
+
+	def __init__(
+		self,
+		parser: argparse.ArgumentParser,
+		section_name: str,
+		args: argparse.Namespace,
+		on_change: Callable[[Dict[str, Any]], None],
+		poll_interval: float = DEFAULTS_POLL_SECONDS,
+		defaults_file_name: str = DEFAULTS_FILE_NAME,
+	):
+		self.parser = parser
+		self.section_name = section_name
+		self.args = args
+		self.on_change = on_change
+		self.poll_interval = poll_interval
+		self.defaults_file_name = defaults_file_name
+		self._reload_requested = threading.Event()
+		self._mtime = self._current_mtime()
+		self._logger = get_logger(__name__)
+
+	def _current_mtime(self) -> Optional[float]:
+		try:
+			return os.stat(defaults_file_path(self.defaults_file_name)).st_mtime
+		except OSError:
+			return None
+
+	def request_reload(self):
+		self._reload_requested.set()
+
+	def _validate(self, merged: Dict[str, Any]):
+		# argparse only checks defaults given as strings, so run each value through its type and choices
+		for action in self.parser._actions:
+			value = merged.get(action.dest)
+			if value is None or not action.option_strings:
+				continue
+			for item in value if isinstance(value, list) else [value]:
+				try:
+					if action.type is not None and not isinstance(item, bool):
+						action.type(str(item))
+				except (argparse.ArgumentTypeError, ValueError) as exc:
+					raise RuntimeError(f"invalid value for {action.dest}: {item!r} ({exc})") from exc
+				if action.choices is not None and item not in action.choices:
+					raise RuntimeError(f"invalid value for {action.dest}: {item!r} (expected one of {list(action.choices)})")
+
+	def reload(self) -> Dict[str, Any]:
+		try:
+			merged = load_required_external_defaults(self.parser, self.section_name, self.defaults_file_name)
+			self._validate(merged)
+			self.parser.set_defaults(**merged)
+			args = self.parser.parse_args()
+		except (RuntimeError, SystemExit) as exc:
+			# argparse exits on invalid values; neither case may take the running streamer down
+			self._logger.error(f"[defaults] reload rejected, keeping running config: {exc}")
+			return {}
+		old = vars(self.args)
+		changes = {
+			dest: (old.get(dest), value)
+			for dest, value in vars(args).items()
+			if old.get(dest) != value
+		}
+		self.args = args
+		if not changes:
+			self._logger.info(f"[defaults] reloaded {self.defaults_file_name}: nothing changed")
+			return changes
+		self._logger.info(
+			f"[defaults] reloaded {self.defaults_file_name}: "
+			+ ", ".join(f"{dest} {before!r} -> {after!r}" for dest, (before, after) in sorted(changes.items()))
+		)
+		self.on_change(changes)
+		return changes
+
+	def run(self, stop_event):
+		while not stop_event.is_set():
+			mtime = self._current_mtime()
+			if self._reload_requested.is_set() or mtime != self._mtime:
+				self._reload_requested.clear()
+				self._mtime = mtime
+				try:
+					self.reload()
+				except Exception as exc:
+					self._logger.error(f"[defaults] applying reloaded config failed: {exc}")
+			stop_event.wait(self.poll_interval)
+
+
+def install_reload_signal_handler(reload_callback: Callable[[], None], logger: logging.Logger):
+	"""Install a SIGHUP handler that requests a configuration reload."""
+
+	def _signal_handler(signum, frame):
+		_ = signum
+		_ = frame
+		logger.info("SIGHUP received, reloading configuration...")
+		reload_callback()
+
+	signal.signal(signal.SIGHUP, _signal_handler)
+
+
 def int_in_range(name: str, minimum: int, maximum: int = None):
 	def _validator(value: str) -> int:
 		try:
@@ -232,5 +687,46 @@ def float_in_range(name: str, minimum: float, maximum: float = None):
 
 	return _validator
 
+def parse_ipv4_endpoint(value: str, default_port: Optional[int] = None) -> tuple:
+	"""Split `a.b.c.d[:port]` into (ip, port); the port falls back to `default_port`."""
+	host, separator, port = value.strip().partition(":")
+	ipaddress.IPv4Address(host)
+	if not separator:
+		return host, default_port
+	parsed = int(port)
+	if not VALID_PORT_MIN <= parsed <= VALID_PORT_MAX:
+		raise ValueError(f"port must be between {VALID_PORT_MIN} and {VALID_PORT_MAX}")
+	return host, parsed
+
+def ipv4_endpoint(name: str):
+	def _validator(value: str) -> str:
+		try:
+			parse_ipv4_endpoint(value)
+		except ValueError as exc:
+			raise argparse.ArgumentTypeError(f"{name} must be an IPv4 address with an optional :port ({exc})") from exc
+		return value
+
+	return _validator
+
+def parse_camera_weight(value: str) -> tuple:
+	"""Split `camera_id=weight` into (camera_id, weight)."""
+	camera_id, separator, weight = value.strip().partition("=")
+	if not separator:
+		raise ValueError("expected camera_id=weight")
+	parsed_id, parsed_weight = int(camera_id), float(weight)
+	if parsed_id < 0 or parsed_weight <= 0:
+		raise ValueError("camera id must be >= 0 and weight > 0")
+	return parsed_id, parsed_weight
+
+def camera_weight(name: str):
+	def _validator(value: str) -> str:
+		try:
+			parse_camera_weight(value)
+		except ValueError as exc:
+			raise argparse.ArgumentTypeError(f"{name} must be camera_id=weight, e.g. 0=2 ({exc})") from exc
+		return value
+
+	return _validator
+
 def clamp[T](value: T, minimum: T, maximum: T) -> T: # generics in python lmao
 	return max(minimum, min(maximum, value))
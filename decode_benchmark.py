@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import List, Tuple
+
+from common_utils import get_logger, VALID_PORT_MIN, VALID_PORT_MAX, int_in_range
+from receiver_utils import MultiReceiver
+from decode_workers import DecodeWorkerPool
+
+logger = get_logger(__name__)
+
+BENCHMARK_STREAM_PREFIX = "bench"
+WARMUP_SECONDS = 3.0
+# A stream counts as handled when it keeps this share of the sent frame rate
+HANDLED_FPS_RATIO = 0.9
+DISPLAY_POLL_SECONDS = 1 / 30
+# Entry points whose import cost is profiled (in fresh interpreters, like spawned children)
+# camera_streamer/camera_receiver are what spawned children re-import; *_app is what the parent process loads
+STARTUP_PROFILE_MODULES = [
+	"camera_streamer",
+	"streamer_app",
+	"streamer_utils",
+	"camera_receiver",
+	"receiver_app",
+	"receiver_utils",
+	"decode_workers",
+]
+STARTUP_PROFILE_TOP_IMPORTS = 5
+FIRST_PACKET_TIMEOUT_SECONDS = 30.0
+FIRST_PACKET_POLL_SECONDS = 0.05
+
+
+def handle_arguments():
+	parser = argparse.ArgumentParser(
+		prog="decode_benchmark",
+		description="Measure how many local test streams one receiver decodes at full rate, in-process vs decode workers",
+	)
+	parser.add_argument("--counts", type=int, nargs="+", default=[1, 2, 4, 8, 12, 16], help="Stream counts to try")
+	parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode worker processes for worker mode")
+	parser.add_argument("--modes", nargs="+", choices=["threads", "workers"], default=["threads", "workers"])
+	parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per run")
+	parser.add_argument("--fps", type=int, default=30, help="Frame rate of each test stream")
+	parser.add_argument("--width", type=int, default=640)
+	parser.add_argument("--height", type=int, default=480)
+	parser.add_argument(
+		"--base-port",
+		type=int_in_range("base-port", VALID_PORT_MIN, VALID_PORT_MAX),
+		default=6555,
+		help="First local UDP port used by the test streams",
+	)
+	parser.add_argument(
+		"--startup-profile",
+		action="store_true",
+		help="Also print import times per entry module, GStreamer init time and the streamer's time to first packet",
+	)
+	return parser.parse_args()
+
+
+def start_test_streams(ports: List[int], fps: int, width: int, height: int) -> subprocess.Popen:
+	"""Send one encoded test pattern per port to localhost, the same way the streamer encodes."""
+	branches = [
+		f"videotestsrc is-live=true pattern=ball ! video/x-raw,width={width},height={height},framerate={fps}/1 ! "
+		f"x264enc tune=zerolatency bitrate=500 speed-preset=ultrafast key-int-max={max(1, fps // 2)} bframes=0 ! "
+		f"rtph264pay config-interval=1 pt=96 ! udpsink host=127.0.0.1 port={port} sync=false"
+		for port in ports
+	]
+	return subprocess.Popen(["gst-launch-1.0", "-q"] + " ".join(branches).split(), stdout=subprocess.DEVNULL)
+
+
+def _simulate_display(receiver, stop_event: threading.Event):
+	# Same per-frame work as StreamDisplayWidget.update_frames, minus Qt
+	while not stop_event.is_set():
+		for name in receiver.get_sorted_stream_names():
+			frame = receiver.get_frame(name)
+			if frame is not None:
+				frame[:, :, ::-1].tobytes()
+		time.sleep(DISPLAY_POLL_SECONDS)
+
+
+def _process_cpu_seconds(pids: List[int]) -> float:
+	clock_ticks = os.sysconf("SC_CLK_TCK")
+	total = 0.0
+	for pid in pids:
+		try:
+			with open(f"/proc/{pid}/stat", "r", encoding="utf-8") as f:
+				fields = f.read().rsplit(")", 1)[1].split()
+		except OSError:
+			continue
+		# utime and stime are fields 14 and 15 of /proc/<pid>/stat
+		total += (int(fields[11]) + int(fields[12])) / clock_ticks
+	return total
+
+
+def _package_dir() -> str:
+	return os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_imports(module: str) -> Tuple[float, List[Tuple[float, str]]]:
+	"""Import `module` in a fresh interpreter with -X importtime.
+
+	Returns the module's cumulative import time in ms and its heaviest imports by self time.
+	"""
+	result = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {module}"],
+		capture_output=True,
+		text=True,
+		cwd=_package_dir(),
+	)
+	total_ms = float("nan")
+	imports = []
+	for line in result.stderr.splitlines():
+		if not line.startswith("import time:") or "self [us]" in line:
+			continue
+		self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+		name = name.strip()
+		imports.append((int(self_us) / 1000, name))
+		if name == module:
+			total_ms = int(cumulative_us) / 1000
+	if result.returncode != 0:
+		logger.warning(f"[bench] importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+	return total_ms, sorted(imports, reverse=True)[:STARTUP_PROFILE_TOP_IMPORTS]
+
+
+def profile_gstreamer_init() -> float:
+	"""Milliseconds to import and initialize GStreamer in a fresh interpreter."""
+	code = (
+		"import time; started = time.perf_counter(); "
+		"from common_utils import init_gstreamer; init_gstreamer(); "
+		"print((time.perf_counter() - started) * 1000)"
+	)
+	result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=_package_dir())
+	try:
+		return float(result.stdout.strip().splitlines()[-1])
+	except (ValueError, IndexError):
+		return float("nan")
+
+
+def time_to_first_packet(port: int, control_port: int) -> float:
+	"""Seconds from launching a one-camera simulated streamer until its first RTP packet arrives here."""
+	receiver_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	receiver_socket.bind(("127.0.0.1", port))
+	receiver_socket.settimeout(FIRST_PACKET_POLL_SECONDS)
+	request = json.dumps({"type": "SUBSCRIBE_REQUEST", "receiver_ip": "127.0.0.1", "ports": [port]}).encode("utf8")
+	started = time.monotonic()
+	streamer = subprocess.Popen(
+		[
+			sys.executable, "camera_streamer.py",
+			"--simulate-cameras", "1",
+			"--base-port", str(port),
+			"--control-port", str(control_port),
+			"--announce-discovery", "off",
+			"--mosaic", "off",
+			"--record", "off",
+		],
+		cwd=_package_dir(),
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.DEVNULL,
+	)
+	try:
+		# Subscribe repeatedly: the control server may not be listening yet
+		while time.monotonic() - started < FIRST_PACKET_TIMEOUT_SECONDS:
+			receiver_socket.sendto(request, ("127.0.0.1", control_port))
+			try:
+				receiver_socket.recvfrom(65536)
+				return time.monotonic() - started
+			except socket.timeout:
+				continue
+		return float("nan")
+	finally:
+		receiver_socket.close()
+		streamer.terminate()
+		try:
+			streamer.wait(timeout=5)
+		except subprocess.TimeoutExpired:
+			streamer.kill()
+
+
+def print_startup_profile(args):
+	print(f"{'module':<16} {'import ms':>9}  heaviest imports (self ms)")
+	for module in STARTUP_PROFILE_MODULES:
+		total_ms, heaviest = profile_imports(module)
+		details = ", ".join(f"{name} {self_ms:.1f}" for self_ms, name in heaviest)
+		print(f"{module:<16} {total_ms:>9.1f}  {details}")
+	print(f"GStreamer import + init: {profile_gstreamer_init():.1f} ms")
+	first_packet = time_to_first_packet(args.base_port, args.base_port - 1)
+	print(f"Streamer time to first packet (1 simulated camera): {first_packet * 1000:.0f} ms")
+
+
+def run_once(mode: str, count: int, args) -> dict:
+	ports = [args.base_port + index for index in range(count)]
+	sender = start_test_streams(ports, args.fps, args.width, args.height)
+	if mode == "workers":
+		receiver = DecodeWorkerPool(ports, args.duration, BENCHMARK_STREAM_PREFIX, min(args.workers, count))
+	else:
+		receiver = MultiReceiver(ports, args.duration, BENCHMARK_STREAM_PREFIX)
+	display_stop = threading.Event()
+	display = threading.Thread(target=_simulate_display, args=(receiver, display_stop), daemon=True)
+	try:
+		receiver.start()
+		display.start()
+		time.sleep(WARMUP_SECONDS)
+
+		def receiver_pids():
+			worker_pids = [worker.process.pid for worker in getattr(receiver, "workers", []) if worker.process]
+			return [os.getpid()] + worker_pids
+
+		names = [receiver.stream_name(port) for port in ports]
+		start_sequences = [receiver.get_frame_sequence(name) for name in names]
+		start_cpu = _process_cpu_seconds(receiver_pids())
+		started_at = time.monotonic()
+		time.sleep(args.duration)
+		elapsed = time.monotonic() - started_at
+		cpu = _process_cpu_seconds(receiver_pids()) - start_cpu
+		fps = [
+			(receiver.get_frame_sequence(name) - start) / elapsed
+			for name, start in zip(names, start_sequences)
+		]
+	finally:
+		display_stop.set()
+		receiver.stop()
+		sender.terminate()
+		sender.wait()
+	return {
+		"mode": mode,
+		"streams": count,
+		"min_fps": min(fps),
+		"mean_fps": sum(fps) / len(fps),
+		"cpu_percent": 100.0 * cpu / elapsed,
+		"handled": min(fps) >= HANDLED_FPS_RATIO * args.fps,
+	}
+
+
+if __name__ == "__main__":
+	args = handle_arguments()
+	if args.startup_profile:
+		print_startup_profile(args)
+
+	results = []
+	for mode in args.modes:
+		for count in sorted(args.counts):
+			logger.info(f"[bench] {mode}: {count} stream(s)")
+			result = run_once(mode, count, args)
+			results.append(result)
+			logger.info(f"[bench] {result}")
+
+	print(f"{'mode':<8} {'streams':>7} {'min fps':>8} {'mean fps':>9} {'cpu %':>7} handled")
+	for result in results:
+		print(
+			f"{result['mode']:<8} {result['streams']:>7} {result['min_fps']:>8.1f} {result['mean_fps']:>9.1f} "
+			f"{result['cpu_percent']:>7.0f} {'yes' if result['handled'] else 'no'}"
+		)
+	for mode in args.modes:
+		handled = [result["streams"] for result in results if result["mode"] == mode and result["handled"]]
+		print(f"{mode}: up to {max(handled) if handled else 0} stream(s) at >= {HANDLED_FPS_RATIO:.0%} of {args.fps} fps")
@@ -0,0 +1,525 @@
+import multiprocessing
+import os
+import queue as queue_module
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from common_utils import get_logger, RecordingConfig
+from receiver_utils import MultiReceiver
+from udp_qos import DEFAULT_RECEIVE_BUFFER_BYTES
+
+logger = get_logger(__name__)
+
+# A view handed out by read() stays intact for `slots - 1` frames: about a quarter second at 30 fps
+FRAME_RING_SLOTS = 8
+# Per slot: [sequence, monotonic_ns]; a slot whose sequence is -1 is being written
+FRAME_RING_SLOT_FIELDS = 2
+FRAME_RING_WRITING = -1
+FRAME_RING_HEADER_ALIGN = 64
+WORKER_COMMAND_POLL_SECONDS = 0.1
+WORKER_JOIN_TIMEOUT_SECONDS = 5.0
+WORKER_RESTART_DELAY_SECONDS = 1.0
+# Where POSIX shared memory blocks appear on Linux; used to find the rings of a worker that died
+SHARED_MEMORY_DIR = "/dev/shm"
+
+
+def _ring_header_bytes(slots: int) -> int:
+	header = 8 * (1 + slots * FRAME_RING_SLOT_FIELDS)
+	return (header + FRAME_RING_HEADER_ALIGN - 1) // FRAME_RING_HEADER_ALIGN * FRAME_RING_HEADER_ALIGN
+
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+	# The creating worker owns (and unlinks) the block; readers must not register it for cleanup
+	try:
+		return shared_memory.SharedMemory(name=name, track=False)
+	except TypeError:
+		return shared_memory.SharedMemory(name=name)
+
+
+def _ring_name_prefix(pid: int, worker_id: int) -> str:
+	return f"wrecorder-{pid}-{worker_id}"
+
+
+def _unlink_worker_rings(pid: int, worker_id: int) -> int:
+	"""Unlink the rings a dead worker left behind; it was their owner and can no longer do it."""
+	prefix = _ring_name_prefix(pid, worker_id) + "-"
+	try:
+		names = [name for name in os.listdir(SHARED_MEMORY_DIR) if name.startswith(prefix)]
+	except OSError:
+		return 0
+	unlinked = 0
+	for name in names:
+		try:
+			shm = shared_memory.SharedMemory(name=name)
+		except FileNotFoundError:
+			continue
+		shm.close()
+		try:
+			# Also drops the block from the resource tracker the worker registered it with
+			shm.unlink()
+			unlinked += 1
+		except FileNotFoundError:
+			pass
+	return unlinked
+
+
+class SharedFrameRing:
+	"""Fixed-size ring of same-shaped frames for one stream in shared memory.
+
+	A single writer fills slot `sequence % slots` and publishes the sequence last, so readers
+	in other processes can take the latest frame as a zero-copy view without locks. A view
+	stays intact until the writer wraps around to its slot (`slots - 1` frames later), which
+	is enough for the display. Slower consumers (encoders) use `read_with_sequence`, which
+	copies the frame and checks the slot was not rewritten meanwhile.
+	"""
+	def __init__(self, shm: shared_memory.SharedMemory, shape: Tuple[int, ...], slots: int, owner: bool):
+		self.shm = shm
+		self.shape = tuple(shape)
+		self.slots = slots
+		self.owner = owner
+		self._control = np.ndarray((1,), dtype=np.int64, buffer=shm.buf)
+		self._slot_headers = np.ndarray((slots, FRAME_RING_SLOT_FIELDS), dtype=np.int64, buffer=shm.buf, offset=8)
+		self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=shm.buf, offset=_ring_header_bytes(slots))
+
+	@property
+	def name(self) -> str:
+		return self.shm.name
+
+	@classmethod
+	def create(cls, name: str, shape: Tuple[int, ...], slots: int = FRAME_RING_SLOTS) -> "SharedFrameRing":
+		size = _ring_header_bytes(slots) + slots * int(np.prod(shape))
+		shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+		ring = cls(shm, shape, slots, owner=True)
+		ring._control[0] = 0
+		ring._slot_headers[:] = 0
+		return ring
+
+	@classmethod
+	def attach(cls, name: str, shape: Tuple[int, ...], slots: int = FRAME_RING_SLOTS) -> "SharedFrameRing":
+		return cls(_attach_shared_memory(name), shape, slots, owner=False)
+
+	def write(self, frame: np.ndarray):
+		sequence = int(self._control[0]) + 1
+		slot = sequence % self.slots
+		self._slot_headers[slot, 0] = FRAME_RING_WRITING
+		self._frames[slot] = frame
+		self._slot_headers[slot, 1] = time.monotonic_ns()
+		self._slot_headers[slot, 0] = sequence
+		self._control[0] = sequence
+
+	@property
+	def sequence(self) -> int:
+		control = self._control
+		return 0 if control is None else int(control[0])
+
+	def _latest(self, copy: bool) -> Tuple[Optional[np.ndarray], int]:
+		# Local references: close() may drop the views while another thread is reading
+		control, slot_headers, frames = self._control, self._slot_headers, self._frames
+		if control is None:
+			return None, 0
+		for _attempt in range(self.slots):
+			sequence = int(control[0])
+			if sequence <= 0:
+				return None, 0
+			slot = sequence % self.slots
+			# A mismatch means the writer lapped us between the two reads; take the newer frame
+			if slot_headers[slot, 0] != sequence:
+				continue
+			if not copy:
+				return frames[slot], sequence
+			frame = frames[slot].copy()
+			# The writer marks a slot before rewriting it, so an unchanged header means the copy is whole
+			if slot_headers[slot, 0] == sequence:
+				return frame, sequence
+		return None, 0
+
+	def read(self) -> Optional[np.ndarray]:
+		"""Latest complete frame as a view into shared memory, or None if there is none yet."""
+		return self._latest(copy=False)[0]
+
+	def read_with_sequence(self) -> Tuple[Optional[np.ndarray], int]:
+		"""Latest complete frame as a private copy, for consumers slower than a few frames."""
+		return self._latest(copy=True)
+
+	def age(self) -> Optional[float]:
+		control, slot_headers = self._control, self._slot_headers
+		if control is None:
+			return None
+		sequence = int(control[0])
+		if sequence <= 0:
+			return None
+		return (time.monotonic_ns() - int(slot_headers[sequence % self.slots, 1])) / 1e9
+
+	def close(self):
+		# The ring's own views pin the mapping; frames already handed out may still do so
+		self._control = self._slot_headers = self._frames = None
+		try:
+			self.shm.close()
+		except BufferError:
+			# Frame views (or another thread mid-read) still use the mapping; it is released
+			# when the last of them is garbage collected
+			pass
+		if self.owner:
+			try:
+				self.shm.unlink()
+			except FileNotFoundError:
+				pass
+
+
+class SharedFrameWriter:
+	"""Worker-side frame store: publishes each stream's frames into its own SharedFrameRing.
+
+	Rings are (re)created when a stream first delivers a frame or changes resolution, and the
+	parent is told about them through `event_queue`.
+	"""
+	def __init__(self, event_queue: multiprocessing.Queue, name_prefix: str):
+		self.event_queue = event_queue
+		self.name_prefix = name_prefix
+		self._rings: Dict[str, SharedFrameRing] = {}
+		self._generation = 0
+		self._lock = threading.Lock()
+
+	def _replace_ring(self, stream_name: str, shape: Tuple[int, ...]) -> SharedFrameRing:
+		with self._lock:
+			self._generation += 1
+			ring = SharedFrameRing.create(f"{self.name_prefix}-{self._generation}", shape)
+			old = self._rings.get(stream_name)
+			self._rings[stream_name] = ring
+		self.event_queue.put({"type": "ring", "stream": stream_name, "name": ring.name, "shape": ring.shape})
+		if old is not None:
+			old.close()
+		return ring
+
+	def set_latest(self, stream_name: str, frame: np.ndarray) -> Optional[Exception]:
+		try:
+			ring = self._rings.get(stream_name)
+			if ring is None or ring.shape != frame.shape:
+				ring = self._replace_ring(stream_name, frame.shape)
+			ring.write(frame)
+			return None
+		except (TypeError, ValueError, OSError) as exc:
+			return exc
+
+	def remove_stream(self, stream_name: str):
+		with self._lock:
+			ring = self._rings.pop(stream_name, None)
+		if ring is None:
+			return
+		self.event_queue.put({"type": "remove", "stream": stream_name})
+		ring.close()
+
+	def get_frame_age(self, stream_name: str) -> Optional[float]:
+		ring = self._rings.get(stream_name)
+		return None if ring is None else ring.age()
+
+	def get_frame_sequence(self, stream_name: str) -> int:
+		ring = self._rings.get(stream_name)
+		return 0 if ring is None else ring.sequence
+
+	def close(self):
+		for stream_name in list(self._rings):
+			self.remove_stream(stream_name)
+
+
+class SharedFrameReader:
+	"""Display-side frame store backed by the workers' rings (same read interface as FrameStore)."""
+	def __init__(self):
+		self._rings: Dict[str, SharedFrameRing] = {}
+		self._lock = threading.Lock()
+
+	def handle_event(self, event: dict):
+		stream_name = event.get("stream")
+		if event.get("type") == "ring":
+			try:
+				ring = SharedFrameRing.attach(event["name"], tuple(event["shape"]))
+			except FileNotFoundError:
+				# Already replaced again by the worker; its next announcement will follow
+				return
+			with self._lock:
+				old = self._rings.get(stream_name)
+				self._rings[stream_name] = ring
+		elif event.get("type") == "remove":
+			with self._lock:
+				old = self._rings.pop(stream_name, None)
+		else:
+			return
+		if old is not None:
+			old.close()
+
+	def get_frame(self, stream_name: str):
+		ring = self._rings.get(stream_name)
+		return None if ring is None else ring.read()
+
+	def get_frame_age(self, stream_name: str) -> Optional[float]:
+		ring = self._rings.get(stream_name)
+		return None if ring is None else ring.age()
+
+	def get_frame_sequence(self, stream_name: str) -> int:
+		ring = self._rings.get(stream_name)
+		return 0 if ring is None else ring.sequence
+
+	def get_frame_with_sequence(self, stream_name: str):
+		ring = self._rings.get(stream_name)
+		return (None, 0) if ring is None else ring.read_with_sequence()
+
+	def snapshot_keys(self) -> List[str]:
+		with self._lock:
+			return list(self._rings.keys())
+
+	def close(self):
+		with self._lock:
+			rings = list(self._rings.values())
+			self._rings.clear()
+		for ring in rings:
+			ring.close()
+
+
+def _apply_worker_command(receiver: MultiReceiver, command: dict):
+	command_type = command.get("type")
+	if command_type == "reconfigure":
+		receiver.reconfigure(command["ports"], command.get("window_prefix"))
+	elif command_type == "restart_ports":
+		receiver.restart_ports(command["ports"])
+	elif command_type == "set_recording":
+		receiver.set_recording(command["stream"], command["enabled"])
+	elif command_type == "set_preview":
+		sub_receiver = receiver.sub_receivers.get(command["port"])
+		if sub_receiver is not None:
+			sub_receiver.set_preview(command["preview"])
+
+
+def _decode_worker_main(
+	worker_id: int,
+	ports: List[int],
+	timeout: float,
+	window_prefix: str,
+	persistent: bool,
+	recording: Optional[RecordingConfig],
+	command_queue: multiprocessing.Queue,
+	event_queue: multiprocessing.Queue,
+	stop_event: multiprocessing.Event,
+	receive_buffer_bytes: int = DEFAULT_RECEIVE_BUFFER_BYTES,
+):
+	# Shutdown is driven by the parent through stop_event, not by the terminal's Ctrl-C
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+	frame_store = SharedFrameWriter(event_queue, _ring_name_prefix(os.getpid(), worker_id))
+	receiver = MultiReceiver(
+		ports,
+		timeout,
+		window_prefix,
+		persistent,
+		recording,
+		frame_store=frame_store,
+		receive_buffer_bytes=receive_buffer_bytes,
+	)
+	logger.info(f"[decode-worker-{worker_id}] decoding ports {ports}")
+	receiver.start()
+	try:
+		while not stop_event.is_set():
+			try:
+				command = command_queue.get(timeout=WORKER_COMMAND_POLL_SECONDS)
+			except queue_module.Empty:
+				continue
+			_apply_worker_command(receiver, command)
+	finally:
+		receiver.stop()
+		frame_store.close()
+
+
+class DecodeWorker:
+	def __init__(self, worker_id: int):
+		self.worker_id = worker_id
+		self.ports: List[int] = []
+		self.process: Optional[multiprocessing.Process] = None
+		self.command_queue: Optional[multiprocessing.Queue] = None
+
+
+class DecodeWorkerPool(MultiReceiver):
+	"""MultiReceiver whose pipelines and appsink callbacks run in worker processes.
+
+	Ports are spread over `worker_count` processes (each running its own MultiReceiver), so
+	decoding and per-frame Python work no longer share one GIL. Frames come back through
+	shared-memory rings that the display reads in place.
+	"""
+	def __init__(
+		self,
+		ports: List[int],
+		timeout: float,
+		window_prefix: str,
+		worker_count: int,
+		persistent: bool = False,
+		recording: RecordingConfig = None,
+		preview_decode: bool = False,
+		receive_buffer_bytes: int = DEFAULT_RECEIVE_BUFFER_BYTES,
+	):
+		super().__init__(
+			ports,
+			timeout,
+			window_prefix,
+			persistent,
+			recording,
+			preview_decode,
+			frame_store=SharedFrameReader(),
+			receive_buffer_bytes=receive_buffer_bytes,
+		)
+		# Spawned workers do not inherit the parent's Qt or GStreamer state
+		self._context = multiprocessing.get_context("spawn")
+		self.workers = [DecodeWorker(worker_id) for worker_id in range(max(1, worker_count))]
+		self._event_queue = self._context.Queue()
+		self._worker_stop_event = self._context.Event()
+		self._recording_state: Dict[str, bool] = {}
+		self._preview_state: Dict[int, bool] = {}
+		self._supervisor = None
+
+	def _spawn_worker(self, worker: DecodeWorker):
+		worker.command_queue = self._context.Queue()
+		worker.process = self._context.Process(
+			target=_decode_worker_main,
+			args=(
+				worker.worker_id,
+				list(worker.ports),
+				self.timeout,
+				self.window_prefix,
+				self.persistent,
+				self.recording,
+				worker.command_queue,
+				self._event_queue,
+				self._worker_stop_event,
+				self.receive_buffer_bytes,
+			),
+			daemon=True,
+		)
+		worker.process.start()
+
+	def _worker_for_port(self, port: int) -> Optional[DecodeWorker]:
+		for worker in self.workers:
+			if port in worker.ports:
+				return worker
+		return None
+
+	def _assign_ports(self, ports: Iterable[int]):
+		ports = list(ports)
+		for worker in self.workers:
+			worker.ports = [port for port in worker.ports if port in ports]
+		for port in ports:
+			if self._worker_for_port(port) is None:
+				min(self.workers, key=lambda worker: len(worker.ports)).ports.append(port)
+				self._started_at[port] = time.monotonic()
+		for port in list(self._started_at):
+			if port not in ports:
+				self._started_at.pop(port, None)
+		self.ports = ports
+
+	def _send(self, worker: DecodeWorker, command: dict):
+		if worker.command_queue is not None:
+			worker.command_queue.put(command)
+
+	def start(self):
+		with self._ports_lock:
+			self._assign_ports(self.ports)
+			for worker in self.workers:
+				self._spawn_worker(worker)
+		self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+		self._supervisor.start()
+		self._apply_preview()
+
+	def _supervise(self):
+		while not self.stop_event.is_set():
+			try:
+				event = self._event_queue.get(timeout=WORKER_COMMAND_POLL_SECONDS)
+				self.frame_store.handle_event(event)
+				continue
+			except queue_module.Empty:
+				pass
+			for worker in self.workers:
+				if worker.process is None or worker.process.is_alive() or self.stop_event.is_set():
+					continue
+				logger.warning(
+					f"[decode-worker-{worker.worker_id}] exited unexpectedly (code={worker.process.exitcode}); restarting"
+				)
+				for port in worker.ports:
+					self.frame_store.handle_event({"type": "remove", "stream": self.stream_name(port)})
+				self._unlink_rings(worker)
+				time.sleep(WORKER_RESTART_DELAY_SECONDS)
+				with self._ports_lock:
+					self._spawn_worker(worker)
+					# The new worker starts from recording.enabled; restore this session's toggles
+					for stream_name, enabled in self._recording_state.items():
+						if self._extract_port_from_stream_name(stream_name) in worker.ports:
+							self._send(worker, {"type": "set_recording", "stream": stream_name, "enabled": enabled})
+				self._preview_state.clear()
+				self._apply_preview()
+
+	def _unlink_rings(self, worker: DecodeWorker):
+		unlinked = _unlink_worker_rings(worker.process.pid, worker.worker_id)
+		if unlinked:
+			logger.info(f"[decode-worker-{worker.worker_id}] unlinked {unlinked} frame ring(s) it left behind")
+
+	def restart_ports(self, ports: Iterable[int]):
+		with self._ports_lock:
+			for worker in self.workers:
+				worker_ports = [port for port in ports if port in worker.ports]
+				if worker_ports:
+					self._send(worker, {"type": "restart_ports", "ports": worker_ports})
+
+	def reconfigure(self, ports: List[int], window_prefix: str = None):
+		with self._ports_lock:
+			if window_prefix is not None and window_prefix != self.window_prefix:
+				self.window_prefix = window_prefix
+				self._recording_state.clear()
+			self._assign_ports(ports)
+			for worker in self.workers:
+				self._send(worker, {"type": "reconfigure", "ports": list(worker.ports), "window_prefix": self.window_prefix})
+		self._preview_state.clear()
+		self._apply_preview()
+
+	def is_recording(self, stream_name: str) -> bool:
+		if self.recording is None:
+			return False
+		return self._recording_state.get(stream_name, self.recording.enabled)
+
+	def set_recording(self, stream_name: str, enabled: bool) -> bool:
+		if self.recording is None:
+			logger.warning(f"[{stream_name}] Recording is not configured")
+			return False
+		worker = self._worker_for_port(self._extract_port_from_stream_name(stream_name))
+		if worker is None:
+			return False
+		self._send(worker, {"type": "set_recording", "stream": stream_name, "enabled": enabled})
+		self._recording_state[stream_name] = enabled
+		return enabled
+
+	def set_focused_stream(self, stream_name: str):
+		self.focused_stream = stream_name
+		self._apply_preview()
+
+	def _apply_preview(self):
+		with self._ports_lock:
+			for worker in self.workers:
+				for port in worker.ports:
+					preview = self._wants_preview(self.stream_name(port))
+					if self._preview_state.get(port, False) == preview:
+						continue
+					self._preview_state[port] = preview
+					self._send(worker, {"type": "set_preview", "port": port, "preview": preview})
+
+	def stop(self):
+		self.stop_event.set()
+		self._worker_stop_event.set()
+		for worker in self.workers:
+			if worker.process is None:
+				continue
+			worker.process.join(timeout=WORKER_JOIN_TIMEOUT_SECONDS)
+			if worker.process.is_alive():
+				logger.warning(f"[decode-worker-{worker.worker_id}] did not exit cleanly, terminating...")
+				worker.process.terminate()
+				worker.process.join()
+				self._unlink_rings(worker)
+		if self._supervisor is not None:
+			self._supervisor.join(timeout=1.0)
+		self.frame_store.close()
@@ -0,0 +1,176 @@
+import argparse
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List
+
+from common_utils import get_logger, init_gstreamer, VALID_PORT_MIN, VALID_PORT_MAX, int_in_range
+from streamer_utils import ENCODER_PROFILES, LOW_LATENCY_QUEUE, build_encoder_chain, send_pacing_bitrate
+
+logger = get_logger(__name__)
+
+RTP_HEADER = struct.Struct("!BBHII")
+RTP_MARKER_BIT = 0x80
+RTP_MAX_PACKET_BYTES = 65536
+RECEIVE_POLL_SECONDS = 0.2
+# Frames still in flight this long after EOS are counted as lost
+DRAIN_SECONDS = 1.0
+
+
+def handle_arguments():
+	parser = argparse.ArgumentParser(
+		prog="encoder_benchmark",
+		description="Compare encoder profiles: encoded frame sizes and per-frame latency through a rate-limited link",
+	)
+	parser.add_argument("--profiles", nargs="+", choices=ENCODER_PROFILES, default=ENCODER_PROFILES)
+	parser.add_argument("--bitrate", type=int, default=500000, help="Encoder target bitrate (bits/s)")
+	parser.add_argument(
+		"--link-bitrate",
+		type=int,
+		default=None,
+		help="Capacity of the emulated radio link (bits/s, default twice --bitrate)",
+	)
+	parser.add_argument("--simulate-loss", type=float, default=0.0, help="Percent of frames dropped before sending")
+	parser.add_argument("--duration", type=float, default=20.0, help="Encoded seconds per profile")
+	parser.add_argument("--fps", type=int, default=30)
+	parser.add_argument("--width", type=int, default=640)
+	parser.add_argument("--height", type=int, default=640)
+	parser.add_argument(
+		"--port",
+		type=int_in_range("port", VALID_PORT_MIN, VALID_PORT_MAX),
+		default=6655,
+		help="Local UDP port the test stream is sent to",
+	)
+	return parser.parse_args()
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+	if not values:
+		return float("nan")
+	ordered = sorted(values)
+	return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _receive_frames(receive_socket: socket.socket, arrivals: Dict[int, float], stop_event: threading.Event):
+	"""Record when the last packet (marker bit) of each RTP timestamp arrives."""
+	while not stop_event.is_set():
+		try:
+			packet = receive_socket.recv(RTP_MAX_PACKET_BYTES)
+		except socket.timeout:
+			continue
+		if len(packet) < RTP_HEADER.size:
+			continue
+		_flags, marker_and_type, _sequence, rtp_time, _ssrc = RTP_HEADER.unpack_from(packet)
+		if marker_and_type & RTP_MARKER_BIT:
+			arrivals.setdefault(rtp_time, time.monotonic())
+
+
+def run_profile(profile: str, args) -> dict:
+	Gst = init_gstreamer()
+	link_bitrate = args.link_bitrate or args.bitrate * 2
+	# The emulated link throttles both profiles; intra refresh also paces itself below it
+	pacing = send_pacing_bitrate(args.bitrate, profile)
+	max_bitrate = min(link_bitrate, pacing) if pacing else link_bitrate
+	pipeline = Gst.parse_launch(
+		f"videotestsrc is-live=true pattern=ball num-buffers={int(args.duration * args.fps)} ! "
+		f"video/x-raw,width={args.width},height={args.height},framerate={args.fps}/1,format=I420 ! "
+		f"{LOW_LATENCY_QUEUE} ! identity name=encoderin ! {build_encoder_chain('bench', args.bitrate, args.fps, profile)} ! "
+		"identity name=encoded"
+		+ ("" if args.simulate_loss <= 0.0 else f" ! identity drop-probability={args.simulate_loss / 100.0}")
+		+ " ! rtph264pay config-interval=1 pt=96 name=pay ! "
+		f"udpsink host=127.0.0.1 port={args.port} sync=false async=false max-bitrate={max_bitrate}"
+	)
+
+	encoder_input_at: Dict[int, float] = {}
+	frame_sizes: List[int] = []
+	keyframes = [0]
+	rtp_time_to_pts: Dict[int, int] = {}
+
+	def _on_encoder_input(_pad, info):
+		encoder_input_at[info.get_buffer().pts] = time.monotonic()
+		return Gst.PadProbeReturn.OK
+
+	def _on_encoded(_pad, info):
+		buffer = info.get_buffer()
+		frame_sizes.append(buffer.get_size())
+		if not buffer.has_flags(Gst.BufferFlags.DELTA_UNIT):
+			keyframes[0] += 1
+		return Gst.PadProbeReturn.OK
+
+	def _on_payloaded(_pad, info):
+		buffer = info.get_buffer()
+		header = buffer.extract_dup(0, RTP_HEADER.size)
+		if len(header) == RTP_HEADER.size:
+			rtp_time_to_pts.setdefault(RTP_HEADER.unpack(header)[3], buffer.pts)
+		return Gst.PadProbeReturn.OK
+
+	pipeline.get_by_name("encoderin").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, _on_encoder_input)
+	pipeline.get_by_name("encoded").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, _on_encoded)
+	pipeline.get_by_name("pay").get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, _on_payloaded)
+
+	receive_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	receive_socket.bind(("127.0.0.1", args.port))
+	receive_socket.settimeout(RECEIVE_POLL_SECONDS)
+	arrivals: Dict[int, float] = {}
+	stop_event = threading.Event()
+	receiver = threading.Thread(target=_receive_frames, args=(receive_socket, arrivals, stop_event), daemon=True)
+	receiver.start()
+
+	pipeline.set_state(Gst.State.PLAYING)
+	try:
+		bus = pipeline.get_bus()
+		message = bus.timed_pop_filtered(
+			int((args.duration * 3 + 10) * Gst.SECOND),
+			Gst.MessageType.ERROR | Gst.MessageType.EOS,
+		)
+		if message is not None and message.type == Gst.MessageType.ERROR:
+			error, _debug = message.parse_error()
+			raise RuntimeError(f"{profile}: {error.message}")
+		time.sleep(DRAIN_SECONDS)
+	finally:
+		pipeline.set_state(Gst.State.NULL)
+		stop_event.set()
+		receiver.join()
+		receive_socket.close()
+
+	latencies_ms = [
+		(arrived_at - encoder_input_at[rtp_time_to_pts[rtp_time]]) * 1000
+		for rtp_time, arrived_at in arrivals.items()
+		if rtp_time_to_pts.get(rtp_time) in encoder_input_at
+	]
+	return {
+		"profile": profile,
+		"frames": len(frame_sizes),
+		"keyframes": keyframes[0],
+		"delivered": len(latencies_ms),
+		"size_p50": _percentile(frame_sizes, 0.5),
+		"size_p99": _percentile(frame_sizes, 0.99),
+		"size_max": max(frame_sizes, default=0),
+		"latency_p50": _percentile(latencies_ms, 0.5),
+		"latency_p99": _percentile(latencies_ms, 0.99),
+		"link_bitrate": link_bitrate,
+	}
+
+
+if __name__ == "__main__":
+	args = handle_arguments()
+	results = []
+	for profile in args.profiles:
+		logger.info(f"[bench] encoding {args.duration:.0f}s with profile {profile}")
+		results.append(run_profile(profile, args))
+
+	print(
+		f"bitrate={args.bitrate} link={results[0]['link_bitrate'] if results else 0} "
+		f"loss={args.simulate_loss}% fps={args.fps}"
+	)
+	print(
+		f"{'profile':<14} {'frames':>6} {'IDR':>4} {'delivered':>9} {'p50 B':>7} {'p99 B':>7} {'max B':>7} "
+		f"{'p50 ms':>7} {'p99 ms':>7}"
+	)
+	for result in results:
+		print(
+			f"{result['profile']:<14} {result['frames']:>6} {result['keyframes']:>4} {result['delivered']:>9} "
+			f"{result['size_p50']:>7.0f} {result['size_p99']:>7.0f} {result['size_max']:>7} "
+			f"{result['latency_p50']:>7.1f} {result['latency_p99']:>7.1f}"
+		)
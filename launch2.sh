@@ -11,20 +11,6 @@ if [ ! -x "$PYTHON_BIN" ]; then
     PYTHON_BIN="python3"
 fi
 
-WAIT_SECONDS="${NETWORK_WAIT_SECONDS:-30}"
-READY_IP=""
-
-while [ "$WAIT_SECONDS" -gt 0 ]; do
-    READY_IP="$(ip -4 -o addr show dev eth0 2>/dev/null | awk '{print $4}' | cut -d/ -f1 | head -n1 || true)"
-    if [ -n "$READY_IP" ]; then
-        break
-    fi
-    sleep 1
-    WAIT_SECONDS=$((WAIT_SECONDS - 1))
-done
-
-export WRECORDER_STREAMER_IP="$READY_IP"
-
 "$PYTHON_BIN" -u "$SCRIPT_DIR/camera_streamer.py" \
     --base-port 5555 \
     --streamer-name cam-pi-2 \
@@ -32,5 +18,5 @@ export WRECORDER_STREAMER_IP="$READY_IP"
     --target-fps 30 \
     --never-give-up on \
     --mosaic on \
-    --only-eth0
+    --interfaces eth0
 
@@ -0,0 +1,147 @@
+import time
+
+from common_utils import get_logger, init_gstreamer
+
+logger = get_logger(__name__)
+
+# Bound by attach() in the stream process, like the pipelines themselves
+Gst = None
+np = None
+
+MOTION_GATE_ELEMENT = "identity name=motiongate"
+# Every Nth luma pixel in each direction: 640x640 becomes an 80x80 sample
+MOTION_SAMPLE_STEP = 8
+# After motion, every frame is sent for this long so movement never looks choppy
+MOTION_HOLD_SECONDS = 0.5
+# While frames are skipped, ask for an IDR this often so newly subscribed receivers can start decoding
+MOTION_GATE_KEYFRAME_SECONDS = 2.0
+MOTION_REPORT_INTERVAL_SECONDS = 10.0
+# Receivers reconnect after --stall-timeout (2s by default) without a frame; keep-alive frames
+# must arrive well inside it, since the receiver only checks every half second
+MOTION_GATE_MIN_KEEPALIVE_FPS = 1.0
+
+
+class MotionGateConfig:
+	def __init__(self, threshold: float, keepalive_fps: float):
+		# Mean absolute luma difference (0-255) against the last sent frame that counts as motion
+		self.threshold = threshold
+		self.keepalive_fps = keepalive_fps
+
+
+class MotionGate:
+	"""Skips frames before the encoder while the scene is static.
+
+	Each frame's luma plane is subsampled and compared with the last frame that was sent.
+	Static frames are dropped except for a keep-alive rate; any motion sends every frame
+	again at once. Skipped frames cost neither encode CPU nor uplink.
+	"""
+
+	def __init__(self, label: str, config: MotionGateConfig, target_fps: int):
+		self.label = label
+		self.config = config
+		self.target_fps = target_fps
+		self._reference = None
+		self._last_sent_at = 0.0
+		self._last_motion_at = 0.0
+		self._last_keyframe_request_at = 0.0
+		self._skipped_since_sent = 0
+		self._last_report_at = time.monotonic()
+		self.frames_seen = 0
+		self.frames_sent = 0
+		self.keyframe_requests = 0
+		self._difference_total = 0.0
+		self.last_difference = 0.0
+		self._window_start = (0, 0)
+
+	def attach(self, pipeline):
+		global Gst, np
+		if Gst is None:
+			Gst = init_gstreamer()
+		if np is None:
+			import numpy
+			np = numpy
+		gate = pipeline.get_by_name("motiongate")
+		if gate is None:
+			logger.warning(f"[{self.label}] motion gate element missing; sending every frame")
+			return
+		gate.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+		logger.info(
+			f"[{self.label}] motion gate: threshold={self.config.threshold}, "
+			f"keep-alive={self.config.keepalive_fps} fps of {self.target_fps}"
+		)
+
+	def _luma_sample(self, pad, buffer):
+		caps = pad.get_current_caps()
+		if caps is None:
+			return None
+		# Read per frame: operator focus can change the output size while PLAYING
+		structure = caps.get_structure(0)
+		width, height = structure.get_value("width"), structure.get_value("height")
+		ok, map_info = buffer.map(Gst.MapFlags.READ)
+		if not ok:
+			return None
+		try:
+			# I420 starts with the full-resolution Y plane; stream widths keep the stride equal to the width
+			luma = np.frombuffer(map_info.data, dtype=np.uint8, count=width * height)
+			return luma.reshape(height, width)[::MOTION_SAMPLE_STEP, ::MOTION_SAMPLE_STEP].astype(np.int16)
+		finally:
+			buffer.unmap(map_info)
+
+	def _on_buffer(self, pad, info):
+		now = time.monotonic()
+		self.frames_seen += 1
+		sample = self._luma_sample(pad, info.get_buffer())
+		if sample is None or self._reference is None or sample.shape != self._reference.shape:
+			difference = float("inf")
+		else:
+			difference = float(np.abs(sample - self._reference).mean())
+			self._difference_total += difference
+		self.last_difference = difference
+
+		if difference >= self.config.threshold:
+			self._last_motion_at = now
+		keepalive_due = now - self._last_sent_at >= 1.0 / self.config.keepalive_fps
+		if now - self._last_motion_at >= MOTION_HOLD_SECONDS and not keepalive_due:
+			self._skipped_since_sent += 1
+			return Gst.PadProbeReturn.DROP
+
+		if self._skipped_since_sent and now - self._last_keyframe_request_at >= MOTION_GATE_KEYFRAME_SECONDS:
+			# Skipping stretches the encoder's frame-counted GOP, so late subscribers would wait for an IDR; force one
+			pad.push_event(
+				Gst.Event.new_custom(
+					Gst.EventType.CUSTOM_DOWNSTREAM,
+					Gst.Structure.new_from_string("GstForceKeyUnit, all-headers=(boolean)true"),
+				)
+			)
+			self._last_keyframe_request_at = now
+			self.keyframe_requests += 1
+		self._skipped_since_sent = 0
+		self._reference = sample
+		self._last_sent_at = now
+		self.frames_sent += 1
+		return Gst.PadProbeReturn.OK
+
+	def metrics(self) -> dict:
+		"""Totals since the pipeline started; the `recent` figure covers the time since the previous call."""
+		skipped = self.frames_seen - self.frames_sent
+		compared = max(1, self.frames_seen - 1)
+		window_seen = self.frames_seen - self._window_start[0]
+		window_sent = self.frames_sent - self._window_start[1]
+		self._window_start = (self.frames_seen, self.frames_sent)
+		return {
+			"motion_threshold": self.config.threshold,
+			"motion_keepalive_fps": self.config.keepalive_fps,
+			"motion_frames_seen": self.frames_seen,
+			"motion_frames_sent": self.frames_sent,
+			"motion_skipped_percent": round(100.0 * skipped / self.frames_seen, 1) if self.frames_seen else 0.0,
+			"motion_mean_difference": round(self._difference_total / compared, 2),
+			"motion_recent_sent_percent": round(100.0 * window_sent / window_seen, 1) if window_seen else 100.0,
+			"motion_active": time.monotonic() - self._last_motion_at < MOTION_HOLD_SECONDS,
+		}
+
+	def report_due(self) -> bool:
+		now = time.monotonic()
+		if now - self._last_report_at < MOTION_REPORT_INTERVAL_SECONDS:
+			return False
+		self._last_report_at = now
+		return True
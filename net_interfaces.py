@@ -0,0 +1,221 @@
+import errno
+import fcntl
+import ipaddress
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Callable, List, Optional
+
+from common_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Overrides the advertised address on every interface (e.g. a NAT or VPN address)
+STREAMER_IP_ENV = "WRECORDER_STREAMER_IP"
+FALLBACK_IP = "127.0.0.1"
+# Re-read the inventory this often even without netlink events (also the fallback when netlink is unavailable)
+INTERFACE_POLL_SECONDS = 5.0
+NETLINK_RECEIVE_BYTES = 65536
+
+# struct ifreq is a 16-byte name followed by a 24-byte union; sockaddr_in puts the address at offset 4
+IFREQ_SIZE = 40
+IFREQ_NAME_SIZE = 16
+IFREQ_ADDR_OFFSET = IFREQ_NAME_SIZE + 4
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFBRDADDR = 0x8919
+SIOCGIFNETMASK = 0x891B
+IFF_UP = 0x1
+IFF_BROADCAST = 0x2
+IFF_LOOPBACK = 0x8
+IFF_RUNNING = 0x40
+
+# linux/rtnetlink.h multicast groups: link up/down and IPv4 address add/remove
+NETLINK_ROUTE = 0
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+
+
+class InterfaceAddress:
+	"""The IPv4 address of one network interface."""
+	def __init__(self, name: str, index: int, ip: str, netmask: str, broadcast: Optional[str], flags: int):
+		self.name = name
+		self.index = index
+		self.ip = ip
+		self.netmask = netmask
+		self.broadcast = broadcast
+		self.flags = flags
+
+	@property
+	def network(self) -> ipaddress.IPv4Network:
+		return ipaddress.IPv4Network(f"{self.ip}/{self.netmask}", strict=False)
+
+	@property
+	def key(self) -> tuple:
+		return (self.name, self.ip, self.netmask, self.broadcast)
+
+	def contains(self, peer_ip: str) -> bool:
+		try:
+			return ipaddress.IPv4Address(peer_ip) in self.network
+		except ValueError:
+			return False
+
+	def describe(self) -> str:
+		return f"{self.name} {self.ip}/{self.network.prefixlen}"
+
+
+def _ifreq(ioctl_socket: socket.socket, request: int, name: str) -> Optional[bytes]:
+	buffer = bytearray(IFREQ_SIZE)
+	encoded = name.encode("utf-8")[:IFREQ_NAME_SIZE - 1]
+	buffer[:len(encoded)] = encoded
+	try:
+		fcntl.ioctl(ioctl_socket.fileno(), request, buffer, True)
+	except OSError as exc:
+		# EADDRNOTAVAIL: the interface exists but has no IPv4 address (yet)
+		if exc.errno in (errno.EADDRNOTAVAIL, errno.ENODEV, errno.EINVAL):
+			return None
+		raise
+	return bytes(buffer)
+
+
+def _ifreq_ip(ioctl_socket: socket.socket, request: int, name: str) -> Optional[str]:
+	buffer = _ifreq(ioctl_socket, request, name)
+	if buffer is None:
+		return None
+	return socket.inet_ntoa(buffer[IFREQ_ADDR_OFFSET:IFREQ_ADDR_OFFSET + 4])
+
+
+def list_interface_addresses(names: Optional[List[str]] = None, include_loopback: bool = False) -> List[InterfaceAddress]:
+	"""Return the IPv4 address of every interface that is up, in kernel index order.
+
+	`names` restricts the result to those interfaces (loopback is then allowed if named).
+	"""
+	ioctl_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	addresses = []
+	try:
+		for index, name in socket.if_nameindex():
+			if names and name not in names:
+				continue
+			try:
+				flags_buffer = _ifreq(ioctl_socket, SIOCGIFFLAGS, name)
+				if flags_buffer is None:
+					continue
+				flags = struct.unpack_from("=H", flags_buffer, IFREQ_NAME_SIZE)[0]
+				if not flags & IFF_UP:
+					continue
+				if flags & IFF_LOOPBACK and not (include_loopback or names):
+					continue
+				ip = _ifreq_ip(ioctl_socket, SIOCGIFADDR, name)
+				if ip is None:
+					continue
+				netmask = _ifreq_ip(ioctl_socket, SIOCGIFNETMASK, name) or "255.255.255.255"
+				broadcast = _ifreq_ip(ioctl_socket, SIOCGIFBRDADDR, name) if flags & IFF_BROADCAST else None
+			except OSError as exc:
+				logger.debug(f"[net] ioctl failed on {name}: {exc}")
+				continue
+			addresses.append(InterfaceAddress(name, index, ip, netmask, broadcast, flags))
+	finally:
+		ioctl_socket.close()
+	return addresses
+
+
+def select_interface(addresses: List[InterfaceAddress], peer_ip: str) -> Optional[InterfaceAddress]:
+	"""The interface whose subnet contains `peer_ip`, else the first one."""
+	for address in addresses:
+		if address.contains(peer_ip):
+			return address
+	return addresses[0] if addresses else None
+
+
+def _open_netlink_socket() -> Optional[socket.socket]:
+	try:
+		netlink_socket = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+		netlink_socket.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR))
+		netlink_socket.setblocking(False)
+		return netlink_socket
+	except (AttributeError, OSError) as exc:
+		logger.warning(f"[net] netlink unavailable, polling interfaces every {INTERFACE_POLL_SECONDS:.0f}s: {exc}")
+		return None
+
+
+class InterfaceMonitor:
+	"""Keeps the interface inventory current and reports every change.
+
+	Link and IPv4 address events from rtnetlink trigger an immediate re-read, so a DHCP
+	lease or a cable plugged in after startup is picked up within milliseconds; a slow
+	poll covers anything the events miss.
+	"""
+
+	def __init__(
+		self,
+		names: Optional[List[str]] = None,
+		on_change: Callable[[List[InterfaceAddress]], None] = None,
+		poll_interval: float = INTERFACE_POLL_SECONDS,
+	):
+		self.names = list(names) if names else None
+		self.on_change = on_change
+		self.poll_interval = poll_interval
+		self._lock = threading.Lock()
+		self._addresses = list_interface_addresses(self.names)
+
+	@property
+	def addresses(self) -> List[InterfaceAddress]:
+		with self._lock:
+			return list(self._addresses)
+
+	def set_names(self, names: Optional[List[str]]):
+		self.names = list(names) if names else None
+		self.refresh()
+
+	def refresh(self) -> bool:
+		"""Re-read the inventory; returns whether it changed (and notifies `on_change` if so)."""
+		addresses = list_interface_addresses(self.names)
+		with self._lock:
+			changed = [address.key for address in addresses] != [address.key for address in self._addresses]
+			previous = self._addresses
+			self._addresses = addresses
+		if not changed:
+			return False
+		logger.info(
+			f"[net] interfaces changed: {', '.join(address.describe() for address in previous) or 'none'} -> "
+			f"{', '.join(address.describe() for address in addresses) or 'none'}"
+		)
+		if self.on_change is not None:
+			self.on_change(addresses)
+		return True
+
+	def run(self, stop_event: threading.Event):
+		netlink_socket = _open_netlink_socket()
+		next_poll_at = time.monotonic() + self.poll_interval
+		try:
+			while not stop_event.is_set():
+				wait = max(0.0, min(next_poll_at - time.monotonic(), 1.0))
+				event = False
+				if netlink_socket is not None:
+					readable, _, _ = select.select([netlink_socket], [], [], wait)
+					if readable:
+						# Drain the burst; the messages themselves are not parsed, only the fresh inventory matters
+						try:
+							while netlink_socket.recv(NETLINK_RECEIVE_BYTES):
+								event = True
+						except BlockingIOError:
+							pass
+						except OSError as exc:
+							# ENOBUFS: events were lost, which a re-read covers
+							logger.debug(f"[net] netlink receive failed: {exc}")
+							event = True
+				else:
+					stop_event.wait(wait)
+				if event or time.monotonic() >= next_poll_at:
+					self.refresh()
+					next_poll_at = time.monotonic() + self.poll_interval
+		finally:
+			if netlink_socket is not None:
+				netlink_socket.close()
+
+
+if __name__ == "__main__":
+	for address in list_interface_addresses(include_loopback=True):
+		print(f"{address.describe()} broadcast={address.broadcast}")
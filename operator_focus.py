@@ -0,0 +1,212 @@
+import json
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from common_utils import get_logger, CAMERA_FRAME_WIDTH, CAMERA_FRAME_HEIGHT
+from udp_qos import mark_control_socket
+
+logger = get_logger(__name__)
+
+FOCUS_REQUEST_MESSAGE_TYPE = "FOCUS_REQUEST"
+FOCUS_RESULT_MESSAGE_TYPE = "FOCUS_RESULT"
+# The receiver renews its focus this often; the streamer drops a focus not renewed within the lease
+FOCUS_REFRESH_SECONDS = 5.0
+FOCUS_LEASE_SECONDS = 15.0
+FOCUS_CHECK_SECONDS = 1.0
+# Unfocused streams send every Nth frame while another stream is focused
+FOCUS_BACKGROUND_FPS_DIVISOR = 2
+FOCUS_REPLY_TIMEOUT_SECONDS = 1.0
+# How long the receiver waits for the first frame at the focused resolution before giving up on measuring it
+FOCUS_MEASURE_TIMEOUT_SECONDS = 5.0
+FOCUS_MEASURE_POLL_SECONDS = 0.005
+FOCUS_RESULT_MAX_BYTES = 2048
+
+
+class OperatorFocus:
+	"""Streamer side of operator focus: one camera stream is boosted, the others give way.
+
+	The focused stream is sent at the full camera resolution (unless it is being
+	recorded) and frame rate and gets the lion's share of the bandwidth (see
+	BandwidthBudgetScheduler.set_focus); the others keep their size and send every
+	FOCUS_BACKGROUND_FPS_DIVISOR-th frame. All of it is applied to the running
+	pipelines, and the resolution change restarts the encoder with an IDR frame, so a
+	switch is visible well within one GOP.
+	"""
+
+	def __init__(self, streamer, budget=None, lease_seconds: float = FOCUS_LEASE_SECONDS):
+		self.streamer = streamer
+		self.budget = budget
+		self.lease_seconds = lease_seconds
+		self.port: Optional[int] = None
+		self._lease_until = 0.0
+		self._lock = threading.Lock()
+		# Replays cannot be rescaled; every other stream remembers its unfocused size
+		self._normal_sizes: Dict[int, tuple] = {
+			sub_streamer.config.port: (sub_streamer.config.output_width, sub_streamer.config.output_height)
+			for sub_streamer in streamer.streamers
+			if sub_streamer.config.replay_location is None
+		}
+
+	def request(self, port: Optional[int], source_ip: str) -> dict:
+		"""Focus `port` (None releases the focus). Repeating the current focus renews its lease."""
+		if port is not None and port not in self._normal_sizes:
+			return {"ok": False, "port": port, "error": f"no camera stream on port {port}"}
+		with self._lock:
+			self._lease_until = time.monotonic() + self.lease_seconds
+			if port == self.port:
+				return {"ok": True, "port": port}
+			started_at = time.monotonic()
+			self._switch(port)
+		logger.info(
+			f"[focus] {source_ip} {'focused ' + str(port) if port is not None else 'released focus'}; "
+			f"queued in {(time.monotonic() - started_at) * 1000:.1f} ms"
+		)
+		return {"ok": True, "port": port}
+
+	def _stream_fields(self, port: int, focus_port: Optional[int], recording: bool) -> dict:
+		width, height = self._normal_sizes[port]
+		divisor = 1
+		# splitmuxsink's muxers cannot take a new resolution mid-file, so a recorded stream keeps its size
+		if port == focus_port and not recording:
+			width, height = CAMERA_FRAME_WIDTH, CAMERA_FRAME_HEIGHT
+		elif focus_port is not None:
+			divisor = FOCUS_BACKGROUND_FPS_DIVISOR
+		return {"output_width": width, "output_height": height, "frame_rate_divisor": divisor}
+
+	def _switch(self, focus_port: Optional[int]):
+		self.port = focus_port
+		# Bitrates first, so a boosted resolution never starts at the old bitrate
+		if self.budget is not None:
+			self.budget.set_focus(focus_port)
+		configs = {sub_streamer.config.port: sub_streamer.config for sub_streamer in self.streamer.streamers}
+		for port in self._normal_sizes:
+			recording = configs[port].recording is not None and configs[port].recording.enabled
+			if port == focus_port and recording:
+				logger.info(f"[focus] {port} is being recorded; boosting its bitrate and frame rate but not its resolution")
+			fields = {
+				name: value
+				for name, value in self._stream_fields(port, focus_port, recording).items()
+				if getattr(configs[port], name) != value
+			}
+			if fields:
+				self.streamer.update_stream_config(port, fields)
+
+	def run(self, stop_event: threading.Event):
+		while not stop_event.wait(FOCUS_CHECK_SECONDS):
+			with self._lock:
+				if self.port is None or time.monotonic() < self._lease_until:
+					continue
+				expired = self.port
+				self._switch(None)
+			logger.info(f"[focus] focus on {expired} was not renewed within {self.lease_seconds:.0f}s; released")
+
+
+class FocusRequester:
+	"""Receiver side of operator focus: asks the streamer to boost one stream and times the switch.
+
+	Each switch logs how long the streamer took to acknowledge it and, when focusing, how long
+	until the first frame at the new resolution was decoded.
+	"""
+
+	def __init__(self, receiver, control_port: int, streamer_ip: Callable[[], Optional[str]]):
+		self.receiver = receiver
+		self.control_port = control_port
+		self.streamer_ip = streamer_ip
+		self.focused_port: Optional[int] = None
+		self.switch_latencies_ms: List[float] = []
+		self._lock = threading.Lock()
+
+	def is_focused(self, stream_name: str) -> bool:
+		return self.focused_port is not None and self.receiver.stream_port(stream_name) == self.focused_port
+
+	def toggle(self, stream_name: str):
+		"""Focus the stream, or release the focus if it already has it. Returns immediately."""
+		port = self.receiver.stream_port(stream_name)
+		target = None if port == self.focused_port else port
+		threading.Thread(target=self._switch, args=(target,), daemon=True).start()
+
+	def _send(self, port: Optional[int]) -> Optional[dict]:
+		streamer_ip = self.streamer_ip()
+		if streamer_ip is None:
+			logger.warning("[focus] streamer address unknown (no discovery); cannot request focus")
+			return None
+		request_id = uuid.uuid4().hex
+		request = {"type": FOCUS_REQUEST_MESSAGE_TYPE, "request_id": request_id, "port": port}
+		s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		try:
+			mark_control_socket(s)
+			s.settimeout(FOCUS_REPLY_TIMEOUT_SECONDS)
+			s.sendto(json.dumps(request).encode("utf8"), (streamer_ip, self.control_port))
+			deadline = time.monotonic() + FOCUS_REPLY_TIMEOUT_SECONDS
+			while time.monotonic() < deadline:
+				payload = json.loads(s.recv(FOCUS_RESULT_MAX_BYTES).decode("utf-8"))
+				if payload.get("type") == FOCUS_RESULT_MESSAGE_TYPE and payload.get("request_id") == request_id:
+					return payload
+		except socket.timeout:
+			logger.warning(f"[focus] no reply from {streamer_ip}:{self.control_port}")
+		except (OSError, ValueError, AttributeError) as exc:
+			logger.warning(f"[focus] request failed: {exc}")
+		finally:
+			s.close()
+		return None
+
+	def _frame_shape(self, stream_name: str) -> Optional[tuple]:
+		frame = self.receiver.get_frame(stream_name)
+		return None if frame is None else frame.shape[:2]
+
+	def _switch(self, port: Optional[int]):
+		with self._lock:
+			stream_name = self.receiver.stream_name(port) if port is not None else None
+			shape_before = self._frame_shape(stream_name) if stream_name is not None else None
+			sequence = self.receiver.get_frame_sequence(stream_name) if stream_name is not None else 0
+			requested_at = time.monotonic()
+			result = self._send(port)
+			if result is None:
+				return
+			acknowledged_ms = (time.monotonic() - requested_at) * 1000
+			if not result.get("ok"):
+				logger.warning(f"[focus] streamer refused focus on {port}: {result.get('error')}")
+				return
+			self.focused_port = port
+		if port is None:
+			logger.info(f"[focus] released; acknowledged in {acknowledged_ms:.1f} ms")
+			return
+		# The switch has landed once a frame at the boosted resolution comes out of the decoder
+		while self.focused_port == port and time.monotonic() - requested_at < FOCUS_MEASURE_TIMEOUT_SECONDS:
+			current = self.receiver.get_frame_sequence(stream_name)
+			if current != sequence:
+				sequence = current
+				shape = self._frame_shape(stream_name)
+				if shape is not None and shape != shape_before:
+					switched_ms = (time.monotonic() - requested_at) * 1000
+					self.switch_latencies_ms.append(switched_ms)
+					logger.info(
+						f"[focus] {stream_name} focused: acknowledged in {acknowledged_ms:.1f} ms, "
+						f"first {shape[1]}x{shape[0]} frame after {switched_ms:.0f} ms"
+					)
+					return
+			time.sleep(FOCUS_MEASURE_POLL_SECONDS)
+		if self.focused_port != port:
+			return
+		logger.info(
+			f"[focus] {stream_name} focused: acknowledged in {acknowledged_ms:.1f} ms "
+			"(no resolution change seen, switch latency not measured)"
+		)
+
+	def run(self, stop_event: threading.Event):
+		while not stop_event.wait(FOCUS_REFRESH_SECONDS):
+			port = self.focused_port
+			if port is not None and not self._lock.locked():
+				self._send(port)
+
+	def summary(self) -> str:
+		latencies = sorted(self.switch_latencies_ms)
+		if not latencies:
+			return "focus switches=0"
+		return (
+			f"focus switches={len(latencies)}, latency p50={latencies[len(latencies) // 2]:.0f} ms, "
+			f"max={latencies[-1]:.0f} ms"
+		)
@@ -0,0 +1,638 @@
+from common_utils import (
+	get_logger,
+	configure_logging,
+	build_sequential_ports,
+	install_stop_signal_handlers,
+	build_discovery_probe,
+	normalize_discovery_payload,
+	parse_discovery_payload,
+	clamp,
+	RecordingConfig,
+	DISCOVERY_MESSAGE_TYPE,
+	DISCOVERY_VERSION,
+)
+
+import json
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from receiver_utils import handle_arguments, MultiReceiver
+from decode_workers import DecodeWorkerPool
+from operator_focus import FocusRequester
+from udp_qos import UdpDropMonitor, configure_control_dscp, mark_control_socket, warn_if_buffer_capped
+
+logger = get_logger(__name__)
+
+DISCOVERY_SOCKET_TIMEOUT_SECONDS = 0.25
+DISCOVERY_BUFFER_SIZE_BYTES = 4096
+MIN_TIMEOUT_SECONDS = 1.0
+DISCOVERY_TIMEOUT_SECONDS = 5.0
+DISCOVERY_PROBE_RETRY_SECONDS = 1.0
+WARN_EVERY_N_FAILURES = 50
+DISPLAY_UPDATE_MS = 30
+GRID_COLS = 4
+DISCOVERY_CACHE_FILE_NAME = ".discovery_cache.json"
+DISCOVERY_CACHE_VERSION = 1
+DISCOVERY_CACHE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+DISCOVERY_CACHE_ANY_STREAMER_KEY = "*"
+DISCOVERY_IDENTITY_KEYS = ("streamer_ip", "base_port", "stream_count", "mosaic")
+RECONNECT_CHECK_INTERVAL_SECONDS = 0.5
+RESUBSCRIBE_INTERVAL_SECONDS = 5.0
+STALLED_RESUBSCRIBE_INTERVAL_SECONDS = 1.0
+STALLED_REBUILD_INTERVAL_SECONDS = 3.0
+
+
+def _discovery_cache_path() -> str:
+	return os.path.join(os.path.dirname(os.path.abspath(__file__)), DISCOVERY_CACHE_FILE_NAME)
+
+
+def _discovery_cache_key(streamer_name_filter: Optional[str]) -> str:
+	return streamer_name_filter or DISCOVERY_CACHE_ANY_STREAMER_KEY
+
+
+def _read_discovery_cache_entries(cache_path: str) -> Dict[str, Any]:
+	try:
+		with open(cache_path, "r", encoding="utf-8") as f:
+			payload = json.load(f)
+	except FileNotFoundError:
+		return {}
+	except (OSError, json.JSONDecodeError) as exc:
+		logger.warning(f"[discovery-cache] ignoring unreadable cache {cache_path}: {exc}")
+		return {}
+
+	if not isinstance(payload, dict) or payload.get("version") != DISCOVERY_CACHE_VERSION:
+		return {}
+	entries = payload.get("entries", {})
+	return entries if isinstance(entries, dict) else {}
+
+
+def load_discovery_cache(
+	cache_path: str, streamer_name_filter: str = None
+) -> Optional[Dict[str, Any]]:
+	"""Return the cached discovery result for this filter, or None if missing/stale/invalid."""
+	entry = _read_discovery_cache_entries(cache_path).get(_discovery_cache_key(streamer_name_filter))
+	if not isinstance(entry, dict):
+		return None
+
+	cached_at = entry.get("cached_at")
+	if not isinstance(cached_at, (int, float)) or time.time() - cached_at > DISCOVERY_CACHE_MAX_AGE_SECONDS:
+		return None
+
+	return normalize_discovery_payload(
+		dict(entry, type=DISCOVERY_MESSAGE_TYPE, version=DISCOVERY_VERSION),
+		streamer_name_filter,
+	)
+
+
+def save_discovery_cache(
+	cache_path: str, discovered: Dict[str, Any], streamer_name_filter: str = None
+):
+	"""Persist a discovery result, replacing the cache file atomically."""
+	entries = _read_discovery_cache_entries(cache_path)
+	entries[_discovery_cache_key(streamer_name_filter)] = dict(discovered, cached_at=time.time())
+	temp_path = f"{cache_path}.tmp"
+	try:
+		with open(temp_path, "w", encoding="utf-8") as f:
+			json.dump({"version": DISCOVERY_CACHE_VERSION, "entries": entries}, f, indent=2)
+		os.replace(temp_path, cache_path)
+	except OSError as exc:
+		logger.warning(f"[discovery-cache] failed to write {cache_path}: {exc}")
+
+
+def send_subscribe_request(streamer_ip: str, control_port: int, ports: List[int]) -> bool:
+	"""Ask the streamer to add this host as a unicast client for the given ports."""
+	try:
+		# Use a dummy socket connection to figure out the local IP that routes to streamer
+		s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		s.connect((streamer_ip, control_port))
+		local_ip = s.getsockname()[0]
+		s.close()
+
+		request = {
+			"type": "SUBSCRIBE_REQUEST",
+			"receiver_ip": local_ip,
+			"ports": ports
+		}
+		s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		mark_control_socket(s)
+		s.sendto(json.dumps(request).encode('utf8'), (streamer_ip, control_port))
+		s.close()
+		logger.info(f"Sent SUBSCRIBE_REQUEST to {streamer_ip}:{control_port} for ports {ports}")
+		return True
+	except Exception as e:
+		logger.error(f"Failed to send subscribe request: {e}")
+		return False
+
+
+def confirm_cached_discovery(
+	cached: Dict[str, Any],
+	cache_path: str,
+	discovery_port: int,
+	streamer_name_filter: str,
+	control_port: int,
+	ports: List[int],
+):
+	"""Run discovery in the background to confirm (or correct) a cache-based subscription."""
+	confirmed = discover_stream_config(
+		discovery_port, DISCOVERY_TIMEOUT_SECONDS, streamer_name_filter, control_port
+	)
+	if confirmed is None:
+		logger.warning(
+			f"[discovery-cache] '{cached['streamer_name']}' not seen within {DISCOVERY_TIMEOUT_SECONDS:.1f}s; "
+			"keeping cached subscription"
+		)
+		return
+
+	save_discovery_cache(cache_path, confirmed, streamer_name_filter)
+	changed = [key for key in DISCOVERY_IDENTITY_KEYS if confirmed[key] != cached[key]]
+	if not changed:
+		logger.info(f"[discovery-cache] cached entry for '{cached['streamer_name']}' confirmed")
+		return
+
+	logger.warning(
+		f"[discovery-cache] cached entry was stale ({', '.join(changed)} changed); cache corrected"
+	)
+	if build_sequential_ports(confirmed["base_port"], confirmed["stream_count"]) == ports:
+		send_subscribe_request(confirmed["streamer_ip"], control_port, ports)
+	else:
+		logger.warning(
+			f"[discovery-cache] streamer now serves base_port={confirmed['base_port']}, "
+			f"streams={confirmed['stream_count']}; restart the receiver to pick up the new layout"
+		)
+
+
+def discover_stream_config(
+	discovery_port: int, timeout: float, streamer_name_filter: str = None, control_port: int = None
+):
+	"""Listen for UDP discovery heartbeats and return the first matching stream config.
+
+	When `control_port` is given, a DISCOVERY_PROBE is broadcast there on start (and re-sent
+	every DISCOVERY_PROBE_RETRY_SECONDS) so streamers answer without waiting for their next interval.
+	"""
+	receiver_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	receiver_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+	receiver_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+	mark_control_socket(receiver_socket)
+	receiver_socket.bind(("", discovery_port))
+	receiver_socket.settimeout(DISCOVERY_SOCKET_TIMEOUT_SECONDS)
+
+	logger.info(
+		f"Listening for discovery on UDP {discovery_port} for up to {timeout:.1f}s"
+		f"{f' (filter={streamer_name_filter})' if streamer_name_filter else ''}..."
+	)
+
+	probe_packet = build_discovery_probe(streamer_name_filter)
+	next_probe_at = time.time()
+	deadline = time.time() + max(MIN_TIMEOUT_SECONDS, timeout)
+	try:
+		while time.time() < deadline:
+			if control_port is not None and time.time() >= next_probe_at:
+				try:
+					# Replies come back unicast to this socket's discovery port
+					receiver_socket.sendto(probe_packet, ("255.255.255.255", control_port))
+				except OSError as exc:
+					logger.warning(f"Discovery probe to UDP {control_port} failed: {exc}")
+				next_probe_at = time.time() + DISCOVERY_PROBE_RETRY_SECONDS
+
+			try:
+				data, _addr = receiver_socket.recvfrom(DISCOVERY_BUFFER_SIZE_BYTES)
+			except socket.timeout:
+				continue
+
+			discovered = parse_discovery_payload(data, streamer_name_filter)
+			if discovered is None:
+				continue
+
+			logger.info(
+				f"Discovered '{discovered['streamer_name']}' at {discovered['streamer_ip']} "
+				f"(base_port={discovered['base_port']}, streams={discovered['stream_count']}, mosaic={discovered.get('mosaic', False)})"
+			)
+			return discovered
+	finally:
+		receiver_socket.close()
+
+	return None
+
+
+class ReconnectMetrics:
+	def __init__(self):
+		self.stalls = 0
+		self.streamer_restarts = 0
+		self.resubscribes = 0
+		self.pipeline_rebuilds = 0
+		self.reconnect_seconds: List[float] = []
+
+	def record_reconnect(self, seconds: float):
+		self.reconnect_seconds.append(seconds)
+
+	def summary(self) -> str:
+		times = self.reconnect_seconds
+		timing = (
+			f"reconnect_s(last={times[-1]:.2f}, mean={sum(times) / len(times):.2f}, max={max(times):.2f})"
+			if times
+			else "reconnect_s(n/a)"
+		)
+		return (
+			f"stalls={self.stalls}, streamer_restarts={self.streamer_restarts}, reconnects={len(times)}, "
+			f"resubscribes={self.resubscribes}, pipeline_rebuilds={self.pipeline_rebuilds}, {timing}"
+		)
+
+
+class ReconnectMonitor:
+	"""Keeps subscriptions alive across streamer restarts.
+
+	A stream is stalled once no frame arrived for `stall_timeout` seconds: it is resubscribed
+	right away and its pipeline rebuilt if frames still do not return. Discovery is watched for
+	the subscribed streamer so a new session (restart) or a changed address/port layout is
+	followed without waiting for a stall. Subscriptions are also refreshed periodically.
+	"""
+
+	def __init__(
+		self,
+		receiver: MultiReceiver,
+		discovered: Optional[Dict[str, Any]],
+		ports: List[int],
+		control_port: int,
+		discovery_port: int,
+		stall_timeout: float,
+		cache_path: str = None,
+		streamer_name_filter: str = None,
+		on_ports_changed: Callable[[List[int]], None] = None,
+	):
+		self.receiver = receiver
+		self.discovered = discovered
+		self.ports = list(ports)
+		self.control_port = control_port
+		self.discovery_port = discovery_port
+		self.stall_timeout = stall_timeout
+		self.cache_path = cache_path
+		self.streamer_name_filter = streamer_name_filter
+		# Told about each new port layout, after the receiver has switched to it
+		self.on_ports_changed = on_ports_changed
+		self.metrics = ReconnectMetrics()
+
+		self._stop_event = threading.Event()
+		self._lock = threading.Lock()
+		self._stalled_since: Dict[int, float] = {}
+		self._last_rebuild_at: Dict[int, float] = {}
+		self._last_subscribe_at = time.monotonic()
+		self._threads: List[threading.Thread] = []
+
+	def start(self):
+		targets = [self._watch_streams]
+		if self.discovered is not None:
+			targets.append(self._watch_discovery)
+		for target in targets:
+			t = threading.Thread(target=target, daemon=True)
+			t.start()
+			self._threads.append(t)
+
+	def stop(self):
+		self._stop_event.set()
+		for t in self._threads:
+			t.join(timeout=1.0)
+		logger.info(f"[reconnect] {self.metrics.summary()}")
+
+	def _resubscribe(self, counted: bool = True):
+		with self._lock:
+			discovered = self.discovered
+			ports = list(self.ports)
+		self._last_subscribe_at = time.monotonic()
+		if discovered is None:
+			return
+		if send_subscribe_request(discovered["streamer_ip"], self.control_port, ports) and counted:
+			self.metrics.resubscribes += 1
+
+	def _watch_streams(self):
+		while not self._stop_event.wait(RECONNECT_CHECK_INTERVAL_SECONDS):
+			now = time.monotonic()
+			keepalive_due = now - self._last_subscribe_at >= RESUBSCRIBE_INTERVAL_SECONDS
+			resubscribe = False
+			rebuild = []
+
+			with self._lock:
+				ports = list(self.ports)
+			ages = {port: self.receiver.get_port_frame_age(port) for port in ports}
+
+			# _on_announcement marks a new layout's ports stalled under the same lock
+			with self._lock:
+				for port, age in ages.items():
+					if age is None:
+						continue
+					last_frame_at = now - age
+					stalled_since = self._stalled_since.get(port)
+
+					if stalled_since is not None and age < self.stall_timeout and last_frame_at > stalled_since:
+						del self._stalled_since[port]
+						seconds = last_frame_at - stalled_since
+						self.metrics.record_reconnect(seconds)
+						logger.info(f"[reconnect] port {port} receiving again after {seconds:.2f}s")
+					elif stalled_since is None and age >= self.stall_timeout:
+						self._stalled_since[port] = last_frame_at
+						self._last_rebuild_at[port] = now
+						self.metrics.stalls += 1
+						logger.warning(f"[reconnect] port {port} stalled ({age:.1f}s without frames); resubscribing")
+						resubscribe = True
+					elif stalled_since is not None:
+						if now - self._last_subscribe_at >= STALLED_RESUBSCRIBE_INTERVAL_SECONDS:
+							resubscribe = True
+						if now - self._last_rebuild_at.get(port, now) >= STALLED_REBUILD_INTERVAL_SECONDS:
+							self._last_rebuild_at[port] = now
+							rebuild.append(port)
+
+			if resubscribe or keepalive_due:
+				self._resubscribe(counted=resubscribe)
+			if rebuild:
+				logger.warning(f"[reconnect] rebuilding pipelines for still-stalled ports {rebuild}")
+				self.receiver.restart_ports(rebuild)
+				self.metrics.pipeline_rebuilds += len(rebuild)
+
+	def _watch_discovery(self):
+		streamer_name = self.discovered["streamer_name"]
+		try:
+			listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+			mark_control_socket(listen_socket)
+			listen_socket.bind(("", self.discovery_port))
+			listen_socket.settimeout(DISCOVERY_SOCKET_TIMEOUT_SECONDS)
+		except OSError as exc:
+			logger.error(f"[reconnect] cannot watch discovery on UDP {self.discovery_port}: {exc}")
+			return
+
+		try:
+			# Ask for an immediate announcement so a cache-based start is confirmed quickly
+			listen_socket.sendto(build_discovery_probe(streamer_name), ("255.255.255.255", self.control_port))
+		except OSError as exc:
+			logger.warning(f"[reconnect] discovery probe failed: {exc}")
+
+		first = True
+		try:
+			while not self._stop_event.is_set():
+				try:
+					data, _addr = listen_socket.recvfrom(DISCOVERY_BUFFER_SIZE_BYTES)
+				except socket.timeout:
+					continue
+				announced = parse_discovery_payload(data, streamer_name)
+				if announced is None:
+					continue
+				self._on_announcement(announced, first)
+				first = False
+		finally:
+			listen_socket.close()
+
+	def _on_announcement(self, announced: Dict[str, Any], first: bool):
+		with self._lock:
+			current = self.discovered
+		changed = [key for key in DISCOVERY_IDENTITY_KEYS if announced[key] != current[key]]
+		restarted = (
+			not first
+			and announced["session_id"] is not None
+			and current.get("session_id") is not None
+			and announced["session_id"] != current["session_id"]
+		)
+
+		if self.cache_path is not None and (first or changed or restarted):
+			save_discovery_cache(self.cache_path, announced, self.streamer_name_filter)
+		if first and not changed:
+			logger.info(f"[reconnect] discovery confirmed '{announced['streamer_name']}'")
+
+		if not changed and not restarted:
+			with self._lock:
+				self.discovered = announced
+			return
+
+		new_ports = build_sequential_ports(announced["base_port"], announced["stream_count"])
+		if new_ports is None:
+			logger.error(f"[reconnect] ignoring announcement with invalid port layout: {announced}")
+			return
+
+		now = time.monotonic()
+		with self._lock:
+			self.discovered = announced
+			old_ports = self.ports
+			self.ports = new_ports
+			for port in new_ports:
+				self._stalled_since.setdefault(port, now)
+				self._last_rebuild_at[port] = now
+
+		if restarted:
+			self.metrics.streamer_restarts += 1
+			logger.warning(f"[reconnect] '{announced['streamer_name']}' restarted (new session); resubscribing")
+		if changed:
+			logger.warning(f"[reconnect] streamer {', '.join(changed)} changed; following new announcement")
+
+		self._resubscribe()
+		if new_ports != old_ports:
+			logger.info(f"[reconnect] port layout changed {old_ports} -> {new_ports}")
+			self.receiver.reconfigure(new_ports, announced["streamer_name"])
+			if self.on_ports_changed is not None:
+				self.on_ports_changed(new_ports)
+		else:
+			self.receiver.restart_ports(new_ports)
+			self.metrics.pipeline_rebuilds += len(new_ports)
+
+
+def run_display(receiver: MultiReceiver, focus: FocusRequester = None) -> int:
+	# Qt is imported here so headless receivers and spawned decode workers never load it
+	from PyQt6.QtWidgets import QApplication
+	from PyQt6.QtCore import QTimer, QCoreApplication
+	from receiver_display import StreamDisplayWidget
+
+	# Create PyQt application
+	app = QApplication([])
+	window = StreamDisplayWidget(receiver, GRID_COLS, focus)
+	window.show()
+
+	logger.info("PyQt6 display window opened")
+
+	# Start update timer
+	timer = QTimer()
+	timer.timeout.connect(window.update_frames)
+	timer.start(DISPLAY_UPDATE_MS)
+
+	# Poll for external stop_event (SIGINT/SIGTERM) and quit Qt when set
+	poll_timer = QTimer()
+	poll_timer.timeout.connect(lambda: QCoreApplication.quit() if receiver.stop_event.is_set() else None)
+	poll_timer.start(100)
+
+	# Run event loop
+	try:
+		return app.exec()
+	finally:
+		timer.stop()
+		try:
+			poll_timer.stop()
+		except Exception:
+			pass
+
+
+def main():
+	args = handle_arguments()
+	configure_logging(args.log_level, args.log_backend, args.log_rate_limit)
+	configure_control_dscp(args.control_dscp)
+
+	base_port = args.base_port
+	stream_count = args.count
+	timeout = args.timeout
+	auto_config = args.auto_config == "on"
+	streamer_name_filter = args.streamer_name_filter
+	discovery_port = args.discovery_port
+	discovery_timeout = args.discovery_timeout
+
+	connection_timeout = timeout
+	window_prefix = "Stream"
+	setup_start = time.time()
+
+	discovery_cache = args.discovery_cache == "on"
+	cache_path = _discovery_cache_path()
+	discovered = None
+	cached = None
+
+	if auto_config:
+		if discovery_cache:
+			cached = load_discovery_cache(cache_path, streamer_name_filter)
+
+		if cached is not None:
+			discovered = cached
+			logger.info(
+				f"[discovery-cache] Subscribing to cached '{cached['streamer_name']}' at {cached['streamer_ip']} "
+				f"(base_port={cached['base_port']}, streams={cached['stream_count']}, mosaic={cached['mosaic']}); "
+				"confirming in background"
+			)
+		else:
+			discovered = discover_stream_config(
+				discovery_port, DISCOVERY_TIMEOUT_SECONDS, streamer_name_filter, args.control_port
+			)
+			if discovered is not None and discovery_cache:
+				save_discovery_cache(cache_path, discovered, streamer_name_filter)
+		connection_timeout = clamp(
+			timeout - (time.time() - setup_start), MIN_TIMEOUT_SECONDS, timeout
+		)
+
+		if discovered is not None:
+			base_port = discovered["base_port"]
+			stream_count = discovered["stream_count"]
+			window_prefix = discovered["streamer_name"]
+		else:
+			logger.warning(
+				"No matching discovery packet found. Falling back to manual args."
+			)
+
+	control_port = args.control_port
+	ports = build_sequential_ports(base_port, stream_count)
+	if ports is None:
+		logger.error(
+			f"Invalid port configuration: base_port={base_port}, count={stream_count}"
+		)
+		exit(2)
+
+	if auto_config and discovered is not None:
+		# Send subscription request to the streamer so it starts sending unicast
+		send_subscribe_request(discovered["streamer_ip"], control_port, ports)
+
+	auto_reconnect = args.auto_reconnect == "on"
+	if cached is not None and not auto_reconnect:
+		threading.Thread(
+			target=confirm_cached_discovery,
+			args=(cached, cache_path, discovery_port, streamer_name_filter, control_port, ports),
+			daemon=True,
+		).start()
+
+	logger.info(
+		f"Receiver config: unicast_ports={ports}, timeout={connection_timeout:.1f}s"
+	)
+
+	warn_if_buffer_capped(args.receive_buffer_bytes, False, "receiver")
+	recording = RecordingConfig(
+		args.record_dir,
+		args.record_segment_seconds,
+		args.record_format,
+		enabled=args.record == "on",
+	)
+	if args.decode_workers > 0:
+		if args.gateway_fmp4 == "on":
+			logger.warning("fMP4 gateway needs in-process decoding; only MJPEG is served with --decode-workers")
+		receiver = DecodeWorkerPool(
+			ports,
+			connection_timeout,
+			window_prefix,
+			min(args.decode_workers, len(ports)),
+			persistent=auto_reconnect,
+			recording=recording,
+			preview_decode=args.preview_decode == "on",
+			receive_buffer_bytes=args.receive_buffer_bytes,
+		)
+	else:
+		receiver = MultiReceiver(
+			ports,
+			connection_timeout,
+			window_prefix,
+			persistent=auto_reconnect,
+			recording=recording,
+			preview_decode=args.preview_decode == "on",
+			fmp4=args.gateway_fmp4 == "on",
+			receive_buffer_bytes=args.receive_buffer_bytes,
+		)
+	receiver.start()
+
+	drop_monitor = UdpDropMonitor("receiver", ports)
+	threading.Thread(target=drop_monitor.run, args=(receiver.stop_event,), daemon=True).start()
+
+	reconnect_monitor = None
+	if auto_reconnect:
+		# The monitor also confirms a cache-based start through its discovery watch
+		reconnect_monitor = ReconnectMonitor(
+			receiver,
+			discovered if auto_config else None,
+			ports,
+			control_port,
+			discovery_port,
+			args.stall_timeout,
+			cache_path if discovery_cache else None,
+			streamer_name_filter,
+			on_ports_changed=drop_monitor.set_ports,
+		)
+		reconnect_monitor.start()
+
+	focus = None
+	if auto_config and discovered is not None:
+		# The monitor follows the streamer to a new address after a restart
+		focus = FocusRequester(
+			receiver,
+			control_port,
+			lambda: (reconnect_monitor.discovered if reconnect_monitor is not None else discovered)["streamer_ip"],
+		)
+		threading.Thread(target=focus.run, args=(receiver.stop_event,), daemon=True).start()
+
+	http_service = None
+	if args.http_port is not None:
+		from receiver_http import ReceiverHttpService
+		http_service = ReceiverHttpService(receiver, args.http_host, args.http_port)
+		if not http_service.start():
+			http_service = None
+
+	install_stop_signal_handlers(receiver.stop_event.set, logger, "Stopping receivers...")
+
+	try:
+		if args.display == "on":
+			run_display(receiver, focus)
+		else:
+			logger.info("Display disabled; receiving until stopped")
+			while not receiver.stop_event.is_set():
+				time.sleep(0.1)
+	except KeyboardInterrupt:
+		logger.info("Keyboard interrupt received.")
+	finally:
+		logger.info("Stopping receivers...")
+		if reconnect_monitor is not None:
+			reconnect_monitor.stop()
+		if http_service is not None:
+			http_service.stop()
+		receiver.stop()
+		if focus is not None and focus.switch_latencies_ms:
+			logger.info(f"[focus] {focus.summary()}")
+
+	logger.info("All receivers stopped")
@@ -0,0 +1,161 @@
+from PyQt6.QtWidgets import QMainWindow, QLabel, QApplication, QWidget, QVBoxLayout
+from PyQt6.QtGui import QPixmap, QImage
+from PyQt6.QtCore import Qt, pyqtSlot, QCoreApplication, QObject, QEvent
+
+from common_utils import get_logger, CAMERA_FRAME_WIDTH, CAMERA_FRAME_HEIGHT
+
+logger = get_logger(__name__)
+
+
+class StreamWindowKeyFilter(QObject):
+	"""Per-stream window keys: Q quits the app, R toggles recording of that stream, F toggles
+	operator focus (the streamer boosts that stream's resolution, frame rate and bitrate).
+
+	Activating a stream window also focuses that stream (full decode when preview decode is on).
+	"""
+	def __init__(self, receiver, stream_name: str, focus=None):
+		super().__init__()
+		self.receiver = receiver
+		self.stream_name = stream_name
+		self.focus = focus
+
+	def eventFilter(self, obj, event):
+		if event.type() == QEvent.Type.WindowActivate:
+			self.receiver.set_focused_stream(self.stream_name)
+			return False
+		if event.type() == QEvent.Type.KeyPress:
+			try:
+				if event.key() == Qt.Key.Key_Q:
+					self.receiver.stop()
+					QCoreApplication.quit()
+					return True
+				if event.key() == Qt.Key.Key_R:
+					self.receiver.toggle_recording(self.stream_name)
+					return True
+				if event.key() == Qt.Key.Key_F and self.focus is not None:
+					self.focus.toggle(self.stream_name)
+					return True
+			except Exception:
+				pass
+		return False
+
+
+class StreamDisplayWidget(QMainWindow):
+	"""Controller that creates one top-level window per stream (simple multi-window mode)."""
+	def __init__(self, receiver, grid_cols: int = 4, focus=None):
+		super().__init__()
+		self.receiver = receiver
+		self.grid_cols = grid_cols
+		self.focus = focus
+		# Map stream_name -> (window, label, event_filter)
+		self.stream_windows: dict[str, tuple[QMainWindow, QLabel, QObject]] = {}
+		self.setWindowTitle("WRecorder - Stream Display")
+		# Keep a small controller window (can be minimized)
+		self.resize(320, 40)
+
+	def _compute_window_size(self) -> tuple[int, int]:
+		"""Compute a sensible default size for per-stream windows based on screen and camera size."""
+		screen = QApplication.primaryScreen()
+		if screen is None:
+			return CAMERA_FRAME_WIDTH, CAMERA_FRAME_HEIGHT
+		avail = screen.availableGeometry()
+		max_w = max(320, min(CAMERA_FRAME_WIDTH, avail.width() // 2))
+		max_h = max(240, min(CAMERA_FRAME_HEIGHT, avail.height() // 2))
+		return int(max_w), int(max_h)
+
+	def _window_title(self, stream_name: str) -> str:
+		title = f"{stream_name} [REC]" if self.receiver.is_recording(stream_name) else stream_name
+		if self.focus is not None and self.focus.is_focused(stream_name):
+			title += " [FOCUS]"
+		return title
+
+	@pyqtSlot()
+	def update_frames(self):
+		current_names = set(self.stream_windows.keys())
+		new_names_list = self.receiver.get_sorted_stream_names()
+		new_names = set(new_names_list)
+
+		# Create windows for newly discovered streams
+		for name in new_names - current_names:
+			win = QMainWindow()
+			win.setWindowTitle(self._window_title(name))
+			label = QLabel()
+			label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+			w, h = self._compute_window_size()
+			label.setFixedSize(w, h)
+			# Put label in a container with zero margins so the label area matches desired size
+			container = QWidget()
+			layout = QVBoxLayout()
+			layout.setContentsMargins(0, 0, 0, 0)
+			layout.setSpacing(0)
+			layout.addWidget(label)
+			container.setLayout(layout)
+			win.setCentralWidget(container)
+			# Resize window to match content size (label). Avoid arbitrary extra offsets.
+			win.resize(w, h)
+			win.show()
+			# Install an event filter so pressing 'Q' quits the app, 'R' toggles recording and 'F' focus
+			try:
+				filter_obj = StreamWindowKeyFilter(self.receiver, name, self.focus)
+				win.installEventFilter(filter_obj)
+			except Exception:
+				filter_obj = None
+			self.stream_windows[name] = (win, label, filter_obj)
+
+		# Remove windows for disconnected streams
+		for name in list(current_names - new_names):
+			win, label, filt = self.stream_windows.pop(name)
+			try:
+				if filt is not None:
+					try:
+						win.removeEventFilter(filt)
+					except Exception:
+						pass
+				win.close()
+			except Exception:
+				pass
+
+		# Update frames for existing windows in sorted order
+		for name in new_names_list:
+			pair = self.stream_windows.get(name)
+			if not pair:
+				continue
+			win, label = pair[0], pair[1]
+			title = self._window_title(name)
+			if win.windowTitle() != title:
+				win.setWindowTitle(title)
+			frame = self.receiver.get_frame(name)
+			if frame is None:
+				# show waiting text
+				label.setText(f"Waiting for {name}...")
+				label.setPixmap(QPixmap())
+				continue
+			# Convert BGR -> RGB and to QImage
+			height, width = frame.shape[:2]
+			rgb_frame = frame[:, :, ::-1]
+			frame_bytes = rgb_frame.tobytes()
+			q_img = QImage(frame_bytes, width, height, 3 * width, QImage.Format.Format_RGB888)
+			pix = QPixmap.fromImage(q_img)
+			# Scale to label size keeping aspect ratio
+			lw = label.width()
+			lh = label.height()
+			pix = pix.scaled(lw, lh, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+			label.setPixmap(pix)
+	def keyPressEvent(self, event):
+		"""Handle key press events."""
+		if event.key() == Qt.Key.Key_Q:
+			logger.info("Quit key pressed. Stopping receivers...")
+			self.receiver.stop()
+			# Ensure Qt main loop exits
+			try:
+				QCoreApplication.quit()
+			except Exception:
+				self.close()
+		else:
+			super().keyPressEvent(event)
+	
+	def closeEvent(self, event):
+		"""Handle window close event."""
+		logger.info("Window closed. Stopping receivers...")
+		self.receiver.stop()
+		event.accept()
@@ -0,0 +1,566 @@
+import collections
+import html
+import io
+import json
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+from PIL import Image
+
+from common_utils import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_FORMATS = {"jpg": ("JPEG", "image/jpeg"), "jpeg": ("JPEG", "image/jpeg"), "png": ("PNG", "image/png")}
+SNAPSHOT_DEFAULT_JPEG_QUALITY = 85
+SNAPSHOT_MIN_WIDTH = 16
+SNAPSHOT_ALL_STREAMS = "all"
+MULTIPART_BOUNDARY = "wrecorder-frame"
+ENCODE_WAIT_TIMEOUT_SECONDS = 5.0
+# Slow viewers lose the oldest queued items instead of holding back the stream or other viewers
+MJPEG_CLIENT_QUEUE_FRAMES = 2
+FMP4_CLIENT_QUEUE_FRAGMENTS = 4
+MJPEG_POLL_SECONDS = 0.01
+MJPEG_IDLE_STOP_SECONDS = 5.0
+CLIENT_WAIT_SECONDS = 0.5
+FMP4_INIT_BOXES = (b"ftyp", b"moov")
+
+
+class _PendingEncode:
+	def __init__(self):
+		self.done = threading.Event()
+		self.data: Optional[bytes] = None
+		self.error: Optional[Exception] = None
+
+
+def encode_frame(frame: np.ndarray, image_format: str, width: Optional[int], quality: int) -> bytes:
+	"""Encode a BGR frame as JPEG/PNG, optionally downscaled to `width` (aspect ratio kept)."""
+	image = Image.fromarray(np.ascontiguousarray(frame[:, :, ::-1]))
+	if width is not None and width < image.width:
+		image = image.resize((width, max(1, round(image.height * width / image.width))), Image.Resampling.BILINEAR)
+	output = io.BytesIO()
+	if image_format == "JPEG":
+		image.save(output, format="JPEG", quality=quality)
+	else:
+		image.save(output, format=image_format)
+	return output.getvalue()
+
+
+class SnapshotCache:
+	"""Encoded stills keyed by stream, frame sequence and variant.
+
+	Concurrent requests for the same frame and variant wait for a single encode. Entries for
+	older frames of a stream are dropped as soon as a newer frame is requested.
+	"""
+	def __init__(self, receiver):
+		self.receiver = receiver
+		self.encodes = 0
+		self.hits = 0
+		self._lock = threading.Lock()
+		self._entries: Dict[str, Tuple[int, Dict[tuple, _PendingEncode]]] = {}
+
+	def get(self, stream_name: str, image_format: str, width: Optional[int], quality: int) -> Optional[Tuple[bytes, int]]:
+		"""Return (encoded bytes, frame sequence) for the stream's latest frame, or None if it has none."""
+		frame, sequence = self.receiver.get_frame_with_sequence(stream_name)
+		if frame is None:
+			return None
+		variant = (image_format, width, quality if image_format == "JPEG" else None)
+		with self._lock:
+			cached_sequence, variants = self._entries.get(stream_name, (None, {}))
+			if cached_sequence != sequence:
+				variants = {}
+				self._entries[stream_name] = (sequence, variants)
+			pending = variants.get(variant)
+			owner = pending is None
+			if owner:
+				pending = _PendingEncode()
+				variants[variant] = pending
+			else:
+				self.hits += 1
+
+		if owner:
+			try:
+				pending.data = encode_frame(frame, image_format, width, quality)
+			except Exception as exc:
+				pending.error = exc
+				with self._lock:
+					variants.pop(variant, None)
+			finally:
+				with self._lock:
+					self.encodes += 1
+				pending.done.set()
+		elif not pending.done.wait(ENCODE_WAIT_TIMEOUT_SECONDS):
+			raise TimeoutError(f"encode of {stream_name} #{sequence} did not finish")
+
+		if pending.error is not None:
+			raise pending.error
+		return pending.data, sequence
+
+	def forget_missing(self, stream_names):
+		with self._lock:
+			for stream_name in [name for name in self._entries if name not in stream_names]:
+				self._entries.pop(stream_name, None)
+
+
+class ClientQueue:
+	"""Bounded per-viewer queue; when full, the oldest item is dropped."""
+	def __init__(self, max_items: int, header: bytes = None):
+		self.header = header
+		self.dropped = 0
+		self.closed = False
+		self._items = collections.deque(maxlen=max_items)
+		self._condition = threading.Condition()
+
+	def put(self, item: bytes):
+		with self._condition:
+			if len(self._items) == self._items.maxlen:
+				self.dropped += 1
+			self._items.append(item)
+			self._condition.notify()
+
+	def close(self):
+		with self._condition:
+			self.closed = True
+			self._condition.notify()
+
+	def get(self, timeout: float) -> Optional[bytes]:
+		with self._condition:
+			if self.header is not None:
+				header, self.header = self.header, None
+				return header
+			if not self._items and not self.closed:
+				self._condition.wait(timeout)
+			return self._items.popleft() if self._items else None
+
+
+class FanoutChannel:
+	def __init__(self, name: str, max_queue: int):
+		self.name = name
+		self.max_queue = max_queue
+		self._lock = threading.Lock()
+		self._clients = set()
+
+	def subscribe(self, header: bytes = None) -> ClientQueue:
+		client = ClientQueue(self.max_queue, header)
+		with self._lock:
+			self._clients.add(client)
+		return client
+
+	def unsubscribe(self, client: ClientQueue):
+		with self._lock:
+			self._clients.discard(client)
+		if client.dropped:
+			logger.info(f"[http] {self.name}: viewer left after {client.dropped} dropped item(s)")
+
+	def client_count(self) -> int:
+		with self._lock:
+			return len(self._clients)
+
+	def publish(self, item: bytes):
+		with self._lock:
+			clients = list(self._clients)
+		for client in clients:
+			client.put(item)
+
+	def close_all(self):
+		with self._lock:
+			clients = list(self._clients)
+			self._clients.clear()
+		for client in clients:
+			client.close()
+
+
+class MjpegChannel(FanoutChannel):
+	"""Encodes each new frame of one stream once (through the snapshot cache) for all MJPEG viewers.
+
+	The encoder thread only runs while someone is watching.
+	"""
+	def __init__(self, receiver, cache: SnapshotCache, stream_name: str, width: Optional[int], quality: int):
+		super().__init__(f"mjpeg/{stream_name}", MJPEG_CLIENT_QUEUE_FRAMES)
+		self.receiver = receiver
+		self.cache = cache
+		self.stream_name = stream_name
+		self.width = width
+		self.quality = quality
+		self._thread: Optional[threading.Thread] = None
+		self._thread_lock = threading.Lock()
+		self.stop_event = threading.Event()
+
+	def subscribe(self, header: bytes = None) -> ClientQueue:
+		client = super().subscribe(header)
+		with self._thread_lock:
+			if self._thread is None or not self._thread.is_alive():
+				self._thread = threading.Thread(target=self._run, daemon=True)
+				self._thread.start()
+		return client
+
+	def _run(self):
+		last_sequence = None
+		idle_since = None
+		while not self.stop_event.is_set():
+			if self.client_count() == 0:
+				idle_since = idle_since or time.monotonic()
+				if time.monotonic() - idle_since > MJPEG_IDLE_STOP_SECONDS:
+					# subscribe() adds its client before taking this lock, so a viewer that arrives
+					# now is either seen here or finds no thread and starts a new one
+					with self._thread_lock:
+						if self.client_count() == 0:
+							self._thread = None
+							return
+					idle_since = None
+			else:
+				idle_since = None
+				sequence = self.receiver.get_frame_sequence(self.stream_name)
+				if sequence != last_sequence:
+					try:
+						snapshot = self.cache.get(self.stream_name, "JPEG", self.width, self.quality)
+					except Exception as exc:
+						logger.error(f"[http] {self.name}: encode failed: {exc}")
+						snapshot = None
+					if snapshot is not None:
+						data, last_sequence = snapshot
+						self.publish(data)
+			time.sleep(MJPEG_POLL_SECONDS)
+
+
+def _iter_boxes(data: bytearray):
+	"""Yield (type, end offset) of each complete top-level ISO BMFF box at the start of `data`."""
+	offset = 0
+	while len(data) - offset >= 8:
+		size, box_type = struct.unpack_from(">I4s", data, offset)
+		header_size = 8
+		if size == 1:
+			if len(data) - offset < 16:
+				return
+			size = struct.unpack_from(">Q", data, offset + 8)[0]
+			header_size = 16
+		if size < header_size or len(data) - offset < size:
+			return
+		offset += size
+		yield box_type, offset
+
+
+class Fmp4Channel(FanoutChannel):
+	"""Fans one stream's fragmented MP4 out to browser viewers.
+
+	The muxer output is split into boxes: ftyp+moov form the init segment every viewer gets
+	first, and each moof+mdat pair is queued as one unit so a dropped item never leaves a
+	viewer with half a fragment.
+	"""
+	def __init__(self, stream_name: str):
+		super().__init__(f"fmp4/{stream_name}", FMP4_CLIENT_QUEUE_FRAGMENTS)
+		self.stream_name = stream_name
+		self.source = None
+		self.init_segment: Optional[bytes] = None
+		self._pending = bytearray()
+		self._fragment = bytearray()
+		self._init = bytearray()
+		self._feed_lock = threading.Lock()
+
+	def bind(self, remuxer):
+		if remuxer is self.source:
+			return
+		if self.source is not None:
+			self.source.remove_listener(self.feed)
+		self.source = remuxer
+		if remuxer is not None:
+			remuxer.add_listener(self.feed)
+
+	def feed(self, data: Optional[bytes]):
+		with self._feed_lock:
+			if data is None:
+				# Pipeline rebuilt: viewers must start over with the new init segment
+				self._pending.clear()
+				self._fragment.clear()
+				self._init.clear()
+				self.init_segment = None
+				self.close_all()
+				return
+			self._pending.extend(data)
+			consumed = 0
+			for box_type, end in _iter_boxes(self._pending):
+				box = self._pending[consumed:end]
+				consumed = end
+				if box_type in FMP4_INIT_BOXES and self.init_segment is None:
+					self._init.extend(box)
+					if box_type == b"moov":
+						self.init_segment = bytes(self._init)
+				elif self.init_segment is not None:
+					self._fragment.extend(box)
+					if box_type == b"mdat":
+						self.publish(bytes(self._fragment))
+						self._fragment.clear()
+			del self._pending[:consumed]
+
+	def subscribe(self, header: bytes = None) -> Optional[ClientQueue]:
+		with self._feed_lock:
+			if self.init_segment is None:
+				return None
+			return super().subscribe(self.init_segment)
+
+
+class StreamGateway:
+	"""One encode (MJPEG) or remux (fMP4) per stream and variant, shared by every HTTP viewer."""
+	def __init__(self, receiver, cache: SnapshotCache):
+		self.receiver = receiver
+		self.cache = cache
+		self._lock = threading.Lock()
+		self._mjpeg: Dict[tuple, MjpegChannel] = {}
+		self._fmp4: Dict[str, Fmp4Channel] = {}
+
+	def mjpeg_channel(self, stream_name: str, width: Optional[int], quality: int) -> MjpegChannel:
+		key = (stream_name, width, quality)
+		with self._lock:
+			channel = self._mjpeg.get(key)
+			if channel is None:
+				channel = MjpegChannel(self.receiver, self.cache, stream_name, width, quality)
+				self._mjpeg[key] = channel
+			return channel
+
+	def fmp4_channel(self, stream_name: str) -> Optional[Fmp4Channel]:
+		remuxer = self.receiver.get_remuxer(stream_name)
+		if remuxer is None:
+			return None
+		with self._lock:
+			channel = self._fmp4.get(stream_name)
+			if channel is None:
+				channel = Fmp4Channel(stream_name)
+				self._fmp4[stream_name] = channel
+		channel.bind(remuxer)
+		return channel
+
+	def stop(self):
+		with self._lock:
+			channels = list(self._mjpeg.values()) + list(self._fmp4.values())
+		for channel in channels:
+			if isinstance(channel, MjpegChannel):
+				channel.stop_event.set()
+			if isinstance(channel, Fmp4Channel):
+				channel.bind(None)
+			channel.close_all()
+
+
+class ReceiverRequestHandler(BaseHTTPRequestHandler):
+	server_version = "WRecorder"
+
+	def log_message(self, format, *args):
+		logger.debug(f"[http] {self.address_string()} {format % args}")
+
+	def do_GET(self):
+		url = urlsplit(self.path)
+		query = parse_qs(url.query)
+		parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+		try:
+			if not parts:
+				self._send_viewer_page()
+			elif parts == ["streams"]:
+				self._send_stream_list()
+			elif len(parts) == 2 and parts[0] == "snapshot":
+				self._send_snapshot(parts[1], query)
+			elif len(parts) == 2 and parts[0] == "mjpeg":
+				self._stream_mjpeg(parts[1], query)
+			elif len(parts) == 2 and parts[0] == "fmp4":
+				self._stream_fmp4(parts[1])
+			else:
+				self.send_error(404, "unknown endpoint")
+		except (BrokenPipeError, ConnectionResetError):
+			pass
+
+	def _send_bytes(self, status: int, content_type: str, body: bytes, headers: dict = None):
+		self.send_response(status)
+		self.send_header("Content-Type", content_type)
+		self.send_header("Content-Length", str(len(body)))
+		self.send_header("Cache-Control", "no-store")
+		for name, value in (headers or {}).items():
+			self.send_header(name, value)
+		self.end_headers()
+		self.wfile.write(body)
+
+	def _send_stream_list(self):
+		receiver = self.server.receiver
+		streams = []
+		for name in receiver.get_sorted_stream_names():
+			age = receiver.frame_store.get_frame_age(name)
+			streams.append({
+				"name": name,
+				"sequence": receiver.get_frame_sequence(name),
+				"age_seconds": None if age is None else round(age, 3),
+			})
+		self._send_bytes(200, "application/json", json.dumps({"streams": streams}).encode("utf-8"))
+
+	def _parse_variant(self, file_name: str, query: dict):
+		stream_name, _, extension = file_name.rpartition(".")
+		if extension.lower() not in SNAPSHOT_FORMATS or not stream_name:
+			raise ValueError(f"expected <stream>.{{{','.join(sorted(SNAPSHOT_FORMATS))}}}")
+		image_format, content_type = SNAPSHOT_FORMATS[extension.lower()]
+		width = int(query["width"][0]) if "width" in query else None
+		if width is not None and width < SNAPSHOT_MIN_WIDTH:
+			raise ValueError(f"width must be >= {SNAPSHOT_MIN_WIDTH}")
+		quality = int(query.get("quality", [SNAPSHOT_DEFAULT_JPEG_QUALITY])[0])
+		if not 1 <= quality <= 95:
+			raise ValueError("quality must be between 1 and 95")
+		return stream_name, image_format, content_type, width, quality
+
+	def _send_snapshot(self, file_name: str, query: dict):
+		try:
+			stream_name, image_format, content_type, width, quality = self._parse_variant(file_name, query)
+		except ValueError as exc:
+			self.send_error(400, str(exc))
+			return
+
+		cache = self.server.snapshot_cache
+		if stream_name == SNAPSHOT_ALL_STREAMS:
+			self._send_all_snapshots(image_format, content_type, width, quality)
+			return
+
+		snapshot = cache.get(stream_name, image_format, width, quality)
+		if snapshot is None:
+			self.send_error(404, f"no frame for stream {stream_name}")
+			return
+		data, sequence = snapshot
+		self._send_bytes(200, content_type, data, {"X-Frame-Sequence": str(sequence)})
+
+	def _send_viewer_page(self):
+		tiles = "".join(
+			f'<figure><img src="/mjpeg/{html.escape(name)}?width=640"><figcaption>{html.escape(name)}</figcaption></figure>'
+			for name in self.server.receiver.get_sorted_stream_names()
+		)
+		page = (
+			"<!doctype html><html><head><title>WRecorder</title><style>"
+			"body{background:#111;color:#ddd;font-family:sans-serif;display:flex;flex-wrap:wrap}"
+			"img{max-width:640px;width:100%}figure{margin:4px}"
+			f"</style></head><body>{tiles or 'No streams yet; reload shortly.'}</body></html>"
+		)
+		self._send_bytes(200, "text/html; charset=utf-8", page.encode("utf-8"))
+
+	def _pump(self, client: ClientQueue, write_item):
+		"""Write queued items to this viewer until it disconnects or the service stops."""
+		stopping = self.server.stopping
+		try:
+			while not stopping.is_set() and not client.closed:
+				item = client.get(CLIENT_WAIT_SECONDS)
+				if item is not None:
+					write_item(item)
+		except (BrokenPipeError, ConnectionResetError):
+			pass
+
+	def _stream_mjpeg(self, stream_name: str, query: dict):
+		try:
+			_name, _format, _type, width, quality = self._parse_variant(f"{stream_name}.jpg", query)
+		except ValueError as exc:
+			self.send_error(400, str(exc))
+			return
+		if stream_name not in self.server.receiver.get_stream_names():
+			self.send_error(404, f"no frame for stream {stream_name}")
+			return
+
+		channel = self.server.gateway.mjpeg_channel(stream_name, width, quality)
+		client = channel.subscribe()
+		self.send_response(200)
+		self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={MULTIPART_BOUNDARY}")
+		self.send_header("Cache-Control", "no-store")
+		self.end_headers()
+
+		def write_frame(data: bytes):
+			self.wfile.write(
+				f"--{MULTIPART_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n\r\n".encode("utf-8")
+			)
+			self.wfile.write(data)
+			self.wfile.write(b"\r\n")
+
+		try:
+			self._pump(client, write_frame)
+		finally:
+			channel.unsubscribe(client)
+
+	def _stream_fmp4(self, stream_name: str):
+		channel = self.server.gateway.fmp4_channel(stream_name)
+		if channel is None:
+			self.send_error(501, "fMP4 gateway is not enabled for this stream (--gateway-fmp4 on, in-process decode)")
+			return
+		client = channel.subscribe()
+		if client is None:
+			self.send_error(503, f"{stream_name} has not produced an init segment yet")
+			return
+		self.send_response(200)
+		self.send_header("Content-Type", "video/mp4")
+		self.send_header("Cache-Control", "no-store")
+		self.end_headers()
+		try:
+			self._pump(client, self.wfile.write)
+		finally:
+			channel.unsubscribe(client)
+
+	def _send_all_snapshots(self, image_format: str, content_type: str, width: Optional[int], quality: int):
+		"""Every stream's latest still in one multipart/mixed response."""
+		cache = self.server.snapshot_cache
+		stream_names = self.server.receiver.get_sorted_stream_names()
+		cache.forget_missing(stream_names)
+		body = io.BytesIO()
+		for stream_name in stream_names:
+			snapshot = cache.get(stream_name, image_format, width, quality)
+			if snapshot is None:
+				continue
+			data, sequence = snapshot
+			body.write(
+				(
+					f"--{MULTIPART_BOUNDARY}\r\n"
+					f"Content-Type: {content_type}\r\n"
+					f"Content-Length: {len(data)}\r\n"
+					f"X-Stream-Name: {stream_name}\r\n"
+					f"X-Frame-Sequence: {sequence}\r\n\r\n"
+				).encode("utf-8")
+			)
+			body.write(data)
+			body.write(b"\r\n")
+		body.write(f"--{MULTIPART_BOUNDARY}--\r\n".encode("utf-8"))
+		self._send_bytes(200, f"multipart/mixed; boundary={MULTIPART_BOUNDARY}", body.getvalue())
+
+
+class ReceiverHttpService:
+	"""Local HTTP access to a receiver's latest frames (no Qt needed).
+
+	Besides stills it acts as a fan-out gateway: browsers watch /mjpeg/<stream> or
+	/fmp4/<stream> off the receiver's single subscription, so extra viewers cost the
+	streamer nothing.
+	"""
+	def __init__(self, receiver, host: str, port: int):
+		self.receiver = receiver
+		self.host = host
+		self.port = port
+		self.server: Optional[ThreadingHTTPServer] = None
+		self._thread: Optional[threading.Thread] = None
+
+	def start(self) -> bool:
+		try:
+			self.server = ThreadingHTTPServer((self.host, self.port), ReceiverRequestHandler)
+		except OSError as exc:
+			logger.error(f"[http] Failed to listen on {self.host}:{self.port}: {exc}")
+			return False
+		self.server.daemon_threads = True
+		self.server.receiver = self.receiver
+		self.server.snapshot_cache = SnapshotCache(self.receiver)
+		self.server.gateway = StreamGateway(self.receiver, self.server.snapshot_cache)
+		self.server.stopping = threading.Event()
+		self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+		self._thread.start()
+		logger.info(f"[http] Serving snapshots on http://{self.host}:{self.port}/snapshot/<stream>.jpg")
+		return True
+
+	def stop(self):
+		if self.server is None:
+			return
+		self.server.stopping.set()
+		self.server.gateway.stop()
+		self.server.shutdown()
+		self.server.server_close()
+		if self._thread is not None:
+			self._thread.join(timeout=1.0)
+		cache = self.server.snapshot_cache
+		logger.info(f"[http] snapshot encodes={cache.encodes} cache_hits={cache.hits}")
+		self.server = None
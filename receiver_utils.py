@@ -1,44 +1,42 @@
 import argparse
 from common_utils import (
 	apply_required_external_defaults,
+	add_logging_arguments,
+	build_splitmux_description,
+	int_in_range,
 	get_logger,
+	recording_location_pattern,
+	RecordingConfig,
 	CAMERA_FRAME_WIDTH,
 	CAMERA_FRAME_HEIGHT,
+	RECORDING_MUXERS,
+	init_gstreamer,
 )
+from recording_index import SegmentIndexWriter
+from udp_qos import DEFAULT_RECEIVE_BUFFER_BYTES, DSCP_CS6, DSCP_MAX
+import os
 import threading
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 import numpy as np
 import time
-from PyQt6.QtWidgets import QMainWindow, QLabel, QApplication, QWidget, QVBoxLayout
-from PyQt6.QtGui import QPixmap, QImage
-from PyQt6.QtCore import Qt, pyqtSlot, QCoreApplication, QObject, QEvent
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst
-
-
-class QuitFilter(QObject):
-	def __init__(self, receiver):
-		super().__init__()
-		self.receiver = receiver
-
-	def eventFilter(self, obj, event):
-		if event.type() == QEvent.Type.KeyPress:
-			try:
-				if event.key() == Qt.Key.Key_Q:
-					self.receiver.stop()
-					QCoreApplication.quit()
-					return True
-			except Exception:
-				pass
-		return False
 
 logger = get_logger(__name__)
 
-# Initialize GStreamer
-Gst.init(None)
+# Bound by _require_gstreamer() when the first pipeline is built, so importing this module stays cheap
+Gst = None
 
 GSTREAMER_CONNECTION_POLL_INTERVAL_SECONDS = 0.1
+RECORDING_QUEUE = "queue leaky=downstream max-size-buffers=0 max-size-bytes=0 max-size-time=2000000000"
+RECORDING_FINALIZE_TIMEOUT_SECONDS = 3.0
+GATEWAY_QUEUE = "queue leaky=downstream max-size-buffers=0 max-size-bytes=0 max-size-time=1000000000"
+# Roughly one GOP per fragment, so viewers can join at a fragment boundary
+GATEWAY_FRAGMENT_DURATION_MS = 500
+
+def _require_gstreamer():
+	global Gst
+	if Gst is None:
+		Gst = init_gstreamer()
+
 
 def handle_arguments():
 	parser = argparse.ArgumentParser(
@@ -78,11 +76,95 @@ def handle_arguments():
 	parser.add_argument(
 		"--control-port", type=int, help="UDP port used for subscribing to unicast streams"
 	)
+	parser.add_argument(
+		"--control-dscp",
+		type=int_in_range("control-dscp", 0, DSCP_MAX),
+		help=f"DSCP marking for subscription and discovery packets (default {DSCP_CS6} = CS6)",
+	)
+	parser.add_argument(
+		"--receive-buffer-bytes",
+		type=int_in_range("receive-buffer-bytes", 1),
+		help="UDP receive buffer per stream; size it for the streamer's keyframe bursts",
+	)
 	parser.add_argument(
 		"--discovery-timeout",
 		type=float,
 		help="Optional override for discovery phase timeout in seconds",
 	)
+	parser.add_argument(
+		"--auto-reconnect",
+		type=str,
+		choices=["on", "off"],
+		help="Resubscribe and rebuild stalled streams automatically (e.g. after a streamer restart)",
+	)
+	parser.add_argument(
+		"--stall-timeout",
+		type=float,
+		help="Seconds without frames before a stream is considered stalled",
+	)
+	parser.add_argument(
+		"--record",
+		type=str,
+		choices=["on", "off"],
+		help="Start recording every stream's H.264 (toggle per stream with R in its window)",
+	)
+	parser.add_argument(
+		"--record-dir",
+		type=str,
+		help="Directory for recorded segments",
+	)
+	parser.add_argument(
+		"--record-segment-seconds",
+		type=float,
+		help="Length of each recorded segment in seconds",
+	)
+	parser.add_argument(
+		"--record-format",
+		type=str,
+		choices=sorted(RECORDING_MUXERS),
+		help="Container for recorded segments",
+	)
+	parser.add_argument(
+		"--discovery-cache",
+		type=str,
+		choices=["on", "off"],
+		help="Subscribe immediately from the last discovery result while discovery confirms it in the background",
+	)
+	parser.add_argument(
+		"--decode-workers",
+		type=int,
+		help="Decode streams in this many worker processes with shared-memory frame handoff (0 decodes in-process)",
+	)
+	parser.add_argument(
+		"--display",
+		type=str,
+		choices=["on", "off"],
+		help="Show stream windows (off runs headless, e.g. only serving HTTP snapshots)",
+	)
+	parser.add_argument(
+		"--http-port",
+		type=int,
+		help="Serve the latest frames over HTTP on this port (null disables)",
+	)
+	parser.add_argument(
+		"--http-host",
+		type=str,
+		help="Address the HTTP service binds to",
+	)
+	parser.add_argument(
+		"--gateway-fmp4",
+		type=str,
+		choices=["on", "off"],
+		help="Remux each stream once into fragmented MP4 for HTTP viewers (/fmp4/<stream>)",
+	)
+	parser.add_argument(
+		"--preview-decode",
+		type=str,
+		choices=["on", "off"],
+		help="Decode only keyframes for streams whose window is not focused (when showing several streams)",
+	)
+
+	add_logging_arguments(parser)
 
 	try:
 		apply_required_external_defaults(parser, "receiver-only")
@@ -94,12 +176,16 @@ def handle_arguments():
 class FrameStore:
 	def __init__(self):
 		self._frames: dict = {}
+		self._updated_at: dict = {}
+		self._sequences: dict = {}
 		self._lock = threading.Lock()
 
 	def set_latest(self, stream_name: str, frame: np.ndarray) -> Optional[Exception]:
 		try:
 			with self._lock:
 				self._frames[stream_name] = frame.copy()
+				self._updated_at[stream_name] = time.monotonic()
+				self._sequences[stream_name] = self._sequences.get(stream_name, 0) + 1
 			return None
 		except (TypeError, RuntimeError) as exc:
 			return exc
@@ -108,9 +194,27 @@ class FrameStore:
 		try:
 			with self._lock:
 				self._frames.pop(stream_name, None)
+				self._updated_at.pop(stream_name, None)
+				self._sequences.pop(stream_name, None)
 		except Exception:
 			pass
 
+	def get_frame_sequence(self, stream_name: str) -> int:
+		"""Number of frames stored for this stream so far (0 if none)."""
+		with self._lock:
+			return self._sequences.get(stream_name, 0)
+
+	def get_frame_with_sequence(self, stream_name: str):
+		"""Latest frame together with its sequence number, as one consistent pair."""
+		with self._lock:
+			return self._frames.get(stream_name), self._sequences.get(stream_name, 0)
+
+	def get_frame_age(self, stream_name: str) -> Optional[float]:
+		"""Seconds since the last frame for this stream, or None if none has arrived."""
+		with self._lock:
+			updated_at = self._updated_at.get(stream_name)
+		return None if updated_at is None else time.monotonic() - updated_at
+
 	def snapshot_keys(self) -> List[str]:
 		with self._lock:
 			return list(self._frames.keys())
@@ -120,27 +224,373 @@ class FrameStore:
 			return self._frames.get(stream_name)
 
 
+def _caps_event_size(info) -> Optional[tuple]:
+	"""(width, height) from a CAPS event seen by an event probe, or None for any other event."""
+	event = info.get_event()
+	if event is None or event.type != Gst.EventType.CAPS:
+		return None
+	structure = event.parse_caps().get_structure(0)
+	has_width, width = structure.get_int("width")
+	has_height, height = structure.get_int("height")
+	return (width, height) if has_width and has_height else None
+
+
+class StreamRecorder:
+	"""Records a receiver's depayloaded H.264 into time-based segments without decoding.
+
+	The recording branch (queue ! h264parse ! splitmuxsink) is attached to the receiver's tee
+	on demand and detached with an EOS so every segment is finalized, so recording can be
+	switched on and off while the stream keeps playing. The muxers cannot take a new
+	resolution mid-file, so a resolution change (operator focus) starts a new segment.
+	"""
+	def __init__(self, label: str, config: RecordingConfig):
+		self.label = label
+		self.config = config
+		self.enabled = config.enabled
+		self._lock = threading.Lock()
+		self._pipeline = None
+		self._tee = None
+		self._branch = None
+		self._tee_pad = None
+		self._closing: dict = {}
+		self._size = None
+		# Keyed by each branch's splitmuxsink so an index never mixes two pipelines' running times
+		self._index_writers: dict = {}
+
+	def attach(self, pipeline):
+		"""Bind to a freshly created pipeline (re-attaching after a rebuild keeps the on/off state)."""
+		with self._lock:
+			self._pipeline = pipeline
+			self._tee = pipeline.get_by_name("rectee")
+			self._size = None
+			self._tee.get_static_pad("sink").add_probe(Gst.PadProbeType.EVENT_DOWNSTREAM, self._on_tee_event)
+			bus = pipeline.get_bus()
+			bus.enable_sync_message_emission()
+			bus.connect("sync-message::element", self._on_sync_element_message)
+			if self.enabled:
+				self._start_branch()
+
+	def detach(self):
+		"""Finalize any open segment before the pipeline is torn down."""
+		with self._lock:
+			closing = self._stop_branch()
+			self._pipeline = None
+			self._tee = None
+		if closing is not None:
+			self._finalize_branch(*closing)
+
+	def set_enabled(self, enabled: bool) -> bool:
+		closing = None
+		with self._lock:
+			if enabled == self.enabled:
+				return self.enabled
+			self.enabled = enabled
+			if self._pipeline is not None:
+				if enabled:
+					self._start_branch()
+				else:
+					closing = self._stop_branch()
+		if closing is not None:
+			# Waiting for the muxer to finish must not block the caller (usually the Qt thread)
+			threading.Thread(target=self._finalize_branch, args=closing, daemon=True).start()
+		return self.enabled
+
+	def _on_tee_event(self, pad, info):
+		size = _caps_event_size(info)
+		if size is None:
+			return Gst.PadProbeReturn.OK
+		with self._lock:
+			previous, self._size = self._size, size
+			if previous is None or previous == size or self._branch is None:
+				return Gst.PadProbeReturn.OK
+			# The old branch is unlinked before the new caps reach it, then finalized with an EOS
+			closing = self._stop_branch()
+			self._start_branch()
+		logger.info(f"[{self.label}] resolution changed to {size[0]}x{size[1]}; starting a new recording segment")
+		if closing is not None:
+			threading.Thread(target=self._finalize_branch, args=closing, daemon=True).start()
+		return Gst.PadProbeReturn.OK
+
+	def _start_branch(self):
+		os.makedirs(self.config.directory, exist_ok=True)
+		location = recording_location_pattern(self.config, self.label)
+		description = f"{RECORDING_QUEUE} ! h264parse name=recparse ! {build_splitmux_description(self.config, location)}"
+		try:
+			branch = Gst.parse_bin_from_description(description, True)
+			index_writer = SegmentIndexWriter(self.label)
+			self._index_writers[branch.get_by_name("recsink")] = index_writer
+			branch.get_by_name("recparse").get_static_pad("src").add_probe(
+				Gst.PadProbeType.BUFFER, index_writer.buffer_probe
+			)
+			self._pipeline.add(branch)
+			branch.sync_state_with_parent()
+			# request_pad_simple() replaced get_request_pad() in GStreamer 1.20
+			request_pad = getattr(self._tee, "request_pad_simple", None) or self._tee.get_request_pad
+			tee_pad = request_pad("src_%u")
+			tee_pad.add_probe(Gst.PadProbeType.BUFFER, self._drop_until_keyframe)
+			tee_pad.link(branch.get_static_pad("sink"))
+		except Exception as e:
+			logger.error(f"[{self.label}] Failed to start recording: {e}")
+			return
+		self._branch = branch
+		self._tee_pad = tee_pad
+		logger.info(f"[{self.label}] Recording to {location}")
+
+	def _stop_branch(self):
+		branch, tee_pad = self._branch, self._tee_pad
+		self._branch = None
+		self._tee_pad = None
+		if branch is None:
+			return None
+
+		closed_event = threading.Event()
+		self._closing[branch.get_by_name("recsink")] = closed_event
+		tee = self._tee
+
+		def _unlink(pad, info):
+			sink_pad = branch.get_static_pad("sink")
+			pad.unlink(sink_pad)
+			tee.release_request_pad(pad)
+			sink_pad.send_event(Gst.Event.new_eos())
+			return Gst.PadProbeReturn.REMOVE
+
+		tee_pad.add_probe(Gst.PadProbeType.IDLE, _unlink)
+		return branch, closed_event
+
+	def _finalize_branch(self, branch, closed_event: threading.Event):
+		if not closed_event.wait(RECORDING_FINALIZE_TIMEOUT_SECONDS):
+			logger.warning(f"[{self.label}] Recording segment not finalized within {RECORDING_FINALIZE_TIMEOUT_SECONDS}s")
+		self._closing.pop(branch.get_by_name("recsink"), None)
+		self._index_writers.pop(branch.get_by_name("recsink"), None)
+		branch.set_state(Gst.State.NULL)
+		parent = branch.get_parent()
+		if parent is not None:
+			parent.remove(branch)
+		logger.info(f"[{self.label}] Recording stopped")
+
+	@staticmethod
+	def _drop_until_keyframe(pad, info):
+		buffer = info.get_buffer()
+		if buffer is not None and buffer.has_flags(Gst.BufferFlags.DELTA_UNIT):
+			return Gst.PadProbeReturn.DROP
+		return Gst.PadProbeReturn.REMOVE
+
+	def _on_sync_element_message(self, bus, message):
+		structure = message.get_structure()
+		if structure is None:
+			return
+		index_writer = self._index_writers.get(message.src)
+		if index_writer is not None:
+			index_writer.on_element_message(structure)
+		if structure.get_name() != "splitmuxsink-fragment-closed":
+			return
+		closed_event = self._closing.get(message.src)
+		if closed_event is not None:
+			closed_event.set()
+
+
+class PreviewDecodeGate:
+	"""Keyframe-only decoding for streams that are only previewed.
+
+	A probe on the decoder's sink pad drops delta units while preview is on. Once a delta
+	unit of a GOP is dropped the rest of that GOP cannot be decoded, so when the stream is
+	focused again full decoding resumes at the next keyframe: the window keeps its last
+	frame for up to one GOP, and the decode work skipped in preview is never paid back.
+	"""
+	def __init__(self, label: str):
+		self.label = label
+		self.preview = False
+		self.skipped_frames = 0
+		self._lock = threading.Lock()
+		# Deltas were dropped, so the decoder is missing references until the next keyframe
+		self._broken = False
+
+	def attach(self, pipeline):
+		decoder = pipeline.get_by_name("decoder")
+		if decoder is None:
+			return
+		with self._lock:
+			self._broken = False
+		decoder.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+
+	def set_preview(self, preview: bool):
+		with self._lock:
+			if preview == self.preview:
+				return
+			self.preview = preview
+		logger.debug(f"[{self.label}] {'keyframe-only' if preview else 'full'} decode")
+
+	def _on_buffer(self, pad, info):
+		buffer = info.get_buffer()
+		with self._lock:
+			if not buffer.has_flags(Gst.BufferFlags.DELTA_UNIT):
+				self._broken = False
+				return Gst.PadProbeReturn.OK
+			if self.preview:
+				self._broken = True
+				self.skipped_frames += 1
+				return Gst.PadProbeReturn.DROP
+			if self._broken:
+				# Refocused mid-GOP; the decoder has nothing to build on until the next keyframe
+				self.skipped_frames += 1
+				return Gst.PadProbeReturn.DROP
+		return Gst.PadProbeReturn.OK
+
+
+class Fmp4Remuxer:
+	"""Remuxes a receiver's H.264 into fragmented MP4 once, for any number of HTTP viewers.
+
+	Listeners get the muxer's output bytes as they are produced, and `None` whenever the
+	pipeline is rebuilt or the stream changes resolution (a new init segment follows). mp4mux
+	cannot renegotiate a resolution, so it is replaced by a fresh one at the new caps.
+	"""
+	def __init__(self, label: str):
+		self.label = label
+		self._lock = threading.Lock()
+		self._listeners: list = []
+		self._pipeline = None
+		self._appsink = None
+		self._handler_id = None
+		self._size = None
+
+	def branch_description(self) -> str:
+		return (
+			f"rectee. ! {GATEWAY_QUEUE} ! h264parse name=gwparse ! "
+			f"mp4mux name=gwmux fragment-duration={GATEWAY_FRAGMENT_DURATION_MS} streamable=true ! "
+			"appsink name=fmp4sink emit-signals=true sync=false"
+		)
+
+	def attach(self, pipeline):
+		"""Connect to a freshly built pipeline (before it starts, so the init segment is not missed)."""
+		self._appsink = pipeline.get_by_name("fmp4sink")
+		if self._appsink is None:
+			return
+		self._pipeline = pipeline
+		self._size = None
+		self._handler_id = self._appsink.connect("new-sample", self._on_new_sample)
+		pipeline.get_by_name("gwparse").get_static_pad("src").add_probe(
+			Gst.PadProbeType.EVENT_DOWNSTREAM, self._on_parser_event
+		)
+		self._notify(None)
+
+	def _on_parser_event(self, pad, info):
+		size = _caps_event_size(info)
+		if size is None:
+			return Gst.PadProbeReturn.OK
+		previous, self._size = self._size, size
+		if previous is not None and previous != size:
+			# Runs before the caps are pushed on, so they reach the new muxer
+			self._replace_muxer(pad.get_parent_element())
+			logger.info(f"[{self.label}] resolution changed to {size[0]}x{size[1]}; restarting the fMP4 stream")
+			self._notify(None)
+		return Gst.PadProbeReturn.OK
+
+	def _replace_muxer(self, parser):
+		old_muxer = self._pipeline.get_by_name("gwmux")
+		parser.unlink(old_muxer)
+		old_muxer.unlink(self._appsink)
+		old_muxer.set_state(Gst.State.NULL)
+		self._pipeline.remove(old_muxer)
+		muxer = Gst.ElementFactory.make("mp4mux", "gwmux")
+		muxer.set_property("fragment-duration", GATEWAY_FRAGMENT_DURATION_MS)
+		muxer.set_property("streamable", True)
+		self._pipeline.add(muxer)
+		parser.link(muxer)
+		muxer.link(self._appsink)
+		muxer.sync_state_with_parent()
+
+	def detach(self):
+		if self._appsink is not None and self._handler_id is not None:
+			try:
+				self._appsink.disconnect(self._handler_id)
+			except Exception:
+				pass
+		self._appsink = None
+		self._handler_id = None
+		self._pipeline = None
+
+	def add_listener(self, listener):
+		with self._lock:
+			if listener not in self._listeners:
+				self._listeners.append(listener)
+
+	def remove_listener(self, listener):
+		with self._lock:
+			if listener in self._listeners:
+				self._listeners.remove(listener)
+
+	def _notify(self, data: Optional[bytes]):
+		with self._lock:
+			listeners = list(self._listeners)
+		for listener in listeners:
+			try:
+				listener(data)
+			except Exception as e:
+				logger.error(f"[{self.label}] fMP4 listener failed: {e}")
+
+	def _on_new_sample(self, appsink):
+		sample = appsink.emit("pull-sample")
+		if sample is None:
+			return Gst.FlowReturn.OK
+		buffer = sample.get_buffer()
+		self._notify(buffer.extract_dup(0, buffer.get_size()))
+		return Gst.FlowReturn.OK
+
+
 class SingleReceiver:
-	def __init__(self, port: int, timeout: float, stop_event: threading.Event, frame_store: FrameStore, window_prefix: str):
+	def __init__(
+		self,
+		port: int,
+		timeout: float,
+		stop_event: threading.Event,
+		frame_store: FrameStore,
+		window_prefix: str,
+		persistent: bool = False,
+		recording: RecordingConfig = None,
+		fmp4: bool = False,
+		receive_buffer_bytes: int = DEFAULT_RECEIVE_BUFFER_BYTES,
+	):
 		self.port = port
+		self.receive_buffer_bytes = receive_buffer_bytes
 		self.timeout = timeout
 		self.stop_event = stop_event
 		self.frame_store = frame_store
 		self.window_prefix = window_prefix
+		# Persistent receivers keep listening after the first-frame timeout so they can be reconnected
+		self.persistent = persistent
 		self.pipeline = None
 		self.appsink = None
 		self._first_frame_event = threading.Event()
 		self._appsink_handler_id = None
 		self._stop_requested = False
-
-	def start(self):
-		pipeline_str = (
-			f"udpsrc port={self.port} buffer-size=2097152 ! "
+		self._pipeline_lock = threading.Lock()
+		self.recorder = StreamRecorder(self.window_name, recording) if recording is not None else None
+		self.remuxer = Fmp4Remuxer(self.window_name) if fmp4 else None
+		self.preview_gate = PreviewDecodeGate(self.window_name)
+
+	@property
+	def window_name(self) -> str:
+		return f"{self.window_prefix}-{self.port}"
+
+	def _build_pipeline_str(self) -> str:
+		# With recording or the fMP4 gateway available, the parsed H.264 is teed before the decoder
+		record_tee = (
+			"video/x-h264,stream-format=byte-stream,alignment=au ! tee name=rectee allow-not-linked=true ! "
+			if self.recorder is not None or self.remuxer is not None
+			else ""
+		)
+		return (
+			f"udpsrc port={self.port} buffer-size={self.receive_buffer_bytes} ! "
 			"application/x-rtp,media=video,clock-rate=90000,payload=96,encoding-name=H264 ! "
-			"rtpjitterbuffer latency=100 ! rtph264depay ! h264parse ! avdec_h264 ! videoconvert ! video/x-raw,format=BGR ! appsink name=appsink emit-signals=true max-buffers=5 drop=true sync=false"
+			f"rtpjitterbuffer latency=100 ! rtph264depay ! h264parse ! {record_tee}avdec_h264 name=decoder ! videoconvert ! video/x-raw,format=BGR ! appsink name=appsink emit-signals=true max-buffers=5 drop=true sync=false"
+			+ ("" if self.remuxer is None else f" {self.remuxer.branch_description()}")
 		)
-		window_name = f"{self.window_prefix}-{self.port}"
-		logger.info(f"[{window_name}] Attempting to listen on UDP port {self.port} (unicast)...")
+
+	def _create_pipeline(self) -> bool:
+		"""Build the pipeline, hook up the appsink callback and set it PLAYING."""
+		_require_gstreamer()
+		pipeline_str = self._build_pipeline_str()
+		window_name = self.window_name
 		logger.info(f"[{window_name}] Pipeline: {pipeline_str}")
 
 		try:
@@ -149,7 +599,7 @@ class SingleReceiver:
 
 			if self.appsink is None:
 				logger.error(f"[{window_name}] Failed to find appsink element in pipeline")
-				return
+				return False
 
 			# connect appsink new-sample callback
 			try:
@@ -162,13 +612,72 @@ class SingleReceiver:
 					logger.error(f"[{window_name}] Failed to connect appsink handler: {e}")
 					self._appsink_handler_id = None
 
+			if self.remuxer is not None:
+				self.remuxer.attach(self.pipeline)
+
 			# Set to PLAYING state
 			ret = self.pipeline.set_state(Gst.State.PLAYING)
 			if ret == Gst.StateChangeReturn.FAILURE:
 				logger.error(f"[{window_name}] Failed to set pipeline to PLAYING state")
-				return
+				return False
+
+			if self.recorder is not None:
+				self.recorder.attach(self.pipeline)
+			self.preview_gate.attach(self.pipeline)
 		except Exception as e:
 			logger.error(f"[{window_name}] Failed to create GStreamer pipeline: {e}")
+			return False
+		return True
+
+	def _teardown_pipeline(self):
+		if self.appsink is not None and self._appsink_handler_id is not None:
+			try:
+				self.appsink.disconnect(self._appsink_handler_id)
+			except Exception:
+				pass
+		self._appsink_handler_id = None
+		if self.recorder is not None:
+			self.recorder.detach()
+		if self.remuxer is not None:
+			self.remuxer.detach()
+		if self.pipeline is not None:
+			try:
+				self.pipeline.set_state(Gst.State.NULL)
+			except Exception:
+				pass
+
+	def set_recording(self, enabled: bool) -> bool:
+		if self.recorder is None:
+			logger.warning(f"[{self.window_name}] Recording is not configured")
+			return False
+		return self.recorder.set_enabled(enabled)
+
+	def is_recording(self) -> bool:
+		return self.recorder is not None and self.recorder.enabled
+
+	def set_preview(self, preview: bool):
+		self.preview_gate.set_preview(preview)
+
+	def restart_pipeline(self) -> bool:
+		"""Tear down and rebuild this stream's pipeline (fresh jitterbuffer and decoder state)."""
+		with self._pipeline_lock:
+			if self._stop_requested or self.stop_event.is_set():
+				return False
+			logger.info(f"[{self.window_name}] Rebuilding pipeline")
+			self._teardown_pipeline()
+			self._first_frame_event.clear()
+			return self._create_pipeline()
+
+	def _should_run(self) -> bool:
+		return not self.stop_event.is_set() and not self._stop_requested
+
+	def start(self):
+		window_name = self.window_name
+		logger.info(f"[{window_name}] Attempting to listen on UDP port {self.port} (unicast)...")
+
+		with self._pipeline_lock:
+			created = self._create_pipeline()
+		if not created and not self.persistent:
 			return
 
 		connection_timeout = self.timeout
@@ -176,24 +685,25 @@ class SingleReceiver:
 
 		# Wait for first frame (set by callback)
 		if not self._first_frame_event.wait(timeout=connection_timeout):
-			logger.error(f"Failed to receive stream on port {self.port} (timeout after {connection_timeout}s)")
-			# ensure cleanup
-			self.stop()
-			return
-
-		logger.info(f"Receiving stream on port {self.port} -> window '{window_name}'")
+			if not self.persistent:
+				logger.error(f"Failed to receive stream on port {self.port} (timeout after {connection_timeout}s)")
+				# ensure cleanup
+				self.stop()
+				return
+			logger.warning(
+				f"No stream on port {self.port} after {connection_timeout}s; waiting for reconnect"
+			)
+		else:
+			logger.info(f"Receiving stream on port {self.port} -> window '{window_name}'")
 
 		# Keep thread alive until stop is requested
 		try:
-			while not self.stop_event.is_set():
+			while self._should_run():
 				time.sleep(GSTREAMER_CONNECTION_POLL_INTERVAL_SECONDS)
 		finally:
 			self.frame_store.remove_stream(window_name)
-			if self.pipeline is not None:
-				try:
-					self.pipeline.set_state(Gst.State.NULL)
-				except Exception:
-					pass
+			with self._pipeline_lock:
+				self._teardown_pipeline()
 
 	def _process_sample(self, sample, window_name: str, current_frame_store_failures: int) -> int:
 		"""Process a GStreamer sample and store the frame. Returns updated failure count."""
@@ -250,168 +760,168 @@ class SingleReceiver:
 		"""Stop the receiver: disconnect callbacks and set pipeline to NULL."""
 		self._stop_requested = True
 		try:
-			if self.appsink is not None and self._appsink_handler_id is not None:
-				try:
-					self.appsink.disconnect(self._appsink_handler_id)
-				except Exception:
-					pass
-			self._appsink_handler_id = None
-			if self.pipeline is not None:
-				try:
-					self.pipeline.set_state(Gst.State.NULL)
-				except Exception:
-					pass
+			self._teardown_pipeline()
 		except Exception:
 			pass
  
 
 
-class StreamDisplayWidget(QMainWindow):
-	"""Controller that creates one top-level window per stream (simple multi-window mode)."""
-	def __init__(self, receiver, grid_cols: int = 4):
-		super().__init__()
-		self.receiver = receiver
-		self.grid_cols = grid_cols
-		# Map stream_name -> (window, label, event_filter)
-		self.stream_windows: dict[str, tuple[QMainWindow, QLabel, QObject]] = {}
-		self.setWindowTitle("WRecorder - Stream Display")
-		# Keep a small controller window (can be minimized)
-		self.resize(320, 40)
-
-	def _compute_window_size(self) -> tuple[int, int]:
-		"""Compute a sensible default size for per-stream windows based on screen and camera size."""
-		screen = QApplication.primaryScreen()
-		if screen is None:
-			return CAMERA_FRAME_WIDTH, CAMERA_FRAME_HEIGHT
-		avail = screen.availableGeometry()
-		max_w = max(320, min(CAMERA_FRAME_WIDTH, avail.width() // 2))
-		max_h = max(240, min(CAMERA_FRAME_HEIGHT, avail.height() // 2))
-		return int(max_w), int(max_h)
-
-	@pyqtSlot()
-	def update_frames(self):
-		current_names = set(self.stream_windows.keys())
-		new_names_list = self.receiver.get_sorted_stream_names()
-		new_names = set(new_names_list)
-
-		# Create windows for newly discovered streams
-		for name in new_names - current_names:
-			win = QMainWindow()
-			win.setWindowTitle(name)
-			label = QLabel()
-			label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-			w, h = self._compute_window_size()
-			label.setFixedSize(w, h)
-			# Put label in a container with zero margins so the label area matches desired size
-			container = QWidget()
-			layout = QVBoxLayout()
-			layout.setContentsMargins(0, 0, 0, 0)
-			layout.setSpacing(0)
-			layout.addWidget(label)
-			container.setLayout(layout)
-			win.setCentralWidget(container)
-			# Resize window to match content size (label). Avoid arbitrary extra offsets.
-			win.resize(w, h)
-			win.show()
-			# Install an event filter so pressing 'Q' in this window quits the app
-			try:
-				filter_obj = QuitFilter(self.receiver)
-				win.installEventFilter(filter_obj)
-			except Exception:
-				filter_obj = None
-			self.stream_windows[name] = (win, label, filter_obj)
-
-		# Remove windows for disconnected streams
-		for name in list(current_names - new_names):
-			win, label, filt = self.stream_windows.pop(name)
-			try:
-				if filt is not None:
-					try:
-						win.removeEventFilter(filt)
-					except Exception:
-						pass
-				win.close()
-			except Exception:
-				pass
-
-		# Update frames for existing windows in sorted order
-		for name in new_names_list:
-			pair = self.stream_windows.get(name)
-			if not pair:
-				continue
-			win, label = pair[0], pair[1]
-			frame = self.receiver.get_frame(name)
-			if frame is None:
-				# show waiting text
-				label.setText(f"Waiting for {name}...")
-				label.setPixmap(QPixmap())
-				continue
-			# Convert BGR -> RGB and to QImage
-			height, width = frame.shape[:2]
-			rgb_frame = frame[:, :, ::-1]
-			frame_bytes = rgb_frame.tobytes()
-			q_img = QImage(frame_bytes, width, height, 3 * width, QImage.Format.Format_RGB888)
-			pix = QPixmap.fromImage(q_img)
-			# Scale to label size keeping aspect ratio
-			lw = label.width()
-			lh = label.height()
-			pix = pix.scaled(lw, lh, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
-			label.setPixmap(pix)
-	def keyPressEvent(self, event):
-		"""Handle key press events."""
-		if event.key() == Qt.Key.Key_Q:
-			logger.info("Quit key pressed. Stopping receivers...")
-			self.receiver.stop()
-			# Ensure Qt main loop exits
-			try:
-				QCoreApplication.quit()
-			except Exception:
-				self.close()
-		else:
-			super().keyPressEvent(event)
-	
-	def closeEvent(self, event):
-		"""Handle window close event."""
-		logger.info("Window closed. Stopping receivers...")
-		self.receiver.stop()
-		event.accept()
-
-
 class MultiReceiver:
-	def __init__(self, ports: List[int], timeout: float, window_prefix: str):
-		self.ports = ports
+	def __init__(
+		self,
+		ports: List[int],
+		timeout: float,
+		window_prefix: str,
+		persistent: bool = False,
+		recording: RecordingConfig = None,
+		preview_decode: bool = False,
+		frame_store=None,
+		fmp4: bool = False,
+		receive_buffer_bytes: int = DEFAULT_RECEIVE_BUFFER_BYTES,
+	):
+		self.ports = list(ports)
+		self.receive_buffer_bytes = receive_buffer_bytes
 		self.timeout = timeout
 		self.window_prefix = window_prefix
+		self.persistent = persistent
+		self.recording = recording
+		self.preview_decode = preview_decode
+		self.fmp4 = fmp4
+		self.focused_stream: Optional[str] = None
 
 		self.stop_event = threading.Event()
-		self.threads: List[threading.Thread] = []
-		self.frame_store = FrameStore()
-
-		self.sub_receivers: List[SingleReceiver] = []
+		# Decode workers swap in a shared-memory store with the same interface
+		self.frame_store = frame_store if frame_store is not None else FrameStore()
+
+		self.threads: Dict[int, threading.Thread] = {}
+		self.sub_receivers: Dict[int, SingleReceiver] = {}
+		self._started_at: Dict[int, float] = {}
+		self._ports_lock = threading.Lock()
+
+	def _start_port(self, port: int):
+		sub_receiver = SingleReceiver(
+			port,
+			self.timeout,
+			self.stop_event,
+			self.frame_store,
+			self.window_prefix,
+			self.persistent,
+			self.recording,
+			self.fmp4,
+			self.receive_buffer_bytes,
+		)
+		sub_receiver.set_preview(self._wants_preview(sub_receiver.window_name))
+		t = threading.Thread(target=sub_receiver.start)
+		t.start()
+		self.threads[port] = t
+		self.sub_receivers[port] = sub_receiver
+		self._started_at[port] = time.monotonic()
+
+	def _stop_port(self, port: int):
+		sub_receiver = self.sub_receivers.pop(port, None)
+		t = self.threads.pop(port, None)
+		self._started_at.pop(port, None)
+		if sub_receiver is not None:
+			try:
+				sub_receiver.stop()
+			except Exception:
+				pass
+		if t is not None:
+			t.join(timeout=5.0)
 
 	def start(self):
-		for port in self.ports:
-			sub_receiver = SingleReceiver(port, self.timeout, self.stop_event, self.frame_store, self.window_prefix)
-			t = threading.Thread(target=sub_receiver.start)
-			t.start()
-			self.threads.append(t)
-			self.sub_receivers.append(sub_receiver)
+		with self._ports_lock:
+			for port in self.ports:
+				self._start_port(port)
+
+	def stream_name(self, port: int) -> str:
+		return f"{self.window_prefix}-{port}"
+
+	def stream_port(self, stream_name: str) -> int:
+		return self._extract_port_from_stream_name(stream_name)
+
+	def get_port_frame_age(self, port: int) -> Optional[float]:
+		"""Seconds since the last frame on a port (or since its pipeline started if none arrived)."""
+		age = self.frame_store.get_frame_age(self.stream_name(port))
+		if age is not None:
+			return age
+		started_at = self._started_at.get(port)
+		return None if started_at is None else time.monotonic() - started_at
+
+	def restart_ports(self, ports: Iterable[int]):
+		"""Rebuild the pipelines for the given ports, leaving every other stream untouched."""
+		with self._ports_lock:
+			for port in ports:
+				sub_receiver = self.sub_receivers.get(port)
+				if sub_receiver is None:
+					continue
+				sub_receiver.restart_pipeline()
+
+	def is_recording(self, stream_name: str) -> bool:
+		sub_receiver = self.sub_receivers.get(self._extract_port_from_stream_name(stream_name))
+		return sub_receiver is not None and sub_receiver.is_recording()
+
+	def set_recording(self, stream_name: str, enabled: bool) -> bool:
+		sub_receiver = self.sub_receivers.get(self._extract_port_from_stream_name(stream_name))
+		if sub_receiver is None:
+			return False
+		return sub_receiver.set_recording(enabled)
+
+	def toggle_recording(self, stream_name: str) -> bool:
+		return self.set_recording(stream_name, not self.is_recording(stream_name))
+
+	def get_remuxer(self, stream_name: str) -> Optional[Fmp4Remuxer]:
+		sub_receiver = self.sub_receivers.get(self._extract_port_from_stream_name(stream_name))
+		return None if sub_receiver is None else sub_receiver.remuxer
+
+	def _wants_preview(self, stream_name: str) -> bool:
+		# A lone stream is always the one being watched
+		return self.preview_decode and len(self.ports) > 1 and stream_name != self.focused_stream
+
+	def set_focused_stream(self, stream_name: str):
+		"""Decode the focused stream at full rate and, with preview decode on, only keyframes of the rest."""
+		self.focused_stream = stream_name
+		for sub_receiver in list(self.sub_receivers.values()):
+			sub_receiver.set_preview(self._wants_preview(sub_receiver.window_name))
+
+	def reconfigure(self, ports: List[int], window_prefix: str = None):
+		"""Switch to a new port set, only starting/stopping the streams that changed."""
+		with self._ports_lock:
+			if window_prefix is not None and window_prefix != self.window_prefix:
+				for port in list(self.sub_receivers):
+					self._stop_port(port)
+				self.window_prefix = window_prefix
+
+			for port in [p for p in self.sub_receivers if p not in ports]:
+				self._stop_port(port)
+			self.ports = list(ports)
+			for port in ports:
+				if port not in self.sub_receivers:
+					self._start_port(port)
+			for sub_receiver in self.sub_receivers.values():
+				sub_receiver.set_preview(self._wants_preview(sub_receiver.window_name))
 
 	def stop(self):
 		# Signal receivers to stop, call each sub.stop(), and ensure GStreamer pipelines are set to NULL
 		self.stop_event.set()
-		for sub in self.sub_receivers:
+		for sub in list(self.sub_receivers.values()):
 			try:
 				sub.stop()
 			except Exception:
 				pass
 		# Join threads with timeout
-		for t in self.threads:
+		for t in list(self.threads.values()):
 			t.join(timeout=5.0)
 
 	def get_frame(self, stream_name: str):
 		return self.frame_store.get_frame(stream_name)
 
+	def get_frame_sequence(self, stream_name: str) -> int:
+		return self.frame_store.get_frame_sequence(stream_name)
+
+	def get_frame_with_sequence(self, stream_name: str):
+		return self.frame_store.get_frame_with_sequence(stream_name)
+
 	def get_stream_names(self) -> List[str]:
 		return self.frame_store.snapshot_keys()
 	
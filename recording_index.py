@@ -0,0 +1,240 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from common_utils import get_logger, init_gstreamer
+
+logger = get_logger(__name__)
+
+# Bound by the first buffer_probe() call in the recording process; reading an index needs no GStreamer
+Gst = None
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".idx.json"
+SEGMENT_NUMBER_SEPARATOR = "-"
+
+
+def index_path_for_segment(segment_path: str) -> str:
+	return segment_path + INDEX_SUFFIX
+
+
+def session_glob_for_segment(segment_path: str) -> str:
+	"""Glob matching every segment of the recording session `segment_path` belongs to.
+
+	Segments are named `<label>-<YYYYmmdd>-<HHMMSS>-<n>.<ext>`, so dropping the fragment
+	number leaves a prefix shared by the whole session (what splitmuxsrc plays back-to-back).
+	"""
+	directory, name = os.path.split(segment_path)
+	stem, ext = os.path.splitext(name)
+	prefix = stem.rsplit(SEGMENT_NUMBER_SEPARATOR, 1)[0]
+	return os.path.join(glob.escape(directory), f"{glob.escape(prefix)}{SEGMENT_NUMBER_SEPARATOR}*{ext}")
+
+
+class SegmentIndexWriter:
+	"""Collects keyframes seen by a recording branch and writes one index file per closed segment.
+
+	Keyframes are reported with their running time as they enter the muxer; splitmuxsink reports
+	fragment boundaries (also in running time) via `splitmuxsink-fragment-opened/closed` messages,
+	which may arrive after the keyframes that start the fragment, so keyframes stay pending until
+	the fragment that contains them closes.
+	"""
+	def __init__(self, label: str):
+		self.label = label
+		self._lock = threading.Lock()
+		self._pending: List[Tuple[int, float, int]] = []
+		self._es_bytes = 0
+		self._open_fragments: Dict[str, int] = {}
+
+	def on_buffer(self, running_time_ns: Optional[int], is_keyframe: bool, size: int):
+		with self._lock:
+			if is_keyframe and running_time_ns is not None:
+				self._pending.append((running_time_ns, time.time(), self._es_bytes))
+			self._es_bytes += size
+
+	def buffer_probe(self, pad, info):
+		"""Pad probe for the parser feeding the muxer: reports each buffer with its running time."""
+		global Gst
+		if Gst is None:
+			Gst = init_gstreamer()
+		buffer = info.get_buffer()
+		running_time = None
+		segment_event = pad.get_sticky_event(Gst.EventType.SEGMENT, 0)
+		if segment_event is not None and buffer.pts != Gst.CLOCK_TIME_NONE:
+			running_time = segment_event.parse_segment().to_running_time(Gst.Format.TIME, buffer.pts)
+		self.on_buffer(
+			running_time if running_time != Gst.CLOCK_TIME_NONE else None,
+			not buffer.has_flags(Gst.BufferFlags.DELTA_UNIT),
+			buffer.get_size(),
+		)
+		return Gst.PadProbeReturn.OK
+
+	def on_fragment_opened(self, location: str, running_time_ns: int):
+		with self._lock:
+			self._open_fragments[location] = running_time_ns
+
+	def on_fragment_closed(self, location: str, running_time_ns: int):
+		with self._lock:
+			start_ns = self._open_fragments.pop(location, None)
+			if start_ns is None:
+				return
+			keyframes = [entry for entry in self._pending if start_ns <= entry[0] < running_time_ns]
+			self._pending = [entry for entry in self._pending if entry[0] >= running_time_ns]
+
+		if not keyframes:
+			logger.warning(f"[{self.label}] no keyframes indexed for {location}")
+			return
+
+		first_offset = keyframes[0][2]
+		index = {
+			"version": INDEX_VERSION,
+			"stream": self.label,
+			"segment": os.path.basename(location),
+			"start_running_time_ns": start_ns,
+			"duration_ns": running_time_ns - start_ns,
+			"start_wall_time": keyframes[0][1] - (keyframes[0][0] - start_ns) / 1e9,
+			"keyframes": [
+				{
+					"pts_ns": keyframe_ns - start_ns,
+					"wall_time": wall_time,
+					# Offset into the segment's H.264 elementary stream (not the container)
+					"es_offset": es_offset - first_offset,
+				}
+				for keyframe_ns, wall_time, es_offset in keyframes
+			],
+		}
+		index_path = index_path_for_segment(location)
+		try:
+			with open(index_path, "w", encoding="utf-8") as f:
+				json.dump(index, f)
+		except OSError as exc:
+			logger.warning(f"[{self.label}] failed to write index {index_path}: {exc}")
+
+	def on_element_message(self, structure) -> bool:
+		"""Feed a splitmuxsink element message structure. Returns True if it was a fragment boundary."""
+		name = structure.get_name()
+		if name not in ("splitmuxsink-fragment-opened", "splitmuxsink-fragment-closed"):
+			return False
+		location = structure.get_string("location")
+		_found, running_time_ns = structure.get_uint64("running-time")
+		if name == "splitmuxsink-fragment-opened":
+			self.on_fragment_opened(location, running_time_ns)
+		else:
+			self.on_fragment_closed(location, running_time_ns)
+		return True
+
+
+class IndexedSegment:
+	def __init__(self, path: str, payload: dict):
+		self.path = path
+		self.stream = payload["stream"]
+		self.start_wall_time = payload["start_wall_time"]
+		self.duration_ns = payload["duration_ns"]
+		self.keyframes = payload["keyframes"]
+		self.session_glob = session_glob_for_segment(path)
+
+	@property
+	def end_wall_time(self) -> float:
+		return self.start_wall_time + self.duration_ns / 1e9
+
+
+class StreamTimeline:
+	"""All indexed keyframes of one stream, flattened and sorted by wall-clock time."""
+	def __init__(self, stream: str, segments: List[IndexedSegment]):
+		self.stream = stream
+		self.segments = sorted(segments, key=lambda segment: segment.start_wall_time)
+		self._wall_times: List[float] = []
+		self._entries: List[Tuple[int, int]] = []
+		# Playback position of each segment inside its session (splitmuxsrc concatenates a session)
+		self._session_offsets_ns: List[int] = []
+		session_offsets: Dict[str, int] = {}
+		for segment_index, segment in enumerate(self.segments):
+			self._session_offsets_ns.append(session_offsets.get(segment.session_glob, 0))
+			session_offsets[segment.session_glob] = self._session_offsets_ns[-1] + segment.duration_ns
+			for keyframe in segment.keyframes:
+				self._wall_times.append(keyframe["wall_time"])
+				self._entries.append((segment_index, keyframe["pts_ns"]))
+
+	@property
+	def start_wall_time(self) -> Optional[float]:
+		return self._wall_times[0] if self._wall_times else None
+
+	@property
+	def end_wall_time(self) -> Optional[float]:
+		return self.segments[-1].end_wall_time if self.segments else None
+
+	def seek(self, wall_time: float) -> Optional[Tuple[IndexedSegment, int, int, float]]:
+		"""Find the last keyframe at or before `wall_time` in O(log n).
+
+		Returns (segment, pts_ns within segment, position_ns within the segment's session,
+		keyframe wall time), or None if the stream has nothing at or after that time.
+		"""
+		if not self._wall_times:
+			return None
+		position = bisect.bisect_right(self._wall_times, wall_time) - 1
+		if position < 0:
+			position = 0
+		segment_index, pts_ns = self._entries[position]
+		if wall_time > self.segments[segment_index].end_wall_time and position == len(self._entries) - 1:
+			return None
+		segment = self.segments[segment_index]
+		session_position_ns = self._session_offsets_ns[segment_index] + pts_ns
+		return segment, pts_ns, session_position_ns, self._wall_times[position]
+
+
+class RecordingIndex:
+	def __init__(self, timelines: Dict[str, StreamTimeline]):
+		self.timelines = timelines
+
+	@classmethod
+	def load(cls, directory: str) -> "RecordingIndex":
+		by_stream: Dict[str, List[IndexedSegment]] = {}
+		for index_path in glob.glob(os.path.join(glob.escape(directory), f"*{INDEX_SUFFIX}")):
+			segment_path = index_path[: -len(INDEX_SUFFIX)]
+			try:
+				with open(index_path, "r", encoding="utf-8") as f:
+					payload = json.load(f)
+			except (OSError, json.JSONDecodeError) as exc:
+				logger.warning(f"skipping unreadable index {index_path}: {exc}")
+				continue
+			if payload.get("version") != INDEX_VERSION or not os.path.exists(segment_path):
+				continue
+			segment = IndexedSegment(segment_path, payload)
+			by_stream.setdefault(segment.stream, []).append(segment)
+		return cls({stream: StreamTimeline(stream, segments) for stream, segments in by_stream.items()})
+
+	def stream_names(self) -> List[str]:
+		return sorted(self.timelines)
+
+	def earliest_wall_time(self, streams: List[str] = None) -> Optional[float]:
+		starts = [
+			self.timelines[stream].start_wall_time
+			for stream in (streams or self.stream_names())
+			if self.timelines[stream].start_wall_time is not None
+		]
+		return min(starts) if starts else None
+
+	def plan_playback(self, wall_time: float, streams: List[str] = None) -> List["PlaybackSource"]:
+		"""Resolve where each stream must start so all of them show `wall_time` together."""
+		sources = []
+		for stream in streams or self.stream_names():
+			timeline = self.timelines.get(stream)
+			found = timeline.seek(wall_time) if timeline is not None else None
+			if found is None:
+				logger.warning(f"[{stream}] no recording covers {wall_time:.3f}; skipping")
+				continue
+			segment, _pts_ns, position_ns, keyframe_wall_time = found
+			sources.append(PlaybackSource(stream, segment.session_glob, position_ns, keyframe_wall_time))
+		return sources
+
+
+class PlaybackSource:
+	def __init__(self, stream: str, location: str, position_ns: int, wall_time: float):
+		self.stream = stream
+		# splitmuxsrc glob for the session and the keyframe position inside it
+		self.location = location
+		self.position_ns = position_ns
+		self.wall_time = wall_time
@@ -0,0 +1,167 @@
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import List
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst  # noqa: E402
+
+from common_utils import get_logger, install_stop_signal_handlers  # noqa: E402
+from recording_index import PlaybackSource, RecordingIndex  # noqa: E402
+
+logger = get_logger(__name__)
+
+PREROLL_TIMEOUT_SECONDS = 5
+START_LATENCY_SECONDS = 0.2
+
+
+def handle_arguments():
+	parser = argparse.ArgumentParser(
+		prog="recording_player",
+		description="Plays indexed WRecorder segments from several cameras, time-aligned",
+	)
+	parser.add_argument("directory", type=str, help="Directory holding recorded segments and their .idx.json files")
+	parser.add_argument(
+		"--streams",
+		type=str,
+		nargs="+",
+		default=None,
+		help="Stream labels to play (default: every indexed stream)",
+	)
+	parser.add_argument(
+		"--start",
+		type=float,
+		default=None,
+		help="Wall-clock time (Unix seconds) to start from (default: the earliest recording)",
+	)
+	parser.add_argument(
+		"--list",
+		action="store_true",
+		help="List indexed streams and the time range they cover, then exit",
+	)
+	return parser.parse_args()
+
+
+def _format_wall_time(wall_time: float) -> str:
+	return datetime.fromtimestamp(wall_time).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def list_streams(index: RecordingIndex):
+	for stream in index.stream_names():
+		timeline = index.timelines[stream]
+		print(
+			f"{stream}: {len(timeline.segments)} segment(s), "
+			f"{_format_wall_time(timeline.start_wall_time)} -> {_format_wall_time(timeline.end_wall_time)} "
+			f"({timeline.start_wall_time:.3f} -> {timeline.end_wall_time:.3f})"
+		)
+
+
+class AlignedPlayer:
+	"""One decode pipeline per stream, all running on a shared clock.
+
+	Each pipeline is flush-seeked to the keyframe the index resolved for it, so running time 0
+	is that keyframe. Offsetting every pipeline's base time by its keyframe's wall-clock time
+	makes frames captured at the same moment render at the same moment.
+	"""
+	def __init__(self, sources: List[PlaybackSource]):
+		self.sources = sources
+		self.pipelines = []
+
+	def start(self) -> bool:
+		for source in self.sources:
+			description = (
+				f'splitmuxsrc location="{source.location}" ! h264parse ! avdec_h264 ! '
+				f"videoconvert ! autovideosink sync=true"
+			)
+			logger.info(f"[{source.stream}] Pipeline: {description}")
+			try:
+				pipeline = Gst.parse_launch(description)
+			except Exception as e:
+				logger.error(f"[{source.stream}] Failed to create playback pipeline: {e}")
+				self.stop()
+				return False
+			pipeline.set_name(source.stream)
+			self.pipelines.append(pipeline)
+
+		for pipeline, source in zip(self.pipelines, self.sources):
+			pipeline.set_state(Gst.State.PAUSED)
+			if pipeline.get_state(PREROLL_TIMEOUT_SECONDS * Gst.SECOND)[0] == Gst.StateChangeReturn.FAILURE:
+				logger.error(f"[{source.stream}] Failed to preroll {source.location}")
+				self.stop()
+				return False
+			if not pipeline.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT, source.position_ns):
+				logger.warning(f"[{source.stream}] Seek to {source.position_ns / Gst.SECOND:.3f}s failed")
+			pipeline.get_state(PREROLL_TIMEOUT_SECONDS * Gst.SECOND)
+
+		clock = Gst.SystemClock.obtain()
+		earliest = min(source.wall_time for source in self.sources)
+		base_time = clock.get_time() + int(START_LATENCY_SECONDS * Gst.SECOND)
+		for pipeline, source in zip(self.pipelines, self.sources):
+			pipeline.use_clock(clock)
+			pipeline.set_start_time(Gst.CLOCK_TIME_NONE)
+			pipeline.set_base_time(base_time + int((source.wall_time - earliest) * Gst.SECOND))
+		for pipeline in self.pipelines:
+			pipeline.set_state(Gst.State.PLAYING)
+		return True
+
+	def run_until_stopped(self, stop_event: threading.Event):
+		finished = set()
+		while not stop_event.is_set() and len(finished) < len(self.pipelines):
+			for pipeline in self.pipelines:
+				if pipeline.get_name() in finished:
+					continue
+				message = pipeline.get_bus().pop_filtered(Gst.MessageType.ERROR | Gst.MessageType.EOS)
+				if message is None:
+					continue
+				if message.type == Gst.MessageType.ERROR:
+					err, debug = message.parse_error()
+					logger.error(f"[{pipeline.get_name()}] GStreamer error: {err.message}; debug={debug}")
+				else:
+					logger.info(f"[{pipeline.get_name()}] End of recording")
+				finished.add(pipeline.get_name())
+			time.sleep(0.05)
+
+	def stop(self):
+		for pipeline in self.pipelines:
+			pipeline.set_state(Gst.State.NULL)
+		self.pipelines = []
+
+
+if __name__ == "__main__":
+	args = handle_arguments()
+	Gst.init(None)
+
+	index = RecordingIndex.load(args.directory)
+	if not index.timelines:
+		logger.error(f"No indexed recordings found in {args.directory}")
+		exit(1)
+
+	if args.list:
+		list_streams(index)
+		exit(0)
+
+	unknown = sorted(set(args.streams or []) - set(index.stream_names()))
+	if unknown:
+		logger.error(f"Unknown stream(s) {unknown}; indexed streams are {index.stream_names()}")
+		exit(2)
+
+	start = args.start if args.start is not None else index.earliest_wall_time(args.streams)
+	sources = index.plan_playback(start, args.streams)
+	if not sources:
+		logger.error(f"No recording covers {_format_wall_time(start)}")
+		exit(1)
+
+	for source in sources:
+		logger.info(f"[{source.stream}] starting at keyframe {_format_wall_time(source.wall_time)} in {source.location}")
+
+	stop_event = threading.Event()
+	install_stop_signal_handlers(stop_event.set, logger, "Stopping playback...")
+	player = AlignedPlayer(sources)
+	if not player.start():
+		exit(1)
+	try:
+		player.run_until_stopped(stop_event)
+	finally:
+		player.stop()
@@ -1,26 +1,48 @@
 import cv2
+import json
 import numpy as np
 import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+from camera_enumeration import enumerate_cameras
+
 
 # EXPOSURES = [50, 150, 300]
 # EXPOSURES = list(range(50, 625, 50))
 EXPOSURES = [11, 83, 250, 500, 830, 5000]
 WARMUP_FRAMES = 5
-
-
-def camera_is_usable(device):
-	camera = cv2.VideoCapture(str(device))
-	try:
-		return camera.isOpened()
-	finally:
-		camera.release()
+# Keep at most one frame queued in the driver so stale exposures drain quickly
+CAPTURE_BUFFER_FRAMES = 1
+# Frames the sensor still delivers with the old exposure after the control is written
+EXPOSURE_LATENCY_FRAMES = 2
+# After the latency frames, wait (up to the limit) until brightness stops changing
+SETTLE_MAX_EXTRA_FRAMES = 4
+SETTLE_BRIGHTNESS_TOLERANCE = 2.0
+V4L2_MANUAL_EXPOSURE = 1
+# Exposure counts whose partial fusion is also written (the full fusion is always written)
+SAVE_FUSION_STEPS = []
+# Mertens weight exponents (OpenCV's createMergeMertens defaults)
+MERTENS_CONTRAST_WEIGHT = 1.0
+MERTENS_SATURATION_WEIGHT = 1.0
+MERTENS_EXPOSURE_WEIGHT = 0.0
+MERTENS_WELL_EXPOSED_SIGMA = 0.2
+MERTENS_EPSILON = 1e-12
+# Raw brackets go to photos/raw/<session>/<camera>.npy with a <camera>.json sidecar
+RAW_DIR_NAME = "raw"
+# Fused outputs per saved step: 8-bit JPEG, 16-bit PNG and/or float32 TIFF
+HDR_OUTPUT_FORMATS = ["jpg", "png16"]
+HDR_OUTPUT_EXTENSIONS = {"jpg": "jpg", "png16": "png", "tiff32": "tiff"}
+JPEG_QUALITY = 95
+PNG_COMPRESSION = 3
+TIFF_COMPRESSION_DEFLATE = 32946
+OUTPUT_WRITER_THREADS = 2
 
 
 def find_cameras():
-	devices = sorted(Path("/dev").glob("video*"))
-	return [device for device in devices if camera_is_usable(device)]
+	# V4L2 capability queries only: no device is opened for capture just to check it
+	return [Path(camera.path) for camera in enumerate_cameras()]
 
 
 def set_exposure(device, exposure):
@@ -37,54 +59,278 @@ def set_exposure(device, exposure):
 	raise RuntimeError(f"Failed to set exposure {exposure} on {device}: {last_error}")
 
 
-def capture_photo(device):
-	camera = cv2.VideoCapture(str(device))
-	if not camera.isOpened():
-		raise RuntimeError(f"Could not open camera {device}")
-
-	try:
+class BracketCamera:
+	"""Keeps one device open for a whole bracket and switches exposure in-process."""
+	def __init__(self, device):
+		self.device = device
+		self.camera = cv2.VideoCapture(str(device), cv2.CAP_V4L2)
+		if not self.camera.isOpened():
+			raise RuntimeError(f"Could not open camera {device}")
+		self.camera.set(cv2.CAP_PROP_BUFFERSIZE, CAPTURE_BUFFER_FRAMES)
+		self.use_v4l2_ctl = False
 		for _ in range(WARMUP_FRAMES):
-			camera.read()
+			self.camera.grab()
+
+	def set_exposure(self, exposure):
+		if not self.use_v4l2_ctl:
+			manual = self.camera.set(cv2.CAP_PROP_AUTO_EXPOSURE, V4L2_MANUAL_EXPOSURE)
+			if manual and self.camera.set(cv2.CAP_PROP_EXPOSURE, exposure):
+				return
+			# Some drivers reject the OpenCV controls; fall back to v4l2-ctl for the rest of the bracket
+			self.use_v4l2_ctl = True
+		set_exposure(self.device, exposure)
 
-		success, frame = camera.read()
+	def _read(self):
+		success, frame = self.camera.read()
 		if not success:
-			raise RuntimeError(f"Failed to capture frame from {device}")
+			raise RuntimeError(f"Failed to capture frame from {self.device}")
+		return frame
 
+	def capture(self, exposure):
+		"""Capture the first frame taken with `exposure` instead of sleeping through a fixed warmup."""
+		self.set_exposure(exposure)
+		# grab() skips decoding, so draining frames still exposed the old way is cheap
+		for _ in range(CAPTURE_BUFFER_FRAMES + EXPOSURE_LATENCY_FRAMES):
+			self.camera.grab()
+		frame = self._read()
+		brightness = float(np.mean(frame))
+		for _ in range(SETTLE_MAX_EXTRA_FRAMES):
+			next_frame = self._read()
+			next_brightness = float(np.mean(next_frame))
+			settled = abs(next_brightness - brightness) <= SETTLE_BRIGHTNESS_TOLERANCE
+			frame, brightness = next_frame, next_brightness
+			if settled:
+				break
 		return frame.copy()
+
+	def close(self):
+		self.camera.release()
+
+
+class BracketStack:
+	"""One camera's raw bracket in a preallocated memory-mapped .npy, with a JSON sidecar.
+
+	Every frame is written straight into the map and the sidecar is rewritten after it, so
+	RAM use does not grow with the exposure count and a crash leaves all frames captured
+	so far readable with `load_bracket`.
+	"""
+	def __init__(self, directory, label, device, exposures):
+		self.path = Path(directory) / f"{label}.npy"
+		self.metadata_path = Path(directory) / f"{label}.json"
+		self.metadata = {
+			"label": label,
+			"device": str(device),
+			"exposures": list(exposures),
+			"frames": [],
+			"complete": False,
+		}
+		self.frames = None
+
+	def append(self, frame, exposure):
+		if self.frames is None:
+			# The frame size is only known once the camera delivers, so allocate on the first frame
+			shape = (len(self.metadata["exposures"]),) + frame.shape
+			self.frames = np.lib.format.open_memmap(self.path, mode="w+", dtype=frame.dtype, shape=shape)
+		index = len(self.metadata["frames"])
+		self.frames[index] = frame
+		self.frames.flush()
+		self.metadata["frames"].append({
+			"index": index,
+			"exposure": exposure,
+			"captured_at": time.time(),
+			"mean_brightness": float(np.mean(frame)),
+		})
+		self._write_metadata()
+
+	def _write_metadata(self):
+		temp_path = self.metadata_path.with_suffix(".json.tmp")
+		temp_path.write_text(json.dumps(self.metadata, indent=2))
+		temp_path.replace(self.metadata_path)
+
+	def close(self):
+		self.metadata["complete"] = len(self.metadata["frames"]) == len(self.metadata["exposures"])
+		self._write_metadata()
+		self.frames = None
+
+
+def load_bracket(path):
+	"""Memory-map a raw bracket read-only. Returns (frames captured so far, sidecar metadata)."""
+	path = Path(path)
+	metadata = json.loads(path.with_suffix(".json").read_text())
+	frames = np.load(path, mmap_mode="r")
+	return frames[:len(metadata["frames"])], metadata
+
+
+def bracket_camera(device, exposures, raw_dir):
+	"""Capture one frame per exposure on `device` into a raw stack. Returns (stack path, bracket seconds)."""
+	started = time.monotonic()
+	stack = BracketStack(raw_dir, camera_label(device), device, exposures)
+	camera = BracketCamera(device)
+	try:
+		for exposure in exposures:
+			stack.append(camera.capture(exposure), exposure)
+			print(f"Captured photo from {device} with exposure {exposure}")
+		return stack.path, time.monotonic() - started
 	finally:
-		camera.release()
+		camera.close()
+		stack.close()
+
+
+def bracket_cameras(devices, exposures, raw_dir):
+	"""Bracket every camera at once (one thread each; OpenCV releases the GIL while capturing)."""
+	with ThreadPoolExecutor(max_workers=len(devices)) as executor:
+		futures = {device: executor.submit(bracket_camera, device, exposures, raw_dir) for device in devices}
+		return {device: future.result() for device, future in futures.items()}
+
+class IncrementalMertens:
+	"""Mertens exposure fusion that takes one exposure at a time.
+
+	Per pyramid level it keeps the running sums of weight * Laplacian(image) and of weight,
+	so adding an exposure costs one image's pyramids and the fusion of the first k exposures
+	is available at any point. Weights are normalized per level rather than at full
+	resolution, the usual approximation for incremental fusion.
+	"""
+	def __init__(self):
+		self.count = 0
+		self.levels = None
+		self._weighted_sums = None
+		self._weight_sums = None
+
+	@staticmethod
+	def _weights(image):
+		gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+		weights = np.ones(gray.shape, dtype=np.float32)
+		if MERTENS_CONTRAST_WEIGHT:
+			weights *= np.abs(cv2.Laplacian(gray, cv2.CV_32F)) ** MERTENS_CONTRAST_WEIGHT
+		if MERTENS_SATURATION_WEIGHT:
+			weights *= image.std(axis=2) ** MERTENS_SATURATION_WEIGHT
+		if MERTENS_EXPOSURE_WEIGHT:
+			well_exposed = np.exp(-((image - 0.5) ** 2) / (2 * MERTENS_WELL_EXPOSED_SIGMA ** 2)).prod(axis=2)
+			weights *= well_exposed ** MERTENS_EXPOSURE_WEIGHT
+		return weights + MERTENS_EPSILON
+
+	def add(self, frame):
+		image = frame.astype(np.float32) / 255.0
+		if self.levels is None:
+			self.levels = int(np.log2(min(image.shape[:2])))
+			self._weighted_sums = [None] * (self.levels + 1)
+			self._weight_sums = [None] * (self.levels + 1)
+
+		weight_level = self._weights(image)
+		image_level = image
+		for level in range(self.levels + 1):
+			if level < self.levels:
+				next_image = cv2.pyrDown(image_level)
+				size = (image_level.shape[1], image_level.shape[0])
+				laplacian = image_level - cv2.pyrUp(next_image, dstsize=size)
+			else:
+				laplacian = image_level
+			contribution = laplacian * weight_level[..., None]
+			if self._weighted_sums[level] is None:
+				self._weighted_sums[level] = contribution
+				self._weight_sums[level] = weight_level.copy()
+			else:
+				self._weighted_sums[level] += contribution
+				self._weight_sums[level] += weight_level
+			if level < self.levels:
+				image_level = next_image
+				weight_level = cv2.pyrDown(weight_level)
+		self.count += 1
+
+	def result_float(self):
+		"""Fusion of every exposure added so far, as float32 (nominally 0..1, not clipped)."""
+		fused = None
+		for level in range(self.levels, -1, -1):
+			blended = self._weighted_sums[level] / self._weight_sums[level][..., None]
+			if fused is None:
+				fused = blended
+			else:
+				size = (blended.shape[1], blended.shape[0])
+				fused = cv2.pyrUp(fused, dstsize=size) + blended
+		return fused
+
+	def result(self):
+		"""Fusion of every exposure added so far, as an 8-bit image."""
+		return np.clip(self.result_float() * 255, 0, 255).astype('uint8')
+
+
+def camera_label(device):
+	return Path(device).name
+
+
+def write_hdr_output(fused, output_format, path):
+	if output_format == "jpg":
+		image = np.clip(fused * 255, 0, 255).astype(np.uint8)
+		params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+	elif output_format == "png16":
+		image = np.clip(fused * 65535, 0, 65535).astype(np.uint16)
+		params = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+	elif output_format == "tiff32":
+		image = fused.astype(np.float32)
+		params = [cv2.IMWRITE_TIFF_COMPRESSION, TIFF_COMPRESSION_DEFLATE]
+	else:
+		raise ValueError(f"Unknown HDR output format {output_format}")
+	if not cv2.imwrite(str(path), image, params):
+		raise RuntimeError(f"Failed to write {path}")
+	return path
+
+
+def fuse_camera(raw_path, save_steps, photos_dir):
+	"""Fuse one camera's raw bracket incrementally, writing only the requested partial fusions.
+
+	Frames are read from the memory map one at a time and outputs are encoded on a small
+	writer pool, so the next exposure is fused while the previous result is compressed.
+	"""
+	frames, metadata = load_bracket(raw_path)
+	label = metadata["label"]
+	fusion = IncrementalMertens()
+	written = []
+	with ThreadPoolExecutor(max_workers=OUTPUT_WRITER_THREADS) as writer:
+		pending = []
+		for frame in frames:
+			fusion.add(frame)
+			if fusion.count in save_steps or fusion.count == len(frames):
+				fused = fusion.result_float()
+				paths = []
+				for output_format in HDR_OUTPUT_FORMATS:
+					path = photos_dir / f"hdr_{label}_{fusion.count}.{HDR_OUTPUT_EXTENSIONS[output_format]}"
+					pending.append(writer.submit(write_hdr_output, fused, output_format, path))
+					paths.append(path)
+				written.append((fusion.count, float(np.mean(np.clip(fused, 0, 1))) * 255, paths))
+		for future in pending:
+			future.result()
+	return written
 
-def combine_images(images):
-	merge_mertens = cv2.createMergeMertens()
-	hdr_fusion = merge_mertens.process(images)
-	hdr_8bit = np.clip(hdr_fusion * 255, 0, 255).astype('uint8')
-	return hdr_8bit
 
 def main():
 	photos_dir = Path("photos")
 	photos_dir.mkdir(exist_ok=True)
+	raw_dir = photos_dir / RAW_DIR_NAME / time.strftime("%Y%m%d-%H%M%S")
+	raw_dir.mkdir(parents=True)
 
 	cameras = find_cameras()
 	if not cameras:
-		raise RuntimeError("No usable cameras found under /dev/video*")
-
-	resulting_images = []
-	for camera in cameras:
-		for exposure in EXPOSURES:
-			set_exposure(camera, exposure)
-			resulting_images.append(capture_photo(camera))
-			print(f"Captured photo from {camera} with exposure {exposure}")
-	
-	# clear photos dir
-	for file in photos_dir.glob("*.jpg"):
-		file.unlink()
-
-	# Combine images incrementally and save results
-	for i in range(len(resulting_images)):
-		hdr_image = combine_images(resulting_images[:i+1])
-		avg_brightness = np.mean(hdr_image)
-		print(f"Combined {i+1} images, average brightness: {avg_brightness:.2f}")
-		cv2.imwrite(str(photos_dir / f"hdr_image_{i+1}.jpg"), hdr_image)
+		raise RuntimeError("No V4L2 capture devices found under /dev/video*")
+
+	# clear previous fused outputs (raw sessions are kept)
+	for extension in set(HDR_OUTPUT_EXTENSIONS.values()):
+		for file in photos_dir.glob(f"*.{extension}"):
+			file.unlink()
+
+	brackets = bracket_cameras(cameras, EXPOSURES, raw_dir)
+	for camera, (raw_path, duration) in brackets.items():
+		print(f"Bracketed {camera}: {len(EXPOSURES)} exposures in {duration:.2f}s -> {raw_path}")
+
+	# Fuse each camera's exposures on its own, one process per camera; workers map the raw stacks
+	with ProcessPoolExecutor(max_workers=len(brackets)) as executor:
+		futures = {
+			camera: executor.submit(fuse_camera, raw_path, set(SAVE_FUSION_STEPS), photos_dir)
+			for camera, (raw_path, _duration) in brackets.items()
+		}
+		for camera, future in futures.items():
+			for count, avg_brightness, paths in future.result():
+				outputs = ", ".join(str(path) for path in paths)
+				print(f"{camera}: combined {count} images, average brightness: {avg_brightness:.2f} -> {outputs}")
 
 if __name__ == "__main__":
 	main()
\ No newline at end of file
@@ -0,0 +1,867 @@
+import time
+import multiprocessing
+import json
+import os
+import socket
+import threading
+import uuid
+from typing import Dict, List, Optional
+from common_utils import (
+	get_logger,
+	configure_logging,
+	DISCOVERY_MESSAGE_TYPE,
+	DISCOVERY_VERSION,
+	parse_discovery_probe,
+	VALID_PORT_MAX,
+	are_non_negative_ints,
+	has_valid_sequential_port_range,
+	install_stop_signal_handlers,
+	install_reload_signal_handler,
+	DefaultsReloader,
+	MULTICAST_IP,
+	RecordingConfig,
+	parse_ipv4_endpoint,
+)
+
+from bandwidth_budget import BandwidthBudgetScheduler
+from motion_gate import MotionGateConfig
+from operator_focus import FOCUS_REQUEST_MESSAGE_TYPE, FOCUS_RESULT_MESSAGE_TYPE, OperatorFocus
+from streamer_utils import (
+	build_argument_parser,
+	drain_stream_status,
+	LIVE_CONFIG_FIELDS,
+	PIPELINE_EOS_TIMEOUT_SECONDS,
+	MultiStreamer,
+	MosaicStreamer,
+	MosaicConfig,
+)
+from recording_index import RecordingIndex
+from camera_enumeration import enumerate_cameras
+from camera_control import CAMERA_CONTROL_MESSAGE_TYPE, CameraControlService, parse_control_command
+from udp_qos import UdpDropMonitor, configure_control_dscp, mark_control_socket
+from net_interfaces import FALLBACK_IP, IFF_BROADCAST, STREAMER_IP_ENV, InterfaceAddress, InterfaceMonitor, select_interface
+
+logger = get_logger(__name__)
+
+DISCOVERY_MIN_INTERVAL_SECONDS = 0.1
+DISCOVERY_PROBE_MIN_INTERVAL_PER_SOURCE_SECONDS = 0.5
+DISCOVERY_PROBE_MAX_REPLIES_PER_SECOND = 20
+DISCOVERY_PROBE_MAX_TRACKED_SOURCES = 256
+DISCOVERY_BROADCAST_IP = "255.255.255.255"
+# Interfaces that heard no probe or subscription for this long announce less and less often
+DISCOVERY_IDLE_AFTER_SECONDS = 30.0
+DISCOVERY_IDLE_MAX_INTERVAL_SECONDS = 10.0
+WARN_EVERY_N_FAILURES = 25
+
+def _import_ros2():
+	"""Import rclpy on demand: it is slow, and only the ROS command thread needs it."""
+	try:
+		import rclpy
+		from std_msgs.msg import String
+	except ImportError:
+		return None, None
+	return rclpy, String
+
+
+class CameraCommandNode:
+	"""Forwards /camera_commands to the camera control service and publishes each result.
+
+	The callback only queues the request, so `spin_once` is never blocked by device I/O.
+	"""
+	def __init__(self, rclpy, string_type, control_service: CameraControlService):
+		self.string_type = string_type
+		self.control_service = control_service
+		self.node = rclpy.create_node('camera_transmitter')
+
+		self.subscription = self.node.create_subscription(string_type, '/camera_commands', self.cmd_callback, 10)
+		self.result_publisher = self.node.create_publisher(string_type, '/camera_command_results', 10)
+	
+	def cmd_callback(self, msg):
+		request = parse_control_command(msg.data)
+		if request is None:
+			self.node.get_logger().info(f"Ignoring unrecognized camera command: {msg.data}")
+			return
+		self.control_service.submit(request, self.publish_result)
+
+	def publish_result(self, result: dict):
+		self.node.get_logger().info(f"Camera control {result['request_id']} done in {result['elapsed_ms']}ms")
+		self.result_publisher.publish(self.string_type(data=json.dumps(result)))
+	
+def ros2_command_thread(control_service: CameraControlService, stop_event):
+	rclpy, string_type = _import_ros2()
+	if rclpy is None:
+		logger.warning(f"ROS2 (rclpy) could not be imported. Camera commands are only available as UDP {CAMERA_CONTROL_MESSAGE_TYPE} messages.")
+		return
+	command_node = None
+	try:
+		rclpy.init(args=None)
+		command_node = CameraCommandNode(rclpy, string_type, control_service)
+		while not stop_event.is_set():
+			rclpy.spin_once(command_node.node, timeout_sec=0.5)
+	except Exception as e:
+		logger.error(f"ROS2 node exception: {e}")
+	finally:
+		if rclpy.ok():
+			try:
+				if command_node is not None:
+					command_node.node.destroy_node()
+				rclpy.shutdown()
+			except Exception:
+				pass
+
+
+class ProbeRateLimiter:
+	"""Bounds discovery probe replies per source and in total so probe floods stay cheap."""
+
+	def __init__(
+		self,
+		min_interval_per_source: float = DISCOVERY_PROBE_MIN_INTERVAL_PER_SOURCE_SECONDS,
+		max_replies_per_second: int = DISCOVERY_PROBE_MAX_REPLIES_PER_SECOND,
+	):
+		self.min_interval_per_source = min_interval_per_source
+		self.max_replies_per_second = max_replies_per_second
+		self._last_reply_by_source: dict = {}
+		self._window_start = 0.0
+		self._window_count = 0
+		self.dropped = 0
+
+	def allow(self, source_ip: str, now: float = None) -> bool:
+		now = time.monotonic() if now is None else now
+
+		last_reply = self._last_reply_by_source.get(source_ip)
+		if last_reply is not None and now - last_reply < self.min_interval_per_source:
+			self.dropped += 1
+			return False
+
+		if now - self._window_start >= 1.0:
+			self._window_start = now
+			self._window_count = 0
+		if self._window_count >= self.max_replies_per_second:
+			self.dropped += 1
+			return False
+
+		if len(self._last_reply_by_source) >= DISCOVERY_PROBE_MAX_TRACKED_SOURCES:
+			self._last_reply_by_source = {
+				ip: at
+				for ip, at in self._last_reply_by_source.items()
+				if now - at < self.min_interval_per_source
+			}
+		self._last_reply_by_source[source_ip] = now
+		self._window_count += 1
+		return True
+
+
+class DiscoveryAnnouncer:
+	"""Owns the discovery payload: broadcasts it periodically and answers probes with it.
+
+	Announcements go to the directed broadcast address of every selected interface from a
+	socket bound to that interface's address, and each one advertises that address as
+	`streamer_ip`, so a receiver always learns an address it can reach. Interface changes
+	are announced immediately. Interfaces without receivers back off to a slower interval
+	(receivers probe on start, so they are still answered at once); configured unicast
+	targets are always announced to at the normal interval.
+	"""
+
+	def __init__(
+		self,
+		streamer_name: str,
+		interface_names: List[str],
+		multicast_ip: str,
+		base_port: int,
+		camera_ids: List[int],
+		discovery_port: int,
+		discovery_interval: float,
+		stream_count: int = None,
+		mosaic: bool = False,
+		unicast_targets: List[str] = None,
+	):
+		if not are_non_negative_ints(camera_ids, require_non_empty=True):
+			raise ValueError("camera_ids must be a non-empty list of non-negative integers")
+
+		self.streamer_name = streamer_name
+		# Pins the advertised address on every interface, e.g. behind NAT
+		self.streamer_ip_override = os.environ.get(STREAMER_IP_ENV) or None
+		self.interfaces = InterfaceMonitor(interface_names, on_change=self._interfaces_changed)
+		self._interface_sockets_stale = True
+		self.multicast_ip = multicast_ip
+		self.discovery_port = discovery_port
+		self.interval = max(DISCOVERY_MIN_INTERVAL_SECONDS, discovery_interval)
+		self.unicast_targets = [parse_ipv4_endpoint(target) for target in unicast_targets or []]
+		# interface name -> monotonic time a receiver on its subnet was last heard from
+		self._receiver_seen: Dict[str, float] = {}
+		self._interface_intervals: Dict[str, float] = {}
+		self._sockets_opened_at = time.monotonic()
+		self.payload = {
+			"type": DISCOVERY_MESSAGE_TYPE,
+			"version": DISCOVERY_VERSION,
+			"streamer_name": streamer_name,
+			"base_port": base_port,
+			"stream_count": len(camera_ids) if stream_count is None else stream_count,
+			"camera_ids": camera_ids,
+			"mosaic": mosaic,
+			# Changes on every streamer launch so receivers can tell a restart from a heartbeat
+			"session_id": uuid.uuid4().hex,
+		}
+		self.probe_limiter = ProbeRateLimiter()
+		self._announce_now = threading.Event()
+
+	def update(
+		self,
+		streamer_name: str = None,
+		discovery_port: int = None,
+		discovery_interval: float = None,
+		interface_names: List[str] = None,
+		unicast_targets: List[str] = None,
+	):
+		"""Change announced settings while running; the new payload goes out immediately."""
+		if interface_names is not None:
+			self.interfaces.set_names(interface_names)
+		if unicast_targets is not None:
+			self.unicast_targets = [parse_ipv4_endpoint(target) for target in unicast_targets]
+		if streamer_name is not None:
+			self.streamer_name = streamer_name
+			self.payload["streamer_name"] = streamer_name
+		if discovery_port is not None:
+			self.discovery_port = discovery_port
+		if discovery_interval is not None:
+			self.interval = max(DISCOVERY_MIN_INTERVAL_SECONDS, discovery_interval)
+		self._announce_now.set()
+
+	def _interfaces_changed(self, _addresses: List[InterfaceAddress]):
+		self._interface_sockets_stale = True
+		self._announce_now.set()
+
+	def note_receiver(self, receiver_ip: str):
+		"""A probe or subscription arrived: keep announcing at the normal interval on that subnet."""
+		for interface in self.interfaces.addresses:
+			if interface.contains(receiver_ip):
+				self._receiver_seen[interface.name] = time.monotonic()
+				self._interface_intervals.pop(interface.name, None)
+
+	def _next_interval(self, interface: InterfaceAddress, now: float) -> float:
+		if interface is None:
+			return self.interval
+		# Every interface starts at the normal interval after (re)opening, so receivers hear it on the first one
+		last_seen = max(self._receiver_seen.get(interface.name, 0.0), self._sockets_opened_at)
+		if now - last_seen < DISCOVERY_IDLE_AFTER_SECONDS:
+			return self.interval
+		# Double the interval on every idle announcement, up to the cap
+		previous = self._interface_intervals.get(interface.name, self.interval)
+		interval = min(previous * 2, max(self.interval, DISCOVERY_IDLE_MAX_INTERVAL_SECONDS))
+		self._interface_intervals[interface.name] = interval
+		return interval
+
+	def streamer_ip(self, interface: InterfaceAddress = None) -> str:
+		if self.streamer_ip_override:
+			return self.streamer_ip_override
+		return interface.ip if interface is not None else FALLBACK_IP
+
+	def build_packet(self, interface: InterfaceAddress = None) -> bytes:
+		payload = dict(self.payload, streamer_ip=self.streamer_ip(interface), announced_at=time.time())
+		return json.dumps(payload).encode("utf8")
+
+	def matches_probe(self, probe: dict) -> bool:
+		name_filter = probe.get("streamer_name_filter")
+		return not name_filter or name_filter == self.streamer_name
+
+	def answer_probe(self, reply_socket: socket.socket, probe: dict, addr) -> bool:
+		"""Unicast the current announcement back to a probing receiver, subject to rate limits."""
+		if not self.matches_probe(probe):
+			return False
+		self.note_receiver(addr[0])
+		if not self.probe_limiter.allow(addr[0]):
+			return False
+		try:
+			# Advertise the address on the probing receiver's subnet
+			reply_socket.sendto(self.build_packet(select_interface(self.interfaces.addresses, addr[0])), addr)
+		except OSError as exc:
+			logger.error(f"[discovery] probe reply to {addr[0]}:{addr[1]} failed: {exc}")
+			return False
+		logger.debug(f"[discovery] answered probe from {addr[0]}:{addr[1]}")
+		return True
+
+	def _open_interface_sockets(self) -> List[tuple]:
+		"""One broadcast socket per interface, bound to its address; an unbound one if no interface is up."""
+		addresses = self.interfaces.addresses
+		if not addresses:
+			logger.warning(f"[discovery] no usable network interface yet, announcing {self.streamer_ip()} from the default route")
+			addresses = [None]
+		sockets = []
+		for interface in addresses:
+			announce_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			announce_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+			mark_control_socket(announce_socket)
+			if interface is not None:
+				try:
+					announce_socket.bind((interface.ip, 0))
+				except OSError as exc:
+					logger.error(f"[discovery] cannot bind to {interface.describe()}: {exc}")
+					announce_socket.close()
+					continue
+				try:
+					# Keeps the packets on this interface even if another one routes the same subnet
+					announce_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface.name.encode("utf-8"))
+				except (AttributeError, OSError) as exc:
+					logger.debug(f"[discovery] SO_BINDTODEVICE {interface.name} unavailable ({exc}); relying on the source address")
+			sockets.append((interface, announce_socket))
+		if sockets:
+			logger.info(
+				f"[discovery] announcing on {', '.join(interface.describe() if interface else 'default route' for interface, _ in sockets)}"
+			)
+		return sockets
+
+	@staticmethod
+	def _broadcast_address(interface: InterfaceAddress = None) -> str:
+		"""The interface's directed broadcast address (None on point-to-point links)."""
+		if interface is None:
+			return DISCOVERY_BROADCAST_IP
+		if interface.broadcast:
+			return interface.broadcast
+		if interface.flags & IFF_BROADCAST:
+			return str(interface.network.broadcast_address)
+		return None
+
+	def _send(self, announce_socket: socket.socket, interface: InterfaceAddress, target: tuple):
+		try:
+			announce_socket.sendto(self.build_packet(interface), target)
+		except OSError as exc:
+			logger.error(
+				f"[discovery] announce failed: {exc} "
+				f"(target={target[0]}:{target[1]}, streamer_ip={self.streamer_ip(interface)})"
+			)
+
+	def run(self, stop_event: multiprocessing.Event):
+		"""Broadcast stream configuration over UDP for receiver auto-configuration."""
+		monitor_thread = threading.Thread(target=self.interfaces.run, args=(stop_event,), daemon=True)
+		monitor_thread.start()
+		sockets = []
+		unicast_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+		mark_control_socket(unicast_socket)
+
+		print(json.dumps(self.payload, indent=2))
+
+		logger.info(
+			f"[discovery] Announcing '{self.streamer_name}' on UDP {self.discovery_port} "
+			f"(base_port={self.payload['base_port']}, streams={self.payload['stream_count']}, mosaic={self.payload['mosaic']})"
+		)
+		logger.info(
+			f"[discovery] payload: camera_ids={self.payload['camera_ids']}, "
+			f"interval={self.interval:.2f}s, version={DISCOVERY_VERSION}, mosaic={self.payload['mosaic']}"
+		)
+
+		try:
+			# interface name (None for the unbound socket) -> monotonic time of its next broadcast
+			next_broadcast_at = {}
+			next_unicast_at = 0.0
+			while not stop_event.is_set():
+				now = time.monotonic()
+				announce_now = self._announce_now.is_set()
+				self._announce_now.clear()
+				if self._interface_sockets_stale:
+					self._interface_sockets_stale = False
+					for _interface, announce_socket in sockets:
+						announce_socket.close()
+					sockets = self._open_interface_sockets()
+					self._sockets_opened_at = now
+					self._interface_intervals.clear()
+					next_broadcast_at = {}
+
+				for interface, announce_socket in sockets:
+					key = interface.name if interface is not None else None
+					if not announce_now and now < next_broadcast_at.get(key, 0.0):
+						continue
+					broadcast_address = self._broadcast_address(interface)
+					if broadcast_address is not None:
+						self._send(announce_socket, interface, (broadcast_address, self.discovery_port))
+					next_broadcast_at[key] = now + self._next_interval(interface, now)
+
+				if self.unicast_targets and (announce_now or now >= next_unicast_at):
+					# Unicast follows the routing table, so it needs no per-interface socket
+					addresses = self.interfaces.addresses
+					for target_ip, target_port in self.unicast_targets:
+						interface = select_interface(addresses, target_ip)
+						self._send(unicast_socket, interface, (target_ip, target_port or self.discovery_port))
+					next_unicast_at = now + self.interval
+				# Short waits so a reloaded config is announced without waiting out the interval
+				stop_event.wait(min(self.interval, DISCOVERY_MIN_INTERVAL_SECONDS))
+		finally:
+			for _interface, announce_socket in sockets:
+				announce_socket.close()
+			unicast_socket.close()
+			monitor_thread.join(timeout=1)
+			if self.probe_limiter.dropped:
+				logger.info(f"[discovery] rate-limited {self.probe_limiter.dropped} probe replies")
+
+
+def run_udp_control_server(
+	control_port: int,
+	control_queues: dict,
+	announcer: DiscoveryAnnouncer = None,
+	control_service: CameraControlService = None,
+	budget: BandwidthBudgetScheduler = None,
+	focus: OperatorFocus = None,
+):
+	"""Listens for UDP control messages (subscription requests, discovery probes, camera controls, focus) and routes them."""
+	server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	# Probe answers and control results are sent from this socket
+	mark_control_socket(server_socket)
+	try:
+		server_socket.bind(("0.0.0.0", control_port))
+		server_socket.settimeout(1.0)
+		logger.info(f"UDP Control Server listening on port {control_port}")
+		while True:
+			try:
+				data, addr = server_socket.recvfrom(2048)
+				try:
+					payload = json.loads(data.decode("utf-8"))
+					if payload.get("type") == "SUBSCRIBE_REQUEST":
+						receiver_ip = payload.get("receiver_ip")
+						ports = payload.get("ports", [])
+						if announcer is not None:
+							announcer.note_receiver(addr[0])
+						for port in ports:
+							if port in control_queues:
+								control_queues[port].put({"type": "add_client", "ip": receiver_ip, "port": port})
+								if budget is not None:
+									budget.note_subscriber(port, receiver_ip)
+					elif payload.get("type") == CAMERA_CONTROL_MESSAGE_TYPE and control_service is not None:
+						# The result is sent back to the requester once every camera has been handled
+						control_service.submit(
+							payload,
+							lambda result, addr=addr: _send_control_result(server_socket, result, addr),
+						)
+					elif payload.get("type") == FOCUS_REQUEST_MESSAGE_TYPE:
+						port = payload.get("port")
+						if focus is None:
+							result = {"ok": False, "port": port, "error": "focus needs one stream per camera (not mosaic or replay)"}
+						else:
+							result = focus.request(port, addr[0])
+						result.update(type=FOCUS_RESULT_MESSAGE_TYPE, request_id=payload.get("request_id"))
+						_send_control_result(server_socket, result, addr)
+					elif announcer is not None:
+						probe = parse_discovery_probe(payload)
+						if probe is not None:
+							announcer.answer_probe(server_socket, probe, addr)
+				except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+					pass
+			except socket.timeout:
+				continue
+	except Exception as e:
+		logger.error(f"UDP Control Server error: {e}")
+	finally:
+		server_socket.close()
+
+
+class StreamerReconfigurer:
+	"""Applies a reloaded argument diff to the running streamer, touching only what changed.
+
+	Discovery settings, bitrate, the bandwidth and recording budgets and never-give-up apply live; frame
+	rate, simulated loss, recording and motion-gate settings rebuild the stream pipelines (subscribers
+	are kept); anything that changes which streams or ports exist needs a streamer restart.
+	"""
+
+	DISCOVERY_ARGUMENTS = {"streamer_name", "discovery_port", "discovery_interval", "interfaces", "discovery_targets"}
+	# argument -> StreamerConfig/MosaicConfig field
+	STREAM_ARGUMENTS = {
+		"bitrate": "bitrate",
+		"target_fps": "target_fps",
+		"simulate_loss": "simulate_loss",
+		"record_max_bytes": "recording_max_bytes",
+		"send_buffer_bytes": "send_buffer_bytes",
+		"video_dscp": "video_dscp",
+		"encoder_profile": "encoder_profile",
+	}
+	RECORDING_ARGUMENTS = {"record", "record_dir", "record_segment_seconds", "record_format"}
+	MOTION_GATE_ARGUMENTS = {"motion_gate", "motion_threshold", "motion_keepalive_fps"}
+	BUDGET_ARGUMENTS = {"total_bitrate", "min_stream_bitrate", "stream_priorities"}
+
+	def __init__(
+		self,
+		args,
+		announcer: DiscoveryAnnouncer = None,
+		streamer: MultiStreamer = None,
+		mosaic_streamer: MosaicStreamer = None,
+		mosaic_queue: multiprocessing.Queue = None,
+		replaying: bool = False,
+		budget: BandwidthBudgetScheduler = None,
+	):
+		self.args = args
+		self.announcer = announcer
+		self.streamer = streamer
+		self.mosaic_streamer = mosaic_streamer
+		self.mosaic_queue = mosaic_queue
+		self.replaying = replaying
+		self.budget = budget
+
+	def apply(self, changes: dict):
+		applied_live = []
+		needs_rebuild = []
+		needs_streamer_restart = []
+		fields = {}
+		for name, (_old, new) in changes.items():
+			setattr(self.args, name, new)
+		for name, (_old, new) in changes.items():
+			if name in self.DISCOVERY_ARGUMENTS:
+				applied_live.append(name)
+			elif (name in self.BUDGET_ARGUMENTS or name == "bitrate") and self.budget is not None:
+				# The scheduler owns stream bitrates; --bitrate is its per-stream maximum
+				applied_live.append(name)
+			elif name == "never_give_up" and self.streamer is not None:
+				self.streamer.never_give_up = new.lower() == "on"
+				applied_live.append(name)
+			elif name in self.STREAM_ARGUMENTS and not self.replaying:
+				fields[self.STREAM_ARGUMENTS[name]] = new
+				(applied_live if self.STREAM_ARGUMENTS[name] in LIVE_CONFIG_FIELDS else needs_rebuild).append(name)
+			elif name in self.RECORDING_ARGUMENTS and not self.replaying:
+				fields["recording"] = RecordingConfig(
+					self.args.record_dir,
+					self.args.record_segment_seconds,
+					self.args.record_format,
+					enabled=self.args.record.lower() == "on",
+				)
+				needs_rebuild.append(name)
+			elif name in self.MOTION_GATE_ARGUMENTS and not self.replaying:
+				fields["motion_gate"] = motion_gate_config(self.args)
+				needs_rebuild.append(name)
+			else:
+				needs_streamer_restart.append(name)
+
+		if self.announcer is not None and self.DISCOVERY_ARGUMENTS & changes.keys():
+			self.announcer.update(
+				streamer_name=changes.get("streamer_name", (None, None))[1],
+				discovery_port=changes.get("discovery_port", (None, None))[1],
+				discovery_interval=changes.get("discovery_interval", (None, None))[1],
+				# An empty list selects every interface again
+				interface_names=changes["interfaces"][1] or [] if "interfaces" in changes else None,
+				unicast_targets=changes["discovery_targets"][1] or [] if "discovery_targets" in changes else None,
+			)
+
+		if self.budget is not None and (self.BUDGET_ARGUMENTS | {"bitrate"}) & changes.keys():
+			mosaic_cameras = len(self.mosaic_streamer.config.camera_ids) if self.mosaic_streamer is not None else 1
+			self.budget.update(
+				total_bitrate=self.args.total_bitrate,
+				min_stream_bitrate=self.args.min_stream_bitrate,
+				max_stream_bitrate=self.args.bitrate * mosaic_cameras,
+				priorities=self.args.stream_priorities,
+			)
+
+		ports = []
+		if fields:
+			ports = self._update_streams(fields)
+
+		if applied_live:
+			logger.info(f"[reload] applied live: {', '.join(sorted(applied_live))}")
+		if needs_rebuild:
+			logger.info(
+				f"[reload] rebuilding stream(s) {', '.join(str(port) for port in ports) or 'none'} "
+				f"for: {', '.join(sorted(needs_rebuild))}"
+			)
+		if needs_streamer_restart:
+			logger.warning(
+				f"[reload] not applied, restart the streamer for: {', '.join(sorted(needs_streamer_restart))}"
+			)
+
+	def _update_streams(self, fields: dict) -> List[int]:
+		if self.streamer is not None:
+			return self.streamer.update_config(fields)
+		if self.mosaic_streamer is None:
+			return []
+		config = self.mosaic_streamer.config
+		fields = dict(fields)
+		if "bitrate" in fields:
+			# The mosaic carries every camera, so it gets their combined bitrate
+			fields["bitrate"] = fields["bitrate"] * len(config.camera_ids)
+		for name, value in fields.items():
+			setattr(config, name, value)
+		if self.mosaic_queue is not None:
+			self.mosaic_queue.put({"type": "update_config", "fields": fields})
+		return [config.output_port]
+
+
+def motion_gate_config(args) -> Optional[MotionGateConfig]:
+	if args.motion_gate.lower() != "on":
+		return None
+	return MotionGateConfig(args.motion_threshold, args.motion_keepalive_fps)
+
+
+def _send_control_result(reply_socket: socket.socket, result: dict, addr):
+	try:
+		reply_socket.sendto(json.dumps(result).encode("utf8"), addr)
+	except OSError as exc:
+		logger.error(f"[control] result reply to {addr[0]}:{addr[1]} failed: {exc}")
+
+
+def find_available_cameras() -> List[int]:
+	available_cameras = []
+	for camera in enumerate_cameras():
+		if camera.index is None:
+			continue
+		logger.info(f"Found camera {camera.describe()}")
+		available_cameras.append(camera.index)
+	return available_cameras
+
+
+def main():
+	try:
+		multiprocessing.set_start_method("spawn")
+	except RuntimeError:
+		pass
+	parser = build_argument_parser()
+	args = parser.parse_args()
+	configure_logging(args.log_level, args.log_backend, args.log_rate_limit)
+	configure_control_dscp(args.control_dscp)
+
+	base_port = args.base_port
+	camera_ids = args.camera_ids
+	bitrate = args.bitrate
+	target_fps = args.target_fps
+	simulate_cameras = args.simulate_cameras
+	simulate_loss = args.simulate_loss
+	mosaic_enabled = args.mosaic.lower() == "on"
+	streamer_name = args.streamer_name
+	announce_discovery = args.announce_discovery.lower() == "on"
+	discovery_port = args.discovery_port
+	discovery_interval = args.discovery_interval
+	never_give_up = args.never_give_up.lower() == "on"
+	recording = RecordingConfig(
+		args.record_dir,
+		args.record_segment_seconds,
+		args.record_format,
+		enabled=args.record.lower() == "on",
+	)
+
+	replay_sources = None
+	if args.replay is not None:
+		replay_index = RecordingIndex.load(args.replay)
+		replay_start = args.replay_start if args.replay_start is not None else replay_index.earliest_wall_time()
+		replay_sources = replay_index.plan_playback(replay_start) if replay_start is not None else []
+		if not replay_sources:
+			logger.error(f"No indexed recordings to replay in {args.replay}. Exiting.")
+			exit(1)
+		if mosaic_enabled:
+			logger.warning("Mosaic is not available for replays; streaming each recording separately")
+			mosaic_enabled = False
+		recording.enabled = False
+		camera_ids = list(range(len(replay_sources)))
+		for camera_id, source in enumerate(replay_sources):
+			logger.info(f"Replay stream {camera_id}: {source.stream} from {source.wall_time:.3f}")
+	elif simulate_cameras is not None:
+		camera_ids = list(range(simulate_cameras))
+	elif args.auto_find_cameras.lower() == "on":
+		camera_ids = find_available_cameras()
+
+	if not are_non_negative_ints(camera_ids):
+		logger.error("camera-ids must only contain non-negative integers")
+		exit(2)
+
+	if not camera_ids:
+		logger.error("No available cameras found. Exiting.")
+		exit(1)
+
+	output_stream_count = 1 if mosaic_enabled else len(camera_ids)
+	max_port = base_port + output_stream_count - 1
+	if not has_valid_sequential_port_range(base_port, output_stream_count):
+		logger.error(
+			f"Invalid port range: base-port={base_port} with {output_stream_count} streams "
+			f"would exceed {VALID_PORT_MAX} (max={max_port})."
+		)
+		exit(2)
+		
+	announcer = None
+	if announce_discovery:
+		announcer = DiscoveryAnnouncer(
+			streamer_name,
+			args.interfaces,
+			MULTICAST_IP,
+			base_port,
+			camera_ids,
+			discovery_port,
+			discovery_interval,
+			len(camera_ids),
+			mosaic_enabled,
+			args.discovery_targets,
+		)
+
+	control_queues = {port: multiprocessing.Queue() for port in range(base_port, max_port + 1)}
+	control_service = CameraControlService(
+		camera_ids,
+		simulation=simulate_cameras is not None or replay_sources is not None,
+	)
+
+	streamer_stop_event = None
+	stream_processes = []
+	if mosaic_enabled:
+		mosaic_camera_count = len(camera_ids)
+		mosaic_bitrate = bitrate * mosaic_camera_count
+		streamer_stop_event = multiprocessing.Event()
+		status_queue = multiprocessing.Queue()
+		mosaic_health = {base_port: "starting"}
+		mosaic_metrics: dict = {base_port: {}}
+		mosaic_streamer = MosaicStreamer(
+			MosaicConfig(
+				output_port=base_port,
+				camera_ids=camera_ids,
+				bitrate=mosaic_bitrate,
+				target_fps=target_fps,
+				multicast_ip=MULTICAST_IP,
+				simulation=simulate_cameras is not None,
+				simulate_loss=simulate_loss,
+				control_queue=control_queues[base_port],
+				recording=recording,
+				recording_max_bytes=args.record_max_bytes,
+				send_buffer_bytes=args.send_buffer_bytes,
+				video_dscp=args.video_dscp,
+				encoder_profile=args.encoder_profile,
+				motion_gate=motion_gate_config(args),
+			),
+		)
+		stream_process = multiprocessing.Process(
+			target=mosaic_streamer.start,
+			args=(streamer_stop_event, status_queue),
+			daemon=True,
+		)
+		stream_process.start()
+		stream_processes.append(stream_process)
+		logger.info(
+			f"Attempting to start mosaic stream for cameras {camera_ids} on port {base_port} "
+			f"with bitrate={mosaic_bitrate}"
+		)
+	else:
+		streamer = MultiStreamer(
+			base_port,
+			camera_ids,
+			bitrate,
+			target_fps,
+			MULTICAST_IP,
+			simulation=simulate_cameras is not None,
+			simulate_loss=simulate_loss,
+			never_give_up=never_give_up,
+			control_queues=control_queues,
+			recording=recording,
+			recording_max_bytes=args.record_max_bytes,
+			replay_sources=replay_sources,
+			send_buffer_bytes=args.send_buffer_bytes,
+			video_dscp=args.video_dscp,
+			encoder_profile=args.encoder_profile,
+			motion_gate=motion_gate_config(args),
+		)
+		streamer_stop_event = streamer.stop_event
+
+	budget = None
+	if replay_sources is None:
+		if mosaic_enabled:
+			def _push_mosaic_bitrate(port: int, stream_bitrate: int):
+				mosaic_streamer.config.bitrate = stream_bitrate
+				control_queues[port].put({"type": "update_config", "fields": {"bitrate": stream_bitrate}})
+
+			budget = BandwidthBudgetScheduler(
+				{base_port: None},
+				_push_mosaic_bitrate,
+				args.total_bitrate,
+				args.min_stream_bitrate,
+				mosaic_bitrate,
+				stream_health=mosaic_health,
+				stream_metrics=mosaic_metrics,
+			)
+		else:
+			budget = BandwidthBudgetScheduler(
+				{sub_streamer.config.port: sub_streamer.config.camera_id for sub_streamer in streamer.streamers},
+				lambda port, stream_bitrate: streamer.update_stream_config(port, {"bitrate": stream_bitrate}),
+				args.total_bitrate,
+				args.min_stream_bitrate,
+				bitrate,
+				args.stream_priorities,
+				streamer.stream_health,
+				streamer.stream_metrics,
+			)
+		threading.Thread(target=budget.run, args=(streamer_stop_event,), daemon=True).start()
+
+	focus = None
+	if not mosaic_enabled and replay_sources is None:
+		focus = OperatorFocus(streamer, budget)
+		threading.Thread(target=focus.run, args=(streamer_stop_event,), daemon=True).start()
+
+	control_server = threading.Thread(
+		target=run_udp_control_server,
+		args=(args.control_port, control_queues, announcer, control_service, budget, focus),
+		daemon=True
+	)
+	control_server.start()
+
+	if not mosaic_enabled:
+		streamer.start()
+		stream_processes = streamer.processes
+
+	discovery_thread = None
+	if announcer is not None:
+		discovery_thread = threading.Thread(
+			target=announcer.run,
+			args=(streamer_stop_event,),
+			daemon=True,
+		)
+		discovery_thread.start()
+
+	# Send buffer overflows show up as SndbufErrors
+	drop_monitor = UdpDropMonitor("streamer")
+	threading.Thread(target=drop_monitor.run, args=(streamer_stop_event,), daemon=True).start()
+
+	ros2_thread = threading.Thread(
+		target=ros2_command_thread,
+		args=(control_service, streamer_stop_event),
+		daemon=True,
+	)
+	ros2_thread.start()
+
+	reconfigurer = StreamerReconfigurer(
+		args,
+		announcer,
+		streamer=None if mosaic_enabled else streamer,
+		mosaic_streamer=mosaic_streamer if mosaic_enabled else None,
+		mosaic_queue=control_queues[base_port] if mosaic_enabled else None,
+		replaying=replay_sources is not None,
+		budget=budget,
+	)
+	defaults_reloader = DefaultsReloader(parser, "streamer-only", args, reconfigurer.apply)
+	reload_thread = threading.Thread(
+		target=defaults_reloader.run,
+		args=(streamer_stop_event,),
+		daemon=True,
+	)
+	reload_thread.start()
+
+	install_stop_signal_handlers(streamer_stop_event.set, logger, "Stopping streams...")
+	install_reload_signal_handler(defaults_reloader.request_reload, logger)
+
+	try:
+		if mosaic_enabled:
+			while not streamer_stop_event.is_set():
+				# Status and recorder/motion-gate metrics, as MultiStreamer.supervise() folds them in
+				drain_stream_status(status_queue, mosaic_health, mosaic_metrics)
+				for p in stream_processes:
+					if not p.is_alive():
+						logger.error(f"Mosaic streamer process {p.pid} exited unexpectedly (code={p.exitcode})")
+						streamer_stop_event.set()
+						break
+				time.sleep(0.1)
+		else:
+			streamer.supervise()
+	except KeyboardInterrupt:
+		logger.info("Keyboard interrupt received. Stopping streams...")
+		streamer_stop_event.set()
+	finally:
+		streamer_stop_event.set()
+		for p in stream_processes:
+			# Pipelines that record need up to PIPELINE_EOS_TIMEOUT_SECONDS to close their last segment
+			p.join(timeout=PIPELINE_EOS_TIMEOUT_SECONDS + 1.0)
+			if p.is_alive():
+				logger.warning(f"Streamer process {p.pid} did not exit cleanly, terminating...")
+				p.terminate()
+				p.join()
+
+	if discovery_thread is not None:
+		discovery_thread.join(timeout=1)
+
+	ros2_thread.join(timeout=1)
+	control_service.shutdown()
+
+	logger.info("All streams stopped")
@@ -1,37 +1,63 @@
-import ipaddress
+import glob
+import shutil
+import threading
 import time
 import os
-import gi
 import argparse
 import subprocess
 import multiprocessing
 import queue as queue_module
 from typing import List
 
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst  # noqa: E402
-from common_utils import (  # noqa: E402
+from common_utils import (
 	int_in_range,
 	float_in_range,
+	ipv4_endpoint,
+	camera_weight,
 	apply_required_external_defaults,
+	add_logging_arguments,
 	VALID_PORT_MIN,
 	VALID_PORT_MAX,
 	get_logger,
+	build_splitmux_description,
+	recording_location_pattern,
+	RecordingConfig,
 	CAMERA_FRAME_WIDTH,
 	CAMERA_FRAME_HEIGHT,
+	RECORDING_MUXERS,
+	init_gstreamer,
 )
+from recording_index import SegmentIndexWriter, index_path_for_segment
+from motion_gate import MOTION_GATE_ELEMENT, MOTION_GATE_MIN_KEEPALIVE_FPS, MotionGate, MotionGateConfig
+from udp_qos import DSCP_AF41, DSCP_CS6, DSCP_MAX, socket_buffer_bytes, warn_if_buffer_capped
 
 logger = get_logger(__name__)
 
-# Initialize GStreamer
-Gst.init(None)
+# Bound by _require_gstreamer() in the stream process, so the parent never loads or initializes GStreamer
+Gst = None
 
 CAMERA_RESTART_BASE_SECONDS = 0.5
 CAMERA_RESTART_MAX_SECONDS = 10
 STARTUP_STAGGER_SECONDS = 1
+# Config fields a running pipeline takes without being rebuilt (see apply_config)
+LIVE_CONFIG_FIELDS = {"bitrate", "recording_max_bytes", "output_width", "output_height", "frame_rate_divisor"}
 MOSAIC_TILE_WIDTH = 320
 MOSAIC_TILE_HEIGHT = 320
 LOW_LATENCY_QUEUE = "queue leaky=downstream max-size-buffers=5 max-size-bytes=0 max-size-time=0"
+# Absorbs slow storage; when full it drops instead of back-pressuring the live branch
+RECORDING_WRITER_QUEUE = "queue name=recqueue leaky=downstream max-size-buffers=0 max-size-bytes=0 max-size-time=3000000000"
+RECORDING_WRITER_NICE = 10
+RECORDING_MIN_FREE_BYTES = 256 * 1024 * 1024
+RECORDING_METRICS_INTERVAL_SECONDS = 10.0
+# How long a stopping pipeline waits for its EOS, so the recorder can close the last segment (mp4 needs its moov)
+PIPELINE_EOS_TIMEOUT_SECONDS = 3
+ENCODER_PROFILES = ["idr", "intra-refresh"]
+# Intra refresh: the VBV holds this many frame intervals, so no frame grows far beyond bitrate/fps
+INTRA_REFRESH_VBV_FRAMES = 2
+# Intra refresh: multiudpsink paces output at this multiple of the target bitrate
+SEND_PACING_HEADROOM = 1.5
+# Intra refresh: an IDR frame this often, so receivers, recorders and gateway viewers that join late can start
+INTRA_REFRESH_KEYFRAME_SECONDS = 2.0
 
 VIDEOTEST_PATTERNS = [
 	"smpte",
@@ -63,34 +89,11 @@ VIDEOTEST_PATTERNS = [
 ]
 
 
-def resolve_local_ip(only_eth0: bool = False) -> str:
-	env_ip = os.environ.get("WRECORDER_STREAMER_IP")
-	if env_ip:
-		return env_ip
+def _require_gstreamer():
+	global Gst
+	if Gst is None:
+		Gst = init_gstreamer()
 
-	if only_eth0:
-		try:
-			result = subprocess.run(["ip", "-4", "addr", "show", "eth0"], capture_output=True, text=True)
-			if result.stdout:
-				for line in result.stdout.splitlines():
-					if "inet " in line:
-						ip_str = line.strip().split()[1].split('/')[0]
-						return ip_str
-		except Exception as e:
-			logger.error(f"Error parsing eth0 IP address: {e}")
-	else:
-		result = subprocess.run(["hostname", "-I"], capture_output=True, text=True)
-		if result.stdout:
-			try:
-				# Return the first non-loopback IP address
-				for ip_str in result.stdout.strip().split():
-					ip = ipaddress.ip_address(ip_str)
-					if not ip.is_loopback:
-						return ip_str
-			except Exception as e:
-				logger.error(f"Error parsing local IP addresses: {e}")
-
-	return "127.0.0.1"
 
 def _is_gstreamer_element_available(element_name: str) -> bool:
 	try:
@@ -184,6 +187,308 @@ def _mosaic_grid_for_camera_count(camera_count: int) -> tuple[int, int]:
 	return columns, rows
 
 
+class PipelineRecorder:
+	"""Segmented recording that shares a streamer pipeline's live encode.
+
+	The encoded H.264 is teed after h264parse into a leaky, low-priority writer queue feeding
+	splitmuxsink, so a slow SD card drops recorded data instead of stalling the live stream.
+	Closed segments are kept as a ring bounded by `max_bytes` and free disk space.
+	"""
+	def __init__(self, config: RecordingConfig, label: str, max_bytes: int = None, request_keyframes: bool = False):
+		self.config = config
+		self.label = label
+		self.max_bytes = max_bytes
+		# Without periodic IDR frames, splitmuxsink has to ask the encoder for one at each split
+		self.request_keyframes = request_keyframes
+		self.location = None
+		self.dropped_buffers = 0
+		self.damaged_segments = 0
+		self.closed_segments = 0
+		self.rotated_segments = 0
+		self._drops_in_segment = 0
+		self._writer_queue = None
+		self._last_report_at = time.monotonic()
+		self._lock = threading.Lock()
+		self.index_writer = SegmentIndexWriter(label)
+
+	def live_tee(self) -> str:
+		return "video/x-h264,stream-format=byte-stream,alignment=au ! tee name=rectee"
+
+	def branch_description(self) -> str:
+		os.makedirs(self.config.directory, exist_ok=True)
+		self.location = recording_location_pattern(self.config, self.label)
+		splitmux = build_splitmux_description(self.config, self.location, request_keyframes=self.request_keyframes)
+		return f"rectee. ! {RECORDING_WRITER_QUEUE} ! h264parse name=recparse ! {splitmux}"
+
+	def attach(self, pipeline):
+		self._writer_queue = pipeline.get_by_name("recqueue")
+		if self._writer_queue is not None:
+			self._writer_queue.connect("overrun", self._on_writer_overrun)
+		parser = pipeline.get_by_name("recparse")
+		if parser is not None:
+			parser.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self.index_writer.buffer_probe)
+		bus = pipeline.get_bus()
+		bus.enable_sync_message_emission()
+		bus.connect("sync-message::stream-status", self._on_stream_status)
+		logger.info(f"[{self.label}] Recording to {self.location}")
+
+	def _on_writer_overrun(self, _queue):
+		with self._lock:
+			self.dropped_buffers += 1
+			self._drops_in_segment += 1
+
+	def _on_stream_status(self, _bus, message):
+		# Runs in the thread being created, so the writer threads can lower their own priority
+		status_type, owner = message.parse_stream_status()
+		if status_type != Gst.StreamStatusType.ENTER or not _is_recording_element(owner):
+			return
+		try:
+			os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), RECORDING_WRITER_NICE)
+		except (AttributeError, OSError):
+			pass
+
+	def on_element_message(self, message) -> bool:
+		structure = message.get_structure()
+		if structure is None or not self.index_writer.on_element_message(structure):
+			return False
+		if structure.get_name() != "splitmuxsink-fragment-closed":
+			return True
+		with self._lock:
+			self.closed_segments += 1
+			if self._drops_in_segment:
+				self.damaged_segments += 1
+			self._drops_in_segment = 0
+		self._enforce_budget()
+		return True
+
+	def _enforce_budget(self):
+		pattern = os.path.join(self.config.directory, f"{glob.escape(self.label)}-*.{self.config.container}")
+		segments = sorted(glob.glob(pattern), key=os.path.getmtime)
+		total = sum(os.path.getsize(path) for path in segments)
+		# Never delete the segment currently being written
+		while len(segments) > 1 and (
+			(self.max_bytes is not None and total > self.max_bytes)
+			or shutil.disk_usage(self.config.directory).free < RECORDING_MIN_FREE_BYTES
+		):
+			oldest = segments.pop(0)
+			try:
+				size = os.path.getsize(oldest)
+				os.remove(oldest)
+				if os.path.exists(index_path_for_segment(oldest)):
+					os.remove(index_path_for_segment(oldest))
+			except OSError as exc:
+				logger.warning(f"[{self.label}] failed to rotate out {oldest}: {exc}")
+				break
+			total -= size
+			self.rotated_segments += 1
+
+	def metrics(self) -> dict:
+		writer_queue = self._writer_queue
+		backlog_ns = writer_queue.get_property("current-level-time") if writer_queue is not None else 0
+		backlog_bytes = writer_queue.get_property("current-level-bytes") if writer_queue is not None else 0
+		with self._lock:
+			return {
+				"recording_backlog_ms": backlog_ns // 1_000_000,
+				"recording_backlog_bytes": backlog_bytes,
+				"recording_dropped_buffers": self.dropped_buffers,
+				"recording_damaged_segments": self.damaged_segments,
+				"recording_closed_segments": self.closed_segments,
+				"recording_rotated_segments": self.rotated_segments,
+			}
+
+	def maybe_report(self, status_queue: multiprocessing.Queue, port: int):
+		now = time.monotonic()
+		if now - self._last_report_at < RECORDING_METRICS_INTERVAL_SECONDS:
+			return
+		self._last_report_at = now
+		metrics = self.metrics()
+		log = logger.warning if metrics["recording_dropped_buffers"] else logger.debug
+		log(f"[{self.label}] recording metrics: {metrics}")
+		if status_queue is not None:
+			_publish_stream_metrics(status_queue, port, metrics)
+
+
+def _maybe_report_motion_gate(motion_gate: MotionGate, status_queue: multiprocessing.Queue, port: int):
+	if not motion_gate.report_due():
+		return
+	metrics = motion_gate.metrics()
+	logger.info(
+		f"[{motion_gate.label}] motion gate skipped {metrics['motion_skipped_percent']}% of "
+		f"{metrics['motion_frames_seen']} frames (threshold {metrics['motion_threshold']}, "
+		f"keep-alive {metrics['motion_keepalive_fps']} fps, mean difference {metrics['motion_mean_difference']})"
+	)
+	if status_queue is not None:
+		_publish_stream_metrics(status_queue, port, metrics)
+
+
+def _is_recording_element(element) -> bool:
+	while element is not None:
+		if isinstance(element, Gst.Element) and element.get_name() in ("recqueue", "recsink"):
+			return True
+		element = element.get_parent()
+	return False
+
+
+def _stop_pipeline(pipeline, label: str, finalize: bool):
+	"""Set `pipeline` to NULL; with `finalize`, first let an EOS run through it so recordings are closed."""
+	if finalize:
+		pipeline.send_event(Gst.Event.new_eos())
+		message = pipeline.get_bus().timed_pop_filtered(
+			PIPELINE_EOS_TIMEOUT_SECONDS * Gst.SECOND,
+			Gst.MessageType.EOS | Gst.MessageType.ERROR,
+		)
+		if message is None or message.type != Gst.MessageType.EOS:
+			logger.warning(f"[{label}] pipeline did not finish within {PIPELINE_EOS_TIMEOUT_SECONDS}s; the last recording segment may be incomplete")
+	pipeline.set_state(Gst.State.NULL)
+
+
+def build_encoder_chain(label: str, bitrate: int, target_fps: int, profile: str = "idr") -> str:
+	"""`x264enc ! h264parse` for one stream.
+
+	`idr` sends an IDR frame every half second. `intra-refresh` replaces it with a rolling
+	column of intra blocks over the same period and a VBV of INTRA_REFRESH_VBV_FRAMES frame
+	intervals (x264enc's cbr pass caps the rate at `bitrate`), so frame sizes stay close to
+	the average instead of bursting.
+	"""
+	if profile not in ENCODER_PROFILES:
+		raise ValueError(f"unknown encoder profile: {profile}")
+	kbps = max(1, bitrate // 1000)
+	properties = (
+		f"name=encoder tune=zerolatency bitrate={kbps} speed-preset=ultrafast "
+		f"key-int-max={max(1, int(target_fps // 2))} bframes=0"
+	)
+	if profile == "intra-refresh":
+		vbv_ms = max(1, int(INTRA_REFRESH_VBV_FRAMES * 1000 / max(1, target_fps)))
+		properties += f" intra-refresh=true vbv-buf-capacity={vbv_ms}"
+	logger.info(f"[{label}] Using software encoder x264enc ({profile})")
+	return f"x264enc {properties} ! h264parse"
+
+
+def send_pacing_bitrate(bitrate: int, profile: str) -> int:
+	"""multiudpsink max-bitrate for a profile; 0 leaves sending unpaced."""
+	return int(bitrate * SEND_PACING_HEADROOM) if profile == "intra-refresh" else 0
+
+
+class PeriodicKeyframes:
+	"""Asks the encoder for an IDR frame every INTRA_REFRESH_KEYFRAME_SECONDS.
+
+	The intra-refresh profile sends none of its own, but decoders, splitmuxsink and fMP4
+	viewers that join mid-stream all start at a keyframe. Polled from the pipeline's run loop.
+	"""
+	def __init__(self, label: str):
+		self.label = label
+		self._pad = None
+		self._last_request_at = time.monotonic()
+		self.requests = 0
+
+	def attach(self, pipeline):
+		encoder = pipeline.get_by_name("encoder")
+		self._pad = encoder.get_static_pad("src") if encoder is not None else None
+		self._last_request_at = time.monotonic()
+
+	def maybe_request(self):
+		now = time.monotonic()
+		if self._pad is None or now - self._last_request_at < INTRA_REFRESH_KEYFRAME_SECONDS:
+			return
+		self._last_request_at = now
+		self._pad.send_event(
+			Gst.Event.new_custom(
+				Gst.EventType.CUSTOM_UPSTREAM,
+				Gst.Structure.new_from_string("GstForceKeyUnit, all-headers=(boolean)true"),
+			)
+		)
+		self.requests += 1
+
+
+def _apply_live_bitrate(pipeline, label: str, bitrate: int, profile: str):
+	# x264enc accepts a new bitrate while PLAYING; the send pacing follows it
+	encoder = pipeline.get_by_name("encoder") if pipeline else None
+	if encoder is None:
+		return
+	encoder.set_property("bitrate", max(1, bitrate // 1000))
+	sink = pipeline.get_by_name("msink")
+	if sink is not None:
+		sink.set_property("max-bitrate", send_pacing_bitrate(bitrate, profile))
+	logger.info(f"[{label}] bitrate changed to {bitrate} bps in place")
+
+
+def _udp_sink(
+	label: str,
+	bitrate: int,
+	target_fps: int,
+	send_buffer_bytes: int = None,
+	dscp: int = None,
+	sync: bool = False,
+	max_bitrate: int = 0,
+) -> str:
+	"""multiudpsink with a send buffer sized for keyframe bursts, the video DSCP marking and optional pacing."""
+	if send_buffer_bytes is None:
+		send_buffer_bytes = socket_buffer_bytes(bitrate, target_fps)
+	warn_if_buffer_capped(send_buffer_bytes, True, label)
+	return (
+		f"multiudpsink name=msink sync={'true' if sync else 'false'} async=false buffer-size={send_buffer_bytes}"
+		+ ("" if dscp is None else f" qos-dscp={dscp}")
+		+ ("" if not max_bitrate else f" max-bitrate={max_bitrate}")
+	)
+
+
+def _output_caps(width: int, height: int) -> str:
+	return f"video/x-raw,width={width},height={height},format=I420"
+
+
+def _apply_live_resolution(pipeline, label: str, width: int, height: int):
+	# The new caps renegotiate videoscale and restart x264enc, which starts again with an IDR frame
+	capsfilter = pipeline.get_by_name("outcaps") if pipeline else None
+	if capsfilter is None:
+		return
+	capsfilter.set_property("caps", Gst.Caps.from_string(_output_caps(width, height)))
+	logger.info(f"[{label}] output resolution changed to {width}x{height} in place")
+
+
+class FrameRateLimiter:
+	"""Sends only every `divisor`-th frame interval to the encoder, adjustable while PLAYING.
+
+	The probe sits on the encoder's sink pad and is only installed while frames are being
+	dropped, so a stream at its full frame rate pays nothing for it.
+	"""
+	def __init__(self, label: str, target_fps: int, divisor: int = 1):
+		self.label = label
+		self.target_fps = target_fps
+		self.divisor = divisor
+		self._pad = None
+		self._probe_id = None
+		self._last_sent_at = None
+
+	def attach(self, pipeline):
+		encoder = pipeline.get_by_name("encoder")
+		self._pad = encoder.get_static_pad("sink") if encoder is not None else None
+		self.set_divisor(self.divisor)
+
+	def set_divisor(self, divisor: int):
+		divisor = max(1, divisor)
+		changed = divisor != self.divisor
+		self.divisor = divisor
+		if self._pad is None:
+			return
+		if self.divisor > 1 and self._probe_id is None:
+			self._last_sent_at = None
+			self._probe_id = self._pad.add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+		elif self.divisor == 1 and self._probe_id is not None:
+			self._pad.remove_probe(self._probe_id)
+			self._probe_id = None
+		if changed or self.divisor > 1:
+			logger.info(f"[{self.label}] sending {self.target_fps / self.divisor:g} of {self.target_fps} fps")
+
+	def _on_buffer(self, _pad, info):
+		now = time.monotonic()
+		# Half a frame of slack keeps capture jitter from dropping two frames in a row
+		interval = (self.divisor - 0.5) / max(1, self.target_fps)
+		if self._last_sent_at is not None and now - self._last_sent_at < interval:
+			return Gst.PadProbeReturn.DROP
+		self._last_sent_at = now
+		return Gst.PadProbeReturn.OK
+
+
 def _build_encoder_pipeline(
 	source_element: str,
 	port: int,
@@ -193,26 +498,48 @@ def _build_encoder_pipeline(
 	simulate_loss: float = 0.0,
 	output_width: int = CAMERA_FRAME_WIDTH,
 	output_height: int = CAMERA_FRAME_HEIGHT,
+	recorder: PipelineRecorder = None,
+	send_buffer_bytes: int = None,
+	video_dscp: int = None,
+	encoder_profile: str = "idr",
+	motion_gate: MotionGate = None,
 ) -> str:
 	video_chain = [
 		source_element,
 		"videoconvert",
 		"videoscale",
-		f"video/x-raw,width={output_width},height={output_height},format=I420",
+		# Named so the output size can be changed while PLAYING (see _apply_live_resolution)
+		f'capsfilter name=outcaps caps="{_output_caps(output_width, output_height)}"',
 	]
-	logger.info(f"[stream-{port}] Using software encoder x264enc")
-	kbps = max(1, bitrate // 1000)
-	encoder_chain = (
-		f'x264enc tune=zerolatency bitrate={kbps} speed-preset=ultrafast key-int-max={max(1, int(target_fps // 2))} bframes=0 ! '
-		"h264parse"
+	encoder_chain = build_encoder_chain(f"stream-{port}", bitrate, target_fps, encoder_profile)
+	sink = _udp_sink(
+		f"stream-{port}",
+		bitrate,
+		target_fps,
+		send_buffer_bytes,
+		video_dscp,
+		max_bitrate=send_pacing_bitrate(bitrate, encoder_profile),
 	)
 
 	return (
 		" ! ".join(video_chain)
 		+ f" ! {LOW_LATENCY_QUEUE} ! "
+		+ ("" if motion_gate is None else f"{MOTION_GATE_ELEMENT} ! ")
 		+ encoder_chain
+		+ ("" if recorder is None else f" ! {recorder.live_tee()}")
 		+ ("" if simulate_loss <= 0.0 else f" ! identity drop-probability={simulate_loss / 100.0} ")
-		+ f" ! rtph264pay config-interval=1 pt=96 ! multiudpsink name=msink sync=false async=false"
+		+ f" ! rtph264pay config-interval=1 pt=96 ! {sink}"
+		+ ("" if recorder is None else f" {recorder.branch_description()}")
+	)
+
+
+def _build_replay_pipeline(location: str, port: int, config: "StreamerConfig") -> str:
+	# Recorded H.264 goes out unchanged; a syncing sink paces it at the original frame rate
+	logger.info(f"[stream-{port}] Replaying {location}")
+	sink = _udp_sink(f"stream-{port}", config.bitrate, config.target_fps, config.send_buffer_bytes, config.video_dscp, sync=True)
+	return (
+		f'splitmuxsrc location="{location}" ! h264parse ! video/x-h264,stream-format=byte-stream,alignment=au ! '
+		f"rtph264pay config-interval=1 pt=96 ! {sink}"
 	)
 
 
@@ -229,6 +556,15 @@ class StreamerConfig:
 		output_width: int = CAMERA_FRAME_WIDTH,
 		output_height: int = CAMERA_FRAME_HEIGHT,
 		control_queue: multiprocessing.Queue = None,
+		recording: RecordingConfig = None,
+		recording_max_bytes: int = None,
+		replay_location: str = None,
+		replay_start_ns: int = 0,
+		send_buffer_bytes: int = None,
+		video_dscp: int = None,
+		encoder_profile: str = "idr",
+		motion_gate: MotionGateConfig = None,
+		frame_rate_divisor: int = 1,
 	):
 		self.port = port
 		self.camera_id = camera_id
@@ -240,6 +576,19 @@ class StreamerConfig:
 		self.output_width = output_width
 		self.output_height = output_height
 		self.control_queue = control_queue
+		self.recording = recording
+		self.recording_max_bytes = recording_max_bytes
+		# When set, the stream rebroadcasts a recorded session instead of capturing a camera
+		self.replay_location = replay_location
+		self.replay_start_ns = replay_start_ns
+		# None sizes the send buffer from bitrate and frame rate
+		self.send_buffer_bytes = send_buffer_bytes
+		self.video_dscp = video_dscp
+		self.encoder_profile = encoder_profile
+		# None sends every frame; otherwise static frames are skipped before the encoder
+		self.motion_gate = motion_gate
+		# Operator focus sends the other streams at target_fps / frame_rate_divisor
+		self.frame_rate_divisor = frame_rate_divisor
 
 
 class MosaicConfig:
@@ -253,6 +602,12 @@ class MosaicConfig:
 		simulation: bool = False,
 		simulate_loss: float = 0.0,
 		control_queue: multiprocessing.Queue = None,
+		recording: RecordingConfig = None,
+		recording_max_bytes: int = None,
+		send_buffer_bytes: int = None,
+		video_dscp: int = None,
+		encoder_profile: str = "idr",
+		motion_gate: MotionGateConfig = None,
 	):
 		self.output_port = output_port
 		self.camera_ids = camera_ids
@@ -262,13 +617,41 @@ class MosaicConfig:
 		self.simulation = simulation
 		self.simulate_loss = simulate_loss
 		self.control_queue = control_queue
+		self.recording = recording
+		self.recording_max_bytes = recording_max_bytes
+		self.send_buffer_bytes = send_buffer_bytes
+		self.video_dscp = video_dscp
+		self.encoder_profile = encoder_profile
+		self.motion_gate = motion_gate
 
 
 class MosaicPipeline:
-	def __init__(self, config: MosaicConfig):
+	def __init__(self, config: MosaicConfig, clients: set = None):
 		self.config = config
 		self.pipeline = None
 		self.bus = None
+		# Shared with the owning streamer so subscribers survive pipeline restarts
+		self.clients = clients if clients is not None else set()
+		# Set when a config reload needs the pipeline rebuilt; the owner restarts it right away
+		self.restart_requested = False
+		self.recorder = (
+			PipelineRecorder(
+				config.recording,
+				f"mosaic-{config.output_port}",
+				config.recording_max_bytes,
+				request_keyframes=config.encoder_profile == "intra-refresh",
+			)
+			if config.recording is not None and config.recording.enabled
+			else None
+		)
+		self.motion_gate = (
+			MotionGate(f"mosaic-{config.output_port}", config.motion_gate, config.target_fps)
+			if config.motion_gate is not None
+			else None
+		)
+		self.keyframes = (
+			PeriodicKeyframes(f"mosaic-{config.output_port}") if config.encoder_profile == "intra-refresh" else None
+		)
 
 	def _build_pipeline(self) -> str:
 		columns, rows = _mosaic_grid_for_camera_count(len(self.config.camera_ids))
@@ -307,21 +690,33 @@ class MosaicPipeline:
 
 		compositor = "compositor " + " ".join(compositor_props)
 		mosaic_source = " ".join(branch_parts)
-		logger.info(f"[mosaic-{self.config.output_port}] Using software encoder x264enc")
-		kbps = max(1, self.config.bitrate // 1000)
-		encoder_chain = (
-			f'x264enc tune=zerolatency bitrate={kbps} speed-preset=ultrafast key-int-max={max(1, int(self.config.target_fps // 2))} bframes=0 ! '
-			"h264parse"
+		encoder_chain = build_encoder_chain(
+			f"mosaic-{self.config.output_port}",
+			self.config.bitrate,
+			self.config.target_fps,
+			self.config.encoder_profile,
 		)
 
 		return (
 			f"{mosaic_source} {compositor} ! videoconvert ! video/x-raw,format=I420,width={output_width},height={output_height} ! {LOW_LATENCY_QUEUE} ! "
+			+ ("" if self.motion_gate is None else f"{MOTION_GATE_ELEMENT} ! ")
 			+ encoder_chain
+			+ ("" if self.recorder is None else f" ! {self.recorder.live_tee()}")
 			+ ("" if self.config.simulate_loss <= 0.0 else f" ! identity drop-probability={self.config.simulate_loss / 100.0} ")
-			+ f" ! rtph264pay config-interval=1 pt=96 ! multiudpsink name=msink sync=false async=false"
+			+ " ! rtph264pay config-interval=1 pt=96 ! "
+			+ _udp_sink(
+				f"mosaic-{self.config.output_port}",
+				self.config.bitrate,
+				self.config.target_fps,
+				self.config.send_buffer_bytes,
+				self.config.video_dscp,
+				max_bitrate=send_pacing_bitrate(self.config.bitrate, self.config.encoder_profile),
+			)
+			+ ("" if self.recorder is None else f" {self.recorder.branch_description()}")
 		)
 
 	def start(self) -> bool:
+		_require_gstreamer()
 		pipeline_str = self._build_pipeline()
 		logger.info(
 			f"[mosaic-{self.config.output_port}] Initializing GStreamer pipeline for unicast clients"
@@ -335,6 +730,13 @@ class MosaicPipeline:
 			if ret == Gst.StateChangeReturn.FAILURE:
 				raise RuntimeError("failed to set pipeline to PLAYING state")
 			logger.info(f"[mosaic-{self.config.output_port}] GStreamer pipeline initialized")
+			self._restore_clients()
+			if self.recorder is not None:
+				self.recorder.attach(self.pipeline)
+			if self.motion_gate is not None:
+				self.motion_gate.attach(self.pipeline)
+			if self.keyframes is not None:
+				self.keyframes.attach(self.pipeline)
 			return True
 		except Exception as e:
 			logger.error(f"[mosaic-{self.config.output_port}] Failed to create GStreamer pipeline: {e}")
@@ -342,31 +744,61 @@ class MosaicPipeline:
 			return False
 
 	def add_client(self, ip: str, port: int):
+		# Receivers resubscribe periodically; only new clients reach multiudpsink
+		if (ip, port) in self.clients:
+			return
 		if self.pipeline:
 			msink = self.pipeline.get_by_name("msink")
 			if msink:
 				msink.emit("add", ip, port)
+				self.clients.add((ip, port))
 				logger.info(f"[mosaic-{self.config.output_port}] Added unicast client {ip}:{port}")
 
-	def run_until_stopped(self, stop_event: multiprocessing.Event) -> bool:
+	def _restore_clients(self):
+		msink = self.pipeline.get_by_name("msink") if self.pipeline else None
+		if msink is None:
+			return
+		for ip, port in sorted(self.clients):
+			msink.emit("add", ip, port)
+		if self.clients:
+			logger.info(f"[mosaic-{self.config.output_port}] Restored {len(self.clients)} unicast client(s) after restart")
+
+	def run_until_stopped(self, stop_event: multiprocessing.Event, status_queue: multiprocessing.Queue = None) -> bool:
 		import queue as queue_module
 		try:
 			while not stop_event.is_set():
-				if self.config.control_queue:
+				# Drain everything queued, so changes sent together (e.g. a focus switch) land together
+				while self.config.control_queue:
 					try:
 						msg = self.config.control_queue.get_nowait()
-						if msg.get("type") == "add_client":
-							self.add_client(msg["ip"], msg["port"])
 					except queue_module.Empty:
-						pass
+						break
+					if msg.get("type") == "add_client":
+						self.add_client(msg["ip"], msg["port"])
+					elif msg.get("type") == "update_config" and self.apply_config(msg["fields"]):
+						logger.info(f"[mosaic-{self.config.output_port}] restarting pipeline for {', '.join(sorted(msg['fields']))}")
+						self.restart_requested = True
+						break
+				if self.restart_requested:
+					break
+
+				if self.recorder is not None:
+					self.recorder.maybe_report(status_queue, self.config.output_port)
+				if self.motion_gate is not None:
+					_maybe_report_motion_gate(self.motion_gate, status_queue, self.config.output_port)
+				if self.keyframes is not None:
+					self.keyframes.maybe_request()
 
 				if self.bus is not None:
 					message = self.bus.timed_pop_filtered(
 						100 * Gst.MSECOND,
-						Gst.MessageType.ERROR | Gst.MessageType.EOS,
+						Gst.MessageType.ERROR | Gst.MessageType.EOS | Gst.MessageType.ELEMENT,
 					)
 					if message is not None:
-						if message.type == Gst.MessageType.ERROR:
+						if message.type == Gst.MessageType.ELEMENT:
+							if self.recorder is not None:
+								self.recorder.on_element_message(message)
+						elif message.type == Gst.MessageType.ERROR:
 							err, debug = message.parse_error()
 							logger.error(f"[mosaic-{self.config.output_port}] GStreamer error: {err.message}; debug={debug}")
 							logger.info(f"[mosaic-{self.config.output_port}] GStreamer EOS received")
@@ -377,10 +809,24 @@ class MosaicPipeline:
 		finally:
 			self.stop()
 
+	def apply_config(self, fields: dict) -> bool:
+		"""Apply reloaded config fields. Returns True if the pipeline must be rebuilt for them."""
+		needs_restart = False
+		for name, value in fields.items():
+			setattr(self.config, name, value)
+			if name not in LIVE_CONFIG_FIELDS:
+				needs_restart = True
+			elif name == "bitrate":
+				_apply_live_bitrate(self.pipeline, f"mosaic-{self.config.output_port}", value, self.config.encoder_profile)
+			elif name == "recording_max_bytes" and self.recorder is not None:
+				self.recorder.max_bytes = value
+		return needs_restart
+
 	def stop(self):
 		if self.pipeline is not None:
 			try:
-				self.pipeline.set_state(Gst.State.NULL)
+				# Only a recording has anything to finalize; other pipelines go straight to NULL
+				_stop_pipeline(self.pipeline, f"mosaic-{self.config.output_port}", self.recorder is not None)
 			except Exception as e:
 				logger.error(f"[mosaic-{self.config.output_port}] error stopping pipeline: {e}")
 			finally:
@@ -394,8 +840,9 @@ class MosaicStreamer:
 
 	def start(self, stop_event: multiprocessing.Event, status_queue: multiprocessing.Queue):
 		restart_count = 0
+		clients = set()
 		while not stop_event.is_set():
-			stream_pipeline = MosaicPipeline(self.config)
+			stream_pipeline = MosaicPipeline(self.config, clients)
 			if not stream_pipeline.start():
 				_publish_stream_status(
 					status_queue,
@@ -413,17 +860,19 @@ class MosaicStreamer:
 
 			_publish_stream_status(status_queue, self.config.output_port, "healthy", "pipeline_started")
 			logger.info(f"[mosaic-{self.config.output_port}] running GStreamer pipeline")
-			stopped_by_request = stream_pipeline.run_until_stopped(stop_event)
+			stopped_by_request = stream_pipeline.run_until_stopped(stop_event, status_queue)
 			logger.info(f"[mosaic-{self.config.output_port}] cleaning up pipeline")
 			_publish_stream_status(
 				status_queue,
 				self.config.output_port,
-				"failed" if not stop_event.is_set() else "starting",
-				"pipeline_stopped" if not stop_event.is_set() else "shutdown_requested",
+				"failed" if not stop_event.is_set() and not stream_pipeline.restart_requested else "starting",
+				_pipeline_stop_reason(stream_pipeline, stop_event),
 			)
 
 			if stopped_by_request or stop_event.is_set():
 				break
+			if stream_pipeline.restart_requested:
+				continue
 
 			restart_count += 1
 			delay = min(CAMERA_RESTART_BASE_SECONDS * (2 ** (restart_count - 1)), CAMERA_RESTART_MAX_SECONDS)
@@ -434,12 +883,39 @@ class MosaicStreamer:
 
 
 class StreamPipeline:
-	def __init__(self, config: StreamerConfig):
+	def __init__(self, config: StreamerConfig, clients: set = None):
 		self.config = config
 		self.pipeline = None
 		self.bus = None
+		# Shared with the owning streamer so subscribers survive pipeline restarts
+		self.clients = clients if clients is not None else set()
+		# Set when a config reload needs the pipeline rebuilt; the owner restarts it right away
+		self.restart_requested = False
+		self.recorder = (
+			PipelineRecorder(
+				config.recording,
+				f"cam{config.camera_id}-{config.port}",
+				config.recording_max_bytes,
+				request_keyframes=config.encoder_profile == "intra-refresh",
+			)
+			if config.recording is not None and config.recording.enabled and config.replay_location is None
+			else None
+		)
+		self.motion_gate = (
+			MotionGate(f"stream-{config.port}", config.motion_gate, config.target_fps)
+			if config.motion_gate is not None and config.replay_location is None
+			else None
+		)
+		self.keyframes = (
+			PeriodicKeyframes(f"stream-{config.port}")
+			if config.encoder_profile == "intra-refresh" and config.replay_location is None
+			else None
+		)
+		self.frame_rate_limiter = FrameRateLimiter(f"stream-{config.port}", config.target_fps, config.frame_rate_divisor)
 
 	def _build_pipeline(self) -> str:
+		if self.config.replay_location is not None:
+			return _build_replay_pipeline(self.config.replay_location, self.config.port, self.config)
 		if self.config.simulation:
 			source = (
 				"videotestsrc is-live=true "
@@ -462,11 +938,18 @@ class StreamPipeline:
 			self.config.bitrate,
 			self.config.target_fps,
 			self.config.multicast_ip,
+			simulate_loss=self.config.simulate_loss,
 			output_width=self.config.output_width,
 			output_height=self.config.output_height,
+			recorder=self.recorder,
+			send_buffer_bytes=self.config.send_buffer_bytes,
+			video_dscp=self.config.video_dscp,
+			encoder_profile=self.config.encoder_profile,
+			motion_gate=self.motion_gate,
 		)
 
 	def start(self) -> bool:
+		_require_gstreamer()
 		pipeline_str = self._build_pipeline()
 		logger.info(f"[stream-{self.config.port}] Initializing GStreamer pipeline for unicast clients")
 		logger.info(f"[stream-{self.config.port}] Pipeline: {pipeline_str}")
@@ -479,6 +962,17 @@ class StreamPipeline:
 			if ret == Gst.StateChangeReturn.FAILURE:
 				raise RuntimeError("failed to set pipeline to PLAYING state")
 			logger.info(f"[stream-{self.config.port}] GStreamer pipeline initialized")
+			if self.config.replay_location is not None and self.config.replay_start_ns > 0:
+				self._seek_replay(self.config.replay_start_ns)
+			self._restore_clients()
+			if self.recorder is not None:
+				self.recorder.attach(self.pipeline)
+			if self.motion_gate is not None:
+				self.motion_gate.attach(self.pipeline)
+			if self.keyframes is not None:
+				self.keyframes.attach(self.pipeline)
+			if self.config.replay_location is None:
+				self.frame_rate_limiter.attach(self.pipeline)
 			return True
 		except Exception as e:
 			logger.error(f"[stream-{self.config.port}] Failed to create GStreamer pipeline: {e}")
@@ -486,46 +980,112 @@ class StreamPipeline:
 			self.stop()
 			return False
 
+	def _seek_replay(self, position_ns: int):
+		# splitmuxsrc only knows the session's duration once it has prerolled
+		self.pipeline.get_state(5 * Gst.SECOND)
+		if not self.pipeline.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT, position_ns):
+			logger.warning(f"[stream-{self.config.port}] replay seek to {position_ns / Gst.SECOND:.3f}s failed; starting from the beginning")
+
 	def add_client(self, ip: str, port: int):
+		# Receivers resubscribe periodically; only new clients reach multiudpsink
+		if (ip, port) in self.clients:
+			return
 		if self.pipeline:
 			msink = self.pipeline.get_by_name("msink")
 			if msink:
 				msink.emit("add", ip, port)
+				self.clients.add((ip, port))
 				logger.info(f"[stream-{self.config.port}] Added unicast client {ip}:{port}")
 
-	def run_until_stopped(self, stop_event: multiprocessing.Event) -> bool:
+	def _restore_clients(self):
+		msink = self.pipeline.get_by_name("msink") if self.pipeline else None
+		if msink is None:
+			return
+		for ip, port in sorted(self.clients):
+			msink.emit("add", ip, port)
+		if self.clients:
+			logger.info(f"[stream-{self.config.port}] Restored {len(self.clients)} unicast client(s) after restart")
+
+	def run_until_stopped(self, stop_event: multiprocessing.Event, status_queue: multiprocessing.Queue = None) -> bool:
 		import queue as queue_module
 		try:
 			while not stop_event.is_set():
-				if self.config.control_queue:
+				# Drain everything queued, so changes sent together (e.g. a focus switch) land together
+				while self.config.control_queue:
 					try:
 						msg = self.config.control_queue.get_nowait()
-						if msg.get("type") == "add_client":
-							self.add_client(msg["ip"], msg["port"])
 					except queue_module.Empty:
-						pass
+						break
+					if msg.get("type") == "add_client":
+						self.add_client(msg["ip"], msg["port"])
+					elif msg.get("type") == "update_config" and self.apply_config(msg["fields"]):
+						logger.info(f"[stream-{self.config.port}] restarting pipeline for {', '.join(sorted(msg['fields']))}")
+						self.restart_requested = True
+						break
+				if self.restart_requested:
+					break
+
+				if self.recorder is not None:
+					self.recorder.maybe_report(status_queue, self.config.port)
+				if self.motion_gate is not None:
+					_maybe_report_motion_gate(self.motion_gate, status_queue, self.config.port)
+				if self.keyframes is not None:
+					self.keyframes.maybe_request()
 
 				if self.bus is not None:
 					message = self.bus.timed_pop_filtered(
 						100 * Gst.MSECOND,
-						Gst.MessageType.ERROR | Gst.MessageType.EOS,
+						Gst.MessageType.ERROR | Gst.MessageType.EOS | Gst.MessageType.ELEMENT,
 					)
 					if message is not None:
-						if message.type == Gst.MessageType.ERROR:
+						if message.type == Gst.MessageType.ELEMENT:
+							if self.recorder is not None:
+								self.recorder.on_element_message(message)
+						elif message.type == Gst.MessageType.ERROR:
 							err, debug = message.parse_error()
 							logger.error(f"[stream-{self.config.port}] GStreamer error: {err.message}; debug={debug}")
 							logger.info(f"[stream-{self.config.port}] GStreamer EOS received")
 							break
+						elif message.type == Gst.MessageType.EOS:
+							# A replay reaching the end of its recording restarts (loops) like a failed camera
+							logger.info(f"[stream-{self.config.port}] GStreamer EOS received")
+							break
 				else:
 					time.sleep(0.1)
 			return stop_event.is_set()
 		finally:
 			self.stop()
 
+	def apply_config(self, fields: dict) -> bool:
+		"""Apply reloaded config fields. Returns True if the pipeline must be rebuilt for them."""
+		needs_restart = False
+		for name, value in fields.items():
+			setattr(self.config, name, value)
+			if name not in LIVE_CONFIG_FIELDS:
+				needs_restart = True
+			elif name == "bitrate":
+				_apply_live_bitrate(self.pipeline, f"stream-{self.config.port}", value, self.config.encoder_profile)
+			elif name == "recording_max_bytes" and self.recorder is not None:
+				self.recorder.max_bytes = value
+			elif name == "frame_rate_divisor":
+				self.frame_rate_limiter.set_divisor(value)
+		if {"output_width", "output_height"} & fields.keys() and self.recorder is not None:
+			# The recording's muxer cannot change resolution mid-file; the new size applies from the next rebuild
+			logger.warning(f"[stream-{self.config.port}] keeping the output resolution while recording")
+		elif {"output_width", "output_height"} & fields.keys():
+			_apply_live_resolution(
+				self.pipeline,
+				f"stream-{self.config.port}",
+				self.config.output_width,
+				self.config.output_height,
+			)
+		return needs_restart
+
 	def stop(self):
 		if self.pipeline is not None:
 			try:
-				self.pipeline.set_state(Gst.State.NULL)
+				# Only a recording has anything to finalize; other pipelines go straight to NULL
+				_stop_pipeline(self.pipeline, f"stream-{self.config.port}", self.recorder is not None)
 			except Exception as e:
 				logger.error(f"[stream-{self.config.port}] error stopping pipeline: {e}")
 			finally:
@@ -551,7 +1111,51 @@ def _publish_stream_status(
 		pass
 
 
-def handle_arguments():
+def _pipeline_stop_reason(stream_pipeline, stop_event: multiprocessing.Event) -> str:
+	if stop_event.is_set():
+		return "shutdown_requested"
+	if stream_pipeline.restart_requested:
+		return "config_reloaded"
+	return "pipeline_stopped"
+
+
+def drain_stream_status(status_queue: multiprocessing.Queue, stream_health: dict, stream_metrics: dict):
+	"""Fold everything the stream processes have published into `stream_health` and `stream_metrics`."""
+	while True:
+		try:
+			status = status_queue.get_nowait()
+		except queue_module.Empty:
+			break
+		port = status.get("port")
+		if status.get("type") == "metrics":
+			if port in stream_metrics:
+				stream_metrics[port].update(status.get("metrics", {}))
+			continue
+		if port in stream_health:
+			stream_health[port] = str(status.get("state", "failed"))
+			reason = status.get("reason", "unknown")
+			logger.info(f"[stream-{port}] status update: {stream_health[port]} ({reason})")
+
+
+def _publish_stream_metrics(
+	status_queue: multiprocessing.Queue,
+	port: int,
+	metrics: dict,
+):
+	try:
+		status_queue.put_nowait(
+			{
+				"port": port,
+				"type": "metrics",
+				"metrics": metrics,
+			}
+		)
+	except Exception:
+		pass
+
+
+def build_argument_parser() -> argparse.ArgumentParser:
+	"""The streamer's parser with the external defaults applied (kept for config reloads)."""
 	parser = argparse.ArgumentParser(
 		prog="camera_streamer",
 		description="Streams one or more cameras using OpenCV and GStreamer UDP Multicast",
@@ -578,6 +1182,22 @@ def handle_arguments():
 		type=int_in_range("bitrate", 1000, 100000000),
 		help="Target video bitrate for hardware h.264 encoding",
 	)
+	parser.add_argument(
+		"--total-bitrate",
+		type=int_in_range("total-bitrate", 1000),
+		help="Uplink budget shared by all streams and subscribers; --bitrate becomes the per-stream maximum",
+	)
+	parser.add_argument(
+		"--min-stream-bitrate",
+		type=int_in_range("min-stream-bitrate", 1000, 100000000),
+		help="Lowest bitrate the budget gives a stream",
+	)
+	parser.add_argument(
+		"--stream-priorities",
+		type=camera_weight("stream-priorities"),
+		nargs="+",
+		help="Budget weights as camera_id=weight (e.g. 0=3 2=0.5); unlisted cameras weigh 1",
+	)
 	parser.add_argument(
 		"--target-fps",
 		type=int_in_range("target-fps", 1),
@@ -614,11 +1234,22 @@ def handle_arguments():
 		type=int_in_range("control-port", VALID_PORT_MIN, VALID_PORT_MAX),
 		help="UDP port used to listen for subscriber requests",
 	)
+	parser.add_argument(
+		"--control-dscp",
+		type=int_in_range("control-dscp", 0, DSCP_MAX),
+		help=f"DSCP marking for discovery and control replies (default {DSCP_CS6} = CS6)",
+	)
 	parser.add_argument(
 		"--discovery-interval",
 		type=float,
 		help="Seconds between discovery announcements",
 	)
+	parser.add_argument(
+		"--discovery-targets",
+		type=ipv4_endpoint("discovery-targets"),
+		nargs="+",
+		help="Also announce by unicast to these IPv4 addresses (optionally with :port), e.g. known base stations",
+	)
 	parser.add_argument(
 		"--never-give-up",
 		type=str,
@@ -632,10 +1263,82 @@ def handle_arguments():
 		help="Combine all selected cameras into one mosaic stream",
 	)
 	parser.add_argument(
-		"--only-eth0",
-		action="store_true",
-		help="Only bind to eth0 interface IP address",
+		"--record",
+		type=str,
+		choices=["on", "off"],
+		help="Record the live encode into segmented files (no second capture or encode)",
+	)
+	parser.add_argument(
+		"--record-dir",
+		type=str,
+		help="Directory for recorded segments",
+	)
+	parser.add_argument(
+		"--record-segment-seconds",
+		type=float_in_range("record-segment-seconds", 1.0),
+		help="Length of each recorded segment in seconds",
+	)
+	parser.add_argument(
+		"--record-format",
+		type=str,
+		choices=sorted(RECORDING_MUXERS),
+		help="Container for recorded segments",
+	)
+	parser.add_argument(
+		"--record-max-bytes",
+		type=int_in_range("record-max-bytes", 1),
+		help="Disk budget for all recorded segments; oldest segments are deleted first",
 	)
+	parser.add_argument(
+		"--replay",
+		type=str,
+		help="Rebroadcast indexed recordings from this directory instead of capturing cameras",
+	)
+	parser.add_argument(
+		"--replay-start",
+		type=float,
+		help="Wall-clock time (Unix seconds) to start the replay from; defaults to the earliest recording",
+	)
+	parser.add_argument(
+		"--encoder-profile",
+		type=str,
+		choices=ENCODER_PROFILES,
+		help="idr: periodic IDR frames; intra-refresh: rolling intra refresh with a tight VBV and paced sending",
+	)
+	parser.add_argument(
+		"--motion-gate",
+		type=str,
+		choices=["on", "off"],
+		help="Skip frames before the encoder while the scene is static, down to --motion-keepalive-fps",
+	)
+	parser.add_argument(
+		"--motion-threshold",
+		type=float_in_range("motion-threshold", 0.0, 255.0),
+		help="Mean luma difference (0-255) from the last sent frame that counts as motion",
+	)
+	parser.add_argument(
+		"--motion-keepalive-fps",
+		type=float_in_range("motion-keepalive-fps", MOTION_GATE_MIN_KEEPALIVE_FPS),
+		help="Frame rate kept while the scene is static, so receivers do not treat the stream as stalled",
+	)
+	parser.add_argument(
+		"--send-buffer-bytes",
+		type=int_in_range("send-buffer-bytes", 1),
+		help="UDP send buffer per stream (default: sized from bitrate and frame rate to absorb keyframe bursts)",
+	)
+	parser.add_argument(
+		"--video-dscp",
+		type=int_in_range("video-dscp", 0, DSCP_MAX),
+		help=f"DSCP marking for video packets (default {DSCP_AF41} = AF41)",
+	)
+	parser.add_argument(
+		"--interfaces",
+		type=str,
+		nargs="+",
+		help="Network interfaces to announce discovery on (default: every interface that is up, except loopback)",
+	)
+
+	add_logging_arguments(parser)
 
 	try:
 		apply_required_external_defaults(parser, "streamer-only")
@@ -643,7 +1346,11 @@ def handle_arguments():
 		logger.error(f"[defaults] {exc}")
 		exit(2)
 
-	return parser.parse_args()
+	return parser
+
+
+def handle_arguments():
+	return build_argument_parser().parse_args()
 
 
 class SingleStreamer:
@@ -652,8 +1359,9 @@ class SingleStreamer:
 
 	def start(self, stop_event: multiprocessing.Event, status_queue: multiprocessing.Queue):
 		restart_count = 0
+		clients = set()
 		while not stop_event.is_set():
-			stream_pipeline = StreamPipeline(self.config)
+			stream_pipeline = StreamPipeline(self.config, clients)
 			if not stream_pipeline.start():
 				_publish_stream_status(
 					status_queue,
@@ -672,17 +1380,19 @@ class SingleStreamer:
 			_publish_stream_status(status_queue, self.config.port, "healthy", "pipeline_started")
 
 			logger.info(f"[stream-{self.config.port}] running GStreamer pipeline")
-			stopped_by_request = stream_pipeline.run_until_stopped(stop_event)
+			stopped_by_request = stream_pipeline.run_until_stopped(stop_event, status_queue)
 			logger.info(f"[stream-{self.config.port}] cleaning up pipeline")
 			_publish_stream_status(
 				status_queue,
 				self.config.port,
-				"failed" if not stop_event.is_set() else "starting",
-				"pipeline_stopped" if not stop_event.is_set() else "shutdown_requested",
+				"failed" if not stop_event.is_set() and not stream_pipeline.restart_requested else "starting",
+				_pipeline_stop_reason(stream_pipeline, stop_event),
 			)
 
 			if stopped_by_request or stop_event.is_set():
 				break
+			if stream_pipeline.restart_requested:
+				continue
 
 			restart_count += 1
 			delay = min(CAMERA_RESTART_BASE_SECONDS * (2 ** (restart_count - 1)), CAMERA_RESTART_MAX_SECONDS)
@@ -702,6 +1412,10 @@ def _spawn_streamer_process(
 	return p
 
 
+def _stream_recording_max_bytes(recording_max_bytes: int, stream_count: int) -> int:
+	return None if recording_max_bytes is None else max(1, recording_max_bytes // stream_count)
+
+
 class MultiStreamer:
 	def __init__(
 		self,
@@ -714,7 +1428,16 @@ class MultiStreamer:
 		simulate_loss: float = 0.0,
 		never_give_up: bool = False,
 		control_queues: dict = None,
+		recording: RecordingConfig = None,
+		recording_max_bytes: int = None,
+		replay_sources: list = None,
+		send_buffer_bytes: int = None,
+		video_dscp: int = None,
+		encoder_profile: str = "idr",
+		motion_gate: MotionGateConfig = None,
 	):
+		# The disk budget is shared evenly so each stream process can rotate its own segments
+		stream_recording_max_bytes = _stream_recording_max_bytes(recording_max_bytes, len(camera_ids))
 		self.streamers = [
 			SingleStreamer(
 				StreamerConfig(
@@ -728,6 +1451,14 @@ class MultiStreamer:
 					output_width=320 if len(camera_ids) > 1 else CAMERA_FRAME_WIDTH,
 					output_height=320 if len(camera_ids) > 1 else CAMERA_FRAME_HEIGHT,
 					control_queue=control_queues.get(base_port + idx) if control_queues else None,
+					recording=recording,
+					recording_max_bytes=stream_recording_max_bytes,
+					replay_location=replay_sources[idx].location if replay_sources else None,
+					replay_start_ns=replay_sources[idx].position_ns if replay_sources else 0,
+					send_buffer_bytes=send_buffer_bytes,
+					video_dscp=video_dscp,
+					encoder_profile=encoder_profile,
+					motion_gate=motion_gate,
 				)
 			)
 			for idx, cam_id in enumerate(camera_ids)
@@ -737,8 +1468,41 @@ class MultiStreamer:
 		self.never_give_up = never_give_up
 		self.status_queue: multiprocessing.Queue = multiprocessing.Queue()
 		self.stream_health = {sub_streamer.config.port: "starting" for sub_streamer in self.streamers}
+		self.stream_metrics: dict = {sub_streamer.config.port: {} for sub_streamer in self.streamers}
 		self.processes: List[multiprocessing.Process] = []
 
+	def update_config(self, fields: dict) -> List[int]:
+		"""Push reloaded settings to every camera stream. Returns the ports that were told.
+
+		The parent's copies are updated too, so a stream respawned later starts with them.
+		Replays have no encoder or recorder, so they are left alone.
+		"""
+		fields = dict(fields)
+		if "recording_max_bytes" in fields:
+			fields["recording_max_bytes"] = _stream_recording_max_bytes(fields["recording_max_bytes"], len(self.streamers))
+		ports = []
+		for sub_streamer in self.streamers:
+			if sub_streamer.config.replay_location is not None:
+				continue
+			for name, value in fields.items():
+				setattr(sub_streamer.config, name, value)
+			if sub_streamer.config.control_queue is not None:
+				sub_streamer.config.control_queue.put({"type": "update_config", "fields": fields})
+			ports.append(sub_streamer.config.port)
+		return ports
+
+	def update_stream_config(self, port: int, fields: dict) -> bool:
+		"""Push settings to the camera stream on `port` only (e.g. its share of the bandwidth budget)."""
+		for sub_streamer in self.streamers:
+			if sub_streamer.config.port != port or sub_streamer.config.replay_location is not None:
+				continue
+			for name, value in fields.items():
+				setattr(sub_streamer.config, name, value)
+			if sub_streamer.config.control_queue is not None:
+				sub_streamer.config.control_queue.put({"type": "update_config", "fields": fields})
+			return True
+		return False
+
 	def start(self):
 		for sub_streamer in self.streamers:
 			p = _spawn_streamer_process(sub_streamer, self.stop_event, self.status_queue)
@@ -752,16 +1516,7 @@ class MultiStreamer:
 
 	def supervise(self):
 		while not self.stop_event.is_set():
-			while True:
-				try:
-					status = self.status_queue.get_nowait()
-				except queue_module.Empty:
-					break
-				port = status.get("port")
-				if port in self.stream_health:
-					self.stream_health[port] = str(status.get("state", "failed"))
-					reason = status.get("reason", "unknown")
-					logger.info(f"[stream-{port}] status update: {self.stream_health[port]} ({reason})")
+			drain_stream_status(self.status_queue, self.stream_health, self.stream_metrics)
 
 			alive_count = sum(1 for p in self.processes if p.is_alive())
 			if alive_count == 0:
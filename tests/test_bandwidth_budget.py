@@ -0,0 +1,111 @@
+from bandwidth_budget import BUDGET_MIN_CHANGE_FRACTION, BandwidthBudgetScheduler, StreamDemand, allocate_bitrates
+
+MBPS = 1_000_000
+
+
+def test_split_in_proportion_to_weight():
+	demands = {5000: StreamDemand(1.0, 1), 5001: StreamDemand(2.0, 1)}
+	assert allocate_bitrates(9 * MBPS, demands, 1 * MBPS, 8 * MBPS) == {5000: 3 * MBPS, 5001: 6 * MBPS}
+
+
+def test_each_subscriber_costs_a_copy():
+	demands = {5000: StreamDemand(1.0, 2), 5001: StreamDemand(1.0, 1)}
+	assert allocate_bitrates(9 * MBPS, demands, 1 * MBPS, 8 * MBPS) == {5000: 3 * MBPS, 5001: 3 * MBPS}
+
+
+def test_max_pinning_redistributes_the_remainder():
+	demands = {5000: StreamDemand(1.0, 1), 5001: StreamDemand(4.0, 1)}
+	assert allocate_bitrates(10 * MBPS, demands, 1 * MBPS, 6 * MBPS) == {5000: 4 * MBPS, 5001: 6 * MBPS}
+
+
+def test_per_stream_ceiling_overrides_the_shared_one():
+	demands = {5000: StreamDemand(1.0, 1), 5001: StreamDemand(4.0, 1, max_bitrate=24 * MBPS)}
+	assert allocate_bitrates(10 * MBPS, demands, 1 * MBPS, 6 * MBPS) == {5000: 2 * MBPS, 5001: 8 * MBPS}
+
+
+def test_min_pinning_is_settled_before_the_rest():
+	demands = {5000: StreamDemand(1.0, 1), 5001: StreamDemand(9.0, 1)}
+	assert allocate_bitrates(10 * MBPS, demands, 2 * MBPS, 10 * MBPS) == {5000: 2 * MBPS, 5001: 8 * MBPS}
+
+
+def test_oversubscribed_budget_keeps_every_stream_at_the_floor():
+	demands = {port: StreamDemand(1.0, 1) for port in (5000, 5001, 5002)}
+	assert allocate_bitrates(1 * MBPS, demands, 1 * MBPS, 8 * MBPS) == {port: 1 * MBPS for port in demands}
+
+
+def test_streams_without_subscribers_cost_nothing():
+	demands = {5000: StreamDemand(1.0, 1), 5001: StreamDemand(5.0, 0)}
+	assert allocate_bitrates(6 * MBPS, demands, 1 * MBPS, 8 * MBPS) == {5000: 6 * MBPS, 5001: 1 * MBPS}
+
+
+def test_nobody_subscribed():
+	demands = {5000: StreamDemand(1.0, 0), 5001: StreamDemand(1.0, 0)}
+	assert allocate_bitrates(6 * MBPS, demands, 1 * MBPS, 8 * MBPS) == {5000: 1 * MBPS, 5001: 1 * MBPS}
+
+
+def _scheduler(total_bitrate, **kwargs):
+	pushed = []
+	scheduler = BandwidthBudgetScheduler(
+		{5000: 0, 5001: 1},
+		lambda port, bitrate: pushed.append((port, bitrate)),
+		total_bitrate,
+		1 * MBPS,
+		8 * MBPS,
+		**kwargs,
+	)
+	return scheduler, pushed
+
+
+def test_reschedule_without_budget_keeps_the_ceiling():
+	scheduler, pushed = _scheduler(None)
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	assert scheduler.reschedule() == {}
+	assert pushed == []
+
+
+def test_reschedule_pushes_only_changed_streams():
+	scheduler, pushed = _scheduler(10 * MBPS)
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	assert scheduler.reschedule() == {5001: 1 * MBPS}
+	# One subscriber on 5000 gets the whole budget, capped at the ceiling it already has
+	assert pushed == [(5001, 1 * MBPS)]
+
+
+def test_reschedule_skips_small_steps_unless_forced():
+	scheduler, pushed = _scheduler(16 * MBPS)
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	scheduler.note_subscriber(5001, "10.0.0.3")
+	scheduler.reschedule()
+	assert pushed == []
+	scheduler.update(total_bitrate=16 * MBPS * (1 - BUDGET_MIN_CHANGE_FRACTION / 2))
+	assert pushed == []
+	assert set(scheduler.reschedule(force=True)) == {5000, 5001}
+
+
+def test_priorities_weight_the_split():
+	scheduler, pushed = _scheduler(8 * MBPS, priorities=["1=3"])
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	scheduler.note_subscriber(5001, "10.0.0.3")
+	scheduler.reschedule()
+	assert sorted(pushed) == [(5000, 2 * MBPS), (5001, 6 * MBPS)]
+
+
+def test_failed_stream_releases_its_share():
+	stream_health = {}
+	scheduler, pushed = _scheduler(10 * MBPS, stream_health=stream_health)
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	scheduler.note_subscriber(5001, "10.0.0.3")
+	scheduler.reschedule()
+	assert sorted(pushed) == [(5000, 5 * MBPS), (5001, 5 * MBPS)]
+	stream_health[5001] = "failed"
+	assert scheduler.reschedule() == {5000: 8 * MBPS}
+
+
+def test_oversubscription_is_logged_once(caplog):
+	scheduler, _pushed = _scheduler(1 * MBPS)
+	scheduler.note_subscriber(5000, "10.0.0.2")
+	scheduler.note_subscriber(5001, "10.0.0.3")
+	scheduler.reschedule()
+	scheduler.reschedule(force=True)
+	assert sum("oversubscribed" in record.getMessage() for record in caplog.records) == 1
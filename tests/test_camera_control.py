@@ -0,0 +1,41 @@
+import math
+
+import pytest
+
+from camera_control import (
+	CAMERA_CONTROL_AUTO,
+	CAMERA_CONTROL_MESSAGE_TYPE,
+	V4L2_CONTROL_VALUE_MAX,
+	_control_value,
+	parse_control_command,
+)
+
+
+def test_legacy_exposure_command():
+	assert parse_control_command(" EXP:120\n") == {
+		"type": CAMERA_CONTROL_MESSAGE_TYPE,
+		"controls": {"exposure": 120},
+	}
+	assert parse_control_command("EXP:auto")["controls"] == {"exposure": CAMERA_CONTROL_AUTO}
+	assert parse_control_command("EXP:bright") is None
+
+
+def test_json_command():
+	request = {"type": CAMERA_CONTROL_MESSAGE_TYPE, "cameras": [0], "controls": {"gain": 4}}
+	assert parse_control_command('{"type": "CAMERA_CONTROL", "cameras": [0], "controls": {"gain": 4}}') == request
+
+
+@pytest.mark.parametrize("command", ["", "not json", "[1, 2]", '{"type": "FOCUS_REQUEST"}', "null"])
+def test_rejected_commands(command):
+	assert parse_control_command(command) is None
+
+
+@pytest.mark.parametrize("value, expected", [(5, 5), (7.9, 7), (-3, -3), ("AUTO", CAMERA_CONTROL_AUTO)])
+def test_control_values(value, expected):
+	assert _control_value(value) == expected
+
+
+@pytest.mark.parametrize("value", [True, None, "5", [1], math.nan, math.inf, V4L2_CONTROL_VALUE_MAX + 1])
+def test_invalid_control_values(value):
+	with pytest.raises(ValueError):
+		_control_value(value)
@@ -0,0 +1,66 @@
+import logging
+
+from common_utils import LogRateLimiter, _build_log_handler
+
+
+def _record(msg, lineno=10, level=logging.INFO, created=0.0, args=None):
+	record = logging.LogRecord("test", level, "module.py", lineno, msg, args, None)
+	record.created = created
+	return record
+
+
+def test_burst_per_call_site():
+	limiter = LogRateLimiter(burst=2, window=10.0)
+	passed = [limiter.filter(_record(f"frame {n}", created=n * 0.1)) for n in range(5)]
+	assert passed == [True, True, False, False, False]
+	# Another call site has its own budget
+	assert limiter.filter(_record("other", lineno=11, created=0.5))
+
+
+def test_next_window_reports_the_suppressed_count():
+	limiter = LogRateLimiter(burst=1, window=10.0)
+	for n in range(4):
+		limiter.filter(_record(f"frame {n}", created=n))
+	record = _record("frame %d", created=10.0, args=(4,))
+	assert limiter.filter(record)
+	assert record.getMessage() == "frame 4 [3 similar message(s) suppressed]"
+
+
+def test_exact_repeats_below_warning_are_held_back():
+	limiter = LogRateLimiter(burst=5, window=10.0)
+	assert limiter.filter(_record("camera failed"))
+	assert not limiter.filter(_record("camera failed", created=1.0))
+	assert limiter.filter(_record("camera recovered", created=2.0))
+
+
+def test_repeats_at_warning_and_above_are_not_deduplicated():
+	limiter = LogRateLimiter(burst=5, window=10.0)
+	passed = [limiter.filter(_record("camera failed", level=logging.ERROR, created=n)) for n in range(5)]
+	assert passed == [True] * 5
+
+
+def test_drain_summaries_after_the_window():
+	limiter = LogRateLimiter(burst=1, window=10.0)
+	for n in range(3):
+		limiter.filter(_record(f"frame {n}", created=n))
+	assert limiter.drain_summaries(now=5.0) == []
+	summaries = limiter.drain_summaries(now=10.0)
+	assert [summary.getMessage() for summary in summaries] == ["frame 2 [last of 2 similar message(s) suppressed]"]
+	assert limiter.drain_summaries(now=20.0) == []
+
+
+def test_forced_drain_takes_every_pending_summary():
+	limiter = LogRateLimiter(burst=1, window=10.0)
+	for n in range(2):
+		limiter.filter(_record("same", created=n))
+	assert len(limiter.drain_summaries(now=1.0, force=True)) == 1
+
+
+def test_zero_burst_lets_everything_through():
+	limiter = LogRateLimiter(burst=0)
+	assert all(limiter.filter(_record("same", created=n)) for n in range(50))
+
+
+def test_default_sync_handler_has_no_rate_limit():
+	handler = _build_log_handler("sync", 0)
+	assert handler.filters == []
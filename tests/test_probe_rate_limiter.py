@@ -0,0 +1,18 @@
+from streamer_app import ProbeRateLimiter
+
+
+def test_one_reply_per_source_per_interval():
+	limiter = ProbeRateLimiter(min_interval_per_source=1.0, max_replies_per_second=10)
+	assert limiter.allow("10.0.0.2", now=100.0)
+	assert not limiter.allow("10.0.0.2", now=100.5)
+	assert limiter.allow("10.0.0.3", now=100.5)
+	assert limiter.allow("10.0.0.2", now=101.0)
+	assert limiter.dropped == 1
+
+
+def test_total_replies_per_second():
+	limiter = ProbeRateLimiter(min_interval_per_source=1.0, max_replies_per_second=3)
+	passed = [limiter.allow(f"10.0.0.{n}", now=100.0 + n * 0.01) for n in range(5)]
+	assert passed == [True, True, True, False, False]
+	assert limiter.dropped == 2
+	assert limiter.allow("10.0.0.9", now=101.0)
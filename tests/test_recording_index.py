@@ -0,0 +1,74 @@
+import os
+
+from recording_index import IndexedSegment, StreamTimeline, session_glob_for_segment
+
+SECOND_NS = 1_000_000_000
+
+
+def _segment(path, start_wall_time, duration_s, keyframe_offsets_s):
+	return IndexedSegment(path, {
+		"stream": "cam0",
+		"start_wall_time": start_wall_time,
+		"duration_ns": duration_s * SECOND_NS,
+		"keyframes": [
+			{"wall_time": start_wall_time + offset, "pts_ns": offset * SECOND_NS}
+			for offset in keyframe_offsets_s
+		],
+	})
+
+
+def test_session_glob_drops_the_fragment_number():
+	path = os.path.join("rec", "cam0-20260101-120000-3.mkv")
+	assert session_glob_for_segment(path) == os.path.join("rec", "cam0-20260101-120000-*.mkv")
+
+
+def test_session_glob_escapes_glob_characters():
+	path = os.path.join("rec[1]", "cam*0-20260101-120000-0.mp4")
+	assert session_glob_for_segment(path) == os.path.join("rec[[]1]", "cam[*]0-20260101-120000-*.mp4")
+
+
+def _timeline():
+	# Two fragments of one session back to back, then a second session after a gap
+	return StreamTimeline("cam0", [
+		_segment("cam0-20260101-120000-1.mkv", 1010.0, 10, [0, 5]),
+		_segment("cam0-20260101-120000-0.mkv", 1000.0, 10, [0, 5]),
+		_segment("cam0-20260101-120100-0.mkv", 1060.0, 10, [0, 5]),
+	])
+
+
+def test_seek_to_the_last_keyframe_at_or_before():
+	segment, pts_ns, session_position_ns, wall_time = _timeline().seek(1017.0)
+	assert segment.path == "cam0-20260101-120000-1.mkv"
+	assert pts_ns == 5 * SECOND_NS
+	# The second fragment plays after the first one's 10 s inside the session
+	assert session_position_ns == 15 * SECOND_NS
+	assert wall_time == 1015.0
+
+
+def test_seek_before_the_recording_starts_at_the_first_keyframe():
+	segment, pts_ns, session_position_ns, wall_time = _timeline().seek(900.0)
+	assert segment.path == "cam0-20260101-120000-0.mkv"
+	assert (pts_ns, session_position_ns, wall_time) == (0, 0, 1000.0)
+
+
+def test_seek_between_sessions_stays_on_the_earlier_keyframe():
+	segment, pts_ns, session_position_ns, wall_time = _timeline().seek(1040.0)
+	assert segment.path == "cam0-20260101-120000-1.mkv"
+	assert wall_time == 1015.0
+
+
+def test_seek_into_a_new_session_restarts_its_position():
+	segment, pts_ns, session_position_ns, wall_time = _timeline().seek(1066.0)
+	assert segment.path == "cam0-20260101-120100-0.mkv"
+	assert session_position_ns == 5 * SECOND_NS
+
+
+def test_seek_after_the_recording_ends():
+	timeline = _timeline()
+	assert timeline.seek(1069.0) is not None
+	assert timeline.seek(1071.0) is None
+	assert timeline.end_wall_time == 1070.0
+
+
+def test_seek_on_an_empty_timeline():
+	assert StreamTimeline("cam0", []).seek(1000.0) is None
@@ -0,0 +1,39 @@
+import udp_qos
+
+PROC_NET_UDP_HEADER = (
+	"   sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt"
+	"   uid  timeout inode ref pointer drops\n"
+)
+
+
+def _socket_line(slot, local_address, drops):
+	return (
+		f"  {slot}: {local_address} 00000000:0000 07 00000000:00000000 00:00000000 00000000"
+		f"     0        0 1234{slot} 2 0000000000000000 {drops}\n"
+	)
+
+
+def test_read_udp_socket_drops(tmp_path, monkeypatch):
+	udp = tmp_path / "udp"
+	udp6 = tmp_path / "udp6"
+	# 5000 = 0x1388, 5001 = 0x1389
+	udp.write_text(
+		PROC_NET_UDP_HEADER
+		+ _socket_line(1, "00000000:1388", 7)
+		+ _socket_line(2, "0100007F:1389", 2)
+		+ _socket_line(3, "00000000:0035", 99)
+		+ "  4: truncated\n"
+	)
+	udp6.write_text(PROC_NET_UDP_HEADER + _socket_line(5, "00000000000000000000000000000000:1388", 3))
+	monkeypatch.setattr(udp_qos, "PROC_NET_UDP", (str(udp), str(udp6), str(tmp_path / "missing")))
+	assert udp_qos.read_udp_socket_drops([5000, 5001, 5002]) == {5000: 10, 5001: 2}
+
+
+def test_read_udp_counters(tmp_path, monkeypatch):
+	snmp = tmp_path / "snmp"
+	snmp.write_text(
+		"Ip: Forwarding DefaultTTL\nIp: 1 64\n"
+		"Udp: InDatagrams NoPorts InErrors RcvbufErrors\nUdp: 100 1 5 4\n"
+	)
+	monkeypatch.setattr(udp_qos, "PROC_NET_SNMP", str(snmp))
+	assert udp_qos.read_udp_counters() == {"InDatagrams": 100, "NoPorts": 1, "InErrors": 5, "RcvbufErrors": 4}
@@ -0,0 +1,158 @@
+import socket
+import threading
+from typing import Dict, Iterable, Optional
+
+from common_utils import clamp, get_logger
+
+logger = get_logger(__name__)
+
+# DSCP code points (RFC 4594): AF41 for interactive video, CS6 for control and discovery
+DSCP_AF41 = 34
+DSCP_CS6 = 48
+DSCP_MAX = 63
+# A keyframe is roughly this many average frames; the buffer holds a couple of them plus a slice of steady traffic
+KEYFRAME_SIZE_FACTOR = 8
+SOCKET_BUFFER_KEYFRAMES = 2
+SOCKET_BUFFER_STEADY_SECONDS = 0.1
+SOCKET_BUFFER_MIN_BYTES = 256 * 1024
+SOCKET_BUFFER_MAX_BYTES = 16 * 1024 * 1024
+DEFAULT_RECEIVE_BUFFER_BYTES = 2 * 1024 * 1024
+UDP_DROP_REPORT_SECONDS = 10.0
+
+PROC_NET_SNMP = "/proc/net/snmp"
+PROC_NET_UDP = ("/proc/net/udp", "/proc/net/udp6")
+PROC_RMEM_MAX = "/proc/sys/net/core/rmem_max"
+PROC_WMEM_MAX = "/proc/sys/net/core/wmem_max"
+UDP_SNMP_DROP_COUNTERS = ("InErrors", "RcvbufErrors", "SndbufErrors")
+
+_control_dscp: Optional[int] = None
+
+
+def socket_buffer_bytes(bitrate: int, target_fps: int) -> int:
+	"""Size a UDP socket buffer so keyframe bursts at `bitrate` bits/s fit without drops."""
+	bytes_per_second = max(1, bitrate) / 8
+	keyframe_bytes = bytes_per_second / max(1, target_fps) * KEYFRAME_SIZE_FACTOR
+	wanted = int(keyframe_bytes * SOCKET_BUFFER_KEYFRAMES + bytes_per_second * SOCKET_BUFFER_STEADY_SECONDS)
+	return clamp(wanted, SOCKET_BUFFER_MIN_BYTES, SOCKET_BUFFER_MAX_BYTES)
+
+
+def _read_int(path: str) -> Optional[int]:
+	try:
+		with open(path, "r", encoding="utf-8") as f:
+			return int(f.read().strip())
+	except (OSError, ValueError):
+		return None
+
+
+def warn_if_buffer_capped(requested: int, send: bool, label: str):
+	"""The kernel silently caps SO_SNDBUF/SO_RCVBUF at wmem_max/rmem_max for unprivileged sockets."""
+	path = PROC_WMEM_MAX if send else PROC_RMEM_MAX
+	limit = _read_int(path)
+	if limit is not None and requested > limit:
+		sysctl = "net.core.wmem_max" if send else "net.core.rmem_max"
+		logger.warning(
+			f"[{label}] {'send' if send else 'receive'} buffer of {requested} bytes exceeds {sysctl}={limit}; "
+			f"raise it (sysctl -w {sysctl}={requested}) or keyframe bursts may be dropped"
+		)
+
+
+def configure_control_dscp(dscp: Optional[int]):
+	"""Set the DSCP that `mark_control_socket` applies to control and discovery sockets."""
+	global _control_dscp
+	_control_dscp = dscp
+
+
+def mark_control_socket(sock: socket.socket):
+	if _control_dscp is None:
+		return
+	try:
+		# IP_TOS carries the DSCP in its upper six bits
+		sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, _control_dscp << 2)
+	except OSError as exc:
+		logger.debug(f"[qos] cannot set DSCP {_control_dscp} on control socket: {exc}")
+
+
+def read_udp_counters() -> Dict[str, int]:
+	"""System-wide UDP counters from /proc/net/snmp (InErrors, RcvbufErrors, SndbufErrors, ...)."""
+	try:
+		with open(PROC_NET_SNMP, "r", encoding="utf-8") as f:
+			lines = [line.split() for line in f if line.startswith("Udp:")]
+	except OSError:
+		return {}
+	# The first Udp: line holds the names, the second the values
+	if len(lines) < 2:
+		return {}
+	return {name: int(value) for name, value in zip(lines[0][1:], lines[1][1:])}
+
+
+def read_udp_socket_drops(ports: Iterable[int]) -> Dict[int, int]:
+	"""Per-socket receive queue overflows (what SO_RXQ_OVFL reports) for UDP sockets bound to `ports`."""
+	ports = set(ports)
+	drops = {}
+	for path in PROC_NET_UDP:
+		try:
+			with open(path, "r", encoding="utf-8") as f:
+				next(f, None)
+				for line in f:
+					fields = line.split()
+					if len(fields) < 13:
+						continue
+					port = int(fields[1].rsplit(":", 1)[1], 16)
+					if port in ports:
+						drops[port] = drops.get(port, 0) + int(fields[-1])
+		except (OSError, ValueError):
+			continue
+	return drops
+
+
+class UdpDropMonitor:
+	"""Logs kernel-level UDP drops whenever they grew since the last report.
+
+	GStreamer owns the video sockets, so per-socket overflows are read from /proc/net/udp
+	rather than through SO_RXQ_OVFL; buffer errors come from /proc/net/snmp.
+	"""
+
+	def __init__(self, label: str, ports: Iterable[int] = (), interval: float = UDP_DROP_REPORT_SECONDS):
+		self.label = label
+		self.ports = list(ports)
+		self.interval = interval
+		self._lock = threading.Lock()
+		self._last_counters = read_udp_counters()
+		self._last_socket_drops = read_udp_socket_drops(self.ports)
+
+	def set_ports(self, ports: Iterable[int]):
+		"""Watch a new set of sockets (e.g. after the receiver followed a new port layout)."""
+		ports = list(ports)
+		socket_drops = read_udp_socket_drops(ports)
+		with self._lock:
+			self.ports = ports
+			self._last_socket_drops = socket_drops
+
+	def report(self) -> Dict[str, int]:
+		with self._lock:
+			ports = list(self.ports)
+		counters = read_udp_counters()
+		socket_drops = read_udp_socket_drops(ports)
+		deltas = {
+			name: counters[name] - self._last_counters.get(name, counters[name])
+			for name in UDP_SNMP_DROP_COUNTERS
+			if name in counters
+		}
+		with self._lock:
+			# If the layout changed while reading, set_ports() has already taken the new baseline
+			if ports == self.ports:
+				for port, drops in socket_drops.items():
+					deltas[f"port {port}"] = drops - self._last_socket_drops.get(port, drops)
+				self._last_socket_drops = socket_drops
+		self._last_counters = counters
+		grown = {name: delta for name, delta in deltas.items() if delta > 0}
+		if grown:
+			logger.warning(
+				f"[{self.label}] kernel UDP drops in the last {self.interval:.0f}s: "
+				+ ", ".join(f"{name}={delta}" for name, delta in grown.items())
+			)
+		return grown
+
+	def run(self, stop_event: threading.Event):
+		while not stop_event.wait(self.interval):
+			self.report()